@@ -1,31 +1,33 @@
 from typing import TypedDict, Optional, Literal
 from langgraph.graph import StateGraph, END
 
-from datetime import datetime
-
-from utils.logger import setup_logger
+from utils.logger import log_run_banner, setup_logger
+from utils.settlement import SETTLEMENT_MODE, SettlementService, get_settlement_service
+from utils.tracing import traced
 
 logger = setup_logger("RouterAgent", "router_agent", "router.log")
 
-# Just for logging purposes
-logger.info("")
-logger.info("=" * 60)
-logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-logger.info("=" * 60)
-logger.info("")
+# Gives below this many tokens are not transferred (also used by simulation.py)
+TRANSFER_THRESHOLD = 5
 
 
 # Define State Schema
 class RouterAgentState(TypedDict):
     tokens: int
     vendor_id: str
+    # Identifies the give in the settlement ledger (the master flow's run id)
+    give_ref: Optional[str]
     status: Optional[str]
+    settlement_entry: Optional[int]
 
 
 # RouterAgent Class
 class RouterAgent:
-    def __init__(self, threshold: int = 5):
+    def __init__(self, threshold: int = TRANSFER_THRESHOLD, settlement: bool = SETTLEMENT_MODE, settlement_service: SettlementService = None):
+        log_run_banner(logger)
         self.threshold = threshold
+        self.settlement = settlement
+        self.settlement_service = settlement_service
         self.graph = self._build_graph()
 
     def _build_graph(self):
@@ -48,6 +50,7 @@ class RouterAgent:
 
         return builder.compile()
 
+    @traced("RouterAgent.pass_state")
     def pass_state(self, state: RouterAgentState) -> RouterAgentState:
         logger.info(f"[RouterAgent] - Passing state forward: {state}")
         return state
@@ -60,11 +63,22 @@ class RouterAgent:
         logger.info("[RouterAgent] - Threshold not met. Ending flow.")
         return "__end__"
 
+    @traced("RouterAgent.trigger_transfer")
     def trigger_token_transfer(self, state: RouterAgentState) -> RouterAgentState:
         vendor_id = state.get("vendor_id")
         tokens = state.get("tokens", 0)
 
         try:
+            if self.settlement:
+                # Only a ledger append; the netted transfer happens when the vendor's window closes
+                service = self.settlement_service or get_settlement_service()
+                entry = service.record(vendor_id, tokens, give_ref=state.get("give_ref"))
+                logger.info(
+                    f"[RouterAgent] Queued {tokens} tokens -> vendor {vendor_id} for settlement "
+                    f"(entry {entry['entry_id']}, {entry['vendor_open_tokens']} tokens open)"
+                )
+                return {**state, "status": "pending_settlement", "settlement_entry": entry["entry_id"]}
+
             logger.info(f"[RouterAgent] Initiating token transfer: {tokens} tokens -> vendor {vendor_id}")
 
             # Placeholder for real logic (e.g., smart contract call, API)
@@ -1,120 +1,536 @@
 from langchain_core.tools import tool
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import AnyMessage, SystemMessage, ToolMessage, HumanMessage
-from langchain_groq import ChatGroq
 
-from groq import Groq
-
-import base64
-from typing import TypedDict, Annotated
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TypedDict, Annotated, Literal, Optional
 import operator
 import re
+import tempfile
 
-from dotenv import load_dotenv
-
-from datetime import datetime
+import numpy as np
+from PIL import Image
 
-from utils.logger import setup_logger
+from utils.logger import log_run_banner, setup_logger
+from utils.image_preprocessing import preprocess_image
+from utils import llm_client
+from utils.llm_client import loop_cached
+from utils.async_runner import run_sync
+from utils.model_provider import get_provider
+from utils.tracing import span, traced
+from utils.llm_scheduler import LLMUnavailableError, scheduler
+from utils.revalidation import get_revalidation_queue
 
 logger = setup_logger("PhotoValidatorAgent", "photo_validator", "photo.log")
 
-# Just for logging purposes
-logger.info("")
-logger.info("=" * 60)
-logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-logger.info("=" * 60)
-logger.info("")
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+TEXT_MODEL = "llama-3.3-70b-versatile"
+
+# "agent": text model drives the vision tool and scores its description (3+ calls)
+# "single": one vision call returns the score and reasoning as JSON
+ValidationMode = Literal["agent", "single"]
+VALIDATION_MODES = ("agent", "single")
+
+# Rough prompt + image + completion sizes, used to pace calls against the token quota
+VISION_TOKEN_ESTIMATE = 2000
+TEXT_TOKEN_ESTIMATE = 1500
+
+# Per-validation limits of the agent loop; running out ends the loop with `budget_exhausted` set
+AGENT_MAX_TURNS = int(os.getenv("W2G_AGENT_MAX_TURNS", "4"))
+AGENT_TOKEN_BUDGET = int(os.getenv("W2G_AGENT_TOKEN_BUDGET", "12000"))
+AGENT_TIME_BUDGET = float(os.getenv("W2G_AGENT_TIME_BUDGET", "45"))
+# Messages resent to the model besides the original request
+AGENT_HISTORY_MESSAGES = int(os.getenv("W2G_AGENT_HISTORY_MESSAGES", "6"))
+
+# What to do when the model provider is unavailable (circuit open or retries exhausted):
+# "none" raises LLMUnavailableError, "queue" queues the photo for re-validation, and
+# "heuristic" also returns a provisional score computed locally from the prefilter stats
+PhotoFallback = Literal["none", "heuristic", "queue"]
+PHOTO_FALLBACKS = ("none", "heuristic", "queue")
+PHOTO_FALLBACK = os.getenv("W2G_PHOTO_FALLBACK", "none")
+# How several proof photos of one give combine: "any" passes on the first valid photo,
+# "majority" needs more than half valid, "max" takes the best-scoring photo
+MultiPhotoPolicy = Literal["any", "majority", "max"]
+PHOTO_POLICIES = ("any", "majority", "max")
+PHOTO_POLICY = os.getenv("W2G_PHOTO_POLICY", "any")
+MAX_PROOF_PHOTOS = int(os.getenv("W2G_MAX_PROOF_PHOTOS", "10"))
+
+# Heuristic scores are capped below the acceptance threshold so an outage never auto-accepts a give
+HEURISTIC_MAX_SCORE = float(os.getenv("W2G_HEURISTIC_MAX_SCORE", "0.7"))
+
+VALIDATION_PROMPT = """
+        You are a donation validation agent. You'll be given a description of an image.
+        Based on the description, determine whether the image clearly shows a successful donation,
+        such as a child receiving a snack or a donation being handed over.
+        Assign a score (0 to 1) based on how likely the image is valid, where 1 is highly valid.
+        Reply with Score: <value> and explain why.
+        """
+
+SINGLE_CALL_PROMPT = """
+You are a donation validation agent. Look at this image and determine whether it clearly shows
+a successful donation, such as a child receiving a snack or a donation being handed over.
+Assign a score (0 to 1) based on how likely the image is valid, where 1 is highly valid.
+Reply only with a JSON object of the form {"score": <value>, "reasoning": "<short explanation>"}.
+"""
+
+
+# In-memory uploads, addressed as "upload:<sha256>" so the tool can resolve them like paths
+_uploads: dict[str, list] = {}
+_uploads_lock = threading.Lock()
+
+
+@contextmanager
+def registered_upload(image_bytes: bytes):
+    ref = f"upload:{hashlib.sha256(image_bytes).hexdigest()}"
+    with _uploads_lock:
+        entry = _uploads.setdefault(ref, [image_bytes, 0])
+        entry[1] += 1
+    try:
+        yield ref
+    finally:
+        with _uploads_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _uploads[ref]
+
+
+def read_photo(photo_path: str) -> bytes:
+    entry = _uploads.get(photo_path)
+    if entry is not None:
+        return entry[0]
+    with open(photo_path, "rb") as img_file:
+        return img_file.read()
+
+
+def encode_photo(photo_path: str) -> tuple[str, str]:
+    """
+    The photo as a data URI for the vision model, and the sha256 of its original bytes.
+    """
+    data = read_photo(photo_path)
+    prepared = preprocess_image(data)
+    logger.info(
+        f"[PhotoValidatorAgent] - Prepared {prepared.mime_type} {prepared.width}x{prepared.height}: "
+        f"{prepared.original_bytes} -> {prepared.encoded_bytes} bytes (saved {prepared.bytes_saved})"
+    )
+    return prepared.data_uri, hashlib.sha256(data).hexdigest()
+
+
+# --- Local prefilter: junk and near-duplicate detection (CPU only, no LLM call) ---
+
+PREFILTER_MIN_EDGE = int(os.getenv("W2G_PREFILTER_MIN_EDGE", "160"))
+PREFILTER_MIN_STDDEV = float(os.getenv("W2G_PREFILTER_MIN_STDDEV", "12"))
+PREFILTER_MIN_SHARPNESS = float(os.getenv("W2G_PREFILTER_MIN_SHARPNESS", "15"))
+DUPLICATE_MAX_DISTANCE = int(os.getenv("W2G_DUPLICATE_MAX_DISTANCE", "6"))
+PROOF_HASH_INDEX = os.getenv(
+    "W2G_PROOF_HASH_INDEX",
+    os.path.join(os.path.dirname(__file__), "../../data/proof_hashes.jsonl")
+)
+
+# Orthonormal DCT-II basis for the 32x32 pHash, computed once
+_DCT_N = 32
+_DCT_MATRIX = np.sqrt(2 / _DCT_N) * np.cos(
+    np.pi * (2 * np.arange(_DCT_N)[None, :] + 1) * np.arange(_DCT_N)[:, None] / (2 * _DCT_N)
+)
+_DCT_MATRIX[0] /= np.sqrt(2)
+
+
+def perceptual_hash(gray: Image.Image) -> int:
+    """
+    64-bit DCT perceptual hash: low-frequency 8x8 block compared against its median.
+    """
+    pixels = np.asarray(gray.resize((_DCT_N, _DCT_N), Image.Resampling.LANCZOS), dtype=np.float32)
+    low = (_DCT_MATRIX @ pixels @ _DCT_MATRIX.T)[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes for Hamming-radius lookups.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, phash: int, item):
+        node = [phash, item, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming_distance(phash, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, phash: int, max_distance: int) -> list[tuple[int, object]]:
+        matches = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_hash, item, children = stack.pop()
+            distance = hamming_distance(phash, node_hash)
+            if distance <= max_distance:
+                matches.append((distance, item))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches, key=lambda m: m[0])
+
+
+class ProofHashIndex:
+    """
+    Hashes of previously accepted proofs, kept in a BK-tree and persisted as JSONL.
+    Each hash is stored with the proof it came from (photo path, content sha256,
+    give and vendor), so validating the same proof again never matches itself.
+    """
+
+    def __init__(self, path: str = PROOF_HASH_INDEX):
+        self.path = path
+        self.tree = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        self.tree = BKTree()
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.tree.add(int(entry.pop("phash"), 16), entry)
+            logger.info(f"[PhotoValidatorAgent] - Loaded {self.tree.size} proof hashes")
+
+    @staticmethod
+    def same_proof(entry: dict, proof: dict) -> bool:
+        """
+        Whether an indexed entry is `proof` itself: re-runs, job retries and
+        resumes of one give re-validate the same photo. Only a proof naming its
+        give can be recognized; without a `give_ref` (or against older lines
+        that did not record one) any match is a duplicate.
+        """
+        if proof.get("give_ref") is None or entry.get("give_ref") != proof["give_ref"]:
+            return False
+        return all(proof.get(key) == value for key, value in entry.items())
+
+    def find_duplicate(self, phash: int, proof: dict, max_distance: int = DUPLICATE_MAX_DISTANCE):
+        """
+        The closest accepted proof within `max_distance` that is not `proof` itself, as (distance, entry).
+        """
+        with self.lock:
+            if self.tree is None:
+                self._load()
+            matches = self.tree.search(phash, max_distance)
+        return next((m for m in matches if not self.same_proof(m[1], proof)), None)
+
+    def add(self, phash: int, proof: dict):
+        with self.lock:
+            if self.tree is None:
+                self._load()
+            if any(entry == proof for _, entry in self.tree.search(phash, 0)):
+                return
+            self.tree.add(phash, proof)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"phash": f"{phash:016x}", **proof}) + "\n")
+
+
+proof_index = ProofHashIndex()
+
+
+@traced("PhotoValidatorAgent.prefilter", kind="step")
+def prefilter_photo(photo_path: str, give_ref: str = None, vendor_id: str = None) -> dict:
+    """
+    Cheap local checks run before any model call. Rejects tiny, blank/flat and
+    heavily blurred images, and near-duplicates of proofs accepted for another
+    give (`give_ref`) or vendor, or under another path or content.
+    """
+    data = read_photo(photo_path)
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        img.draft("L", (256, 256))
+        gray = img.convert("L")
+    gray.thumbnail((256, 256))
+
+    pixels = np.asarray(gray, dtype=np.float32)
+    laplacian = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+        - 4 * pixels[1:-1, 1:-1]
+    )
+    report = {
+        "width": width,
+        "height": height,
+        "stddev": round(float(pixels.std()), 2),
+        "sharpness": round(float(laplacian.var()), 2),
+        "phash": perceptual_hash(gray),
+        "proof": {
+            "photo": photo_path,
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "give_ref": give_ref,
+            "vendor_id": vendor_id
+        },
+        "rejected": None
+    }
+
+    if min(width, height) < PREFILTER_MIN_EDGE:
+        report["rejected"] = f"image too small ({width}x{height})"
+    elif report["stddev"] < PREFILTER_MIN_STDDEV:
+        report["rejected"] = f"image is blank or flat (stddev={report['stddev']})"
+    elif report["sharpness"] < PREFILTER_MIN_SHARPNESS:
+        report["rejected"] = f"image too blurry (sharpness={report['sharpness']})"
+    else:
+        duplicate = proof_index.find_duplicate(report["phash"], report["proof"])
+        if duplicate:
+            report["duplicate_of"] = duplicate[1]["photo"]
+            report["rejected"] = f"near-duplicate of accepted proof {duplicate[1]['photo']} (distance={duplicate[0]})"
+    return report
+
+
+def heuristic_score(report: dict, max_score: float = HEURISTIC_MAX_SCORE) -> float:
+    """
+    Rough local quality score from the prefilter stats: sharp, detailed and
+    large enough photos score higher. It says nothing about the content, so it
+    is only used as a provisional score while the model is unavailable.
+    """
+    sharpness = report["sharpness"] / (report["sharpness"] + 200)
+    contrast = report["stddev"] / (report["stddev"] + 40)
+    size = min(min(report["width"], report["height"]) / 1024, 1.0)
+    return round(max_score * (sharpness + contrast + size) / 3, 3)
 
-load_dotenv()
 
 @tool
-def validate_donation_photo(photo_path: str) -> str:
+async def validate_donation_photo(photo_path: str) -> str:
     """
     Uses the Groq vision model to extract a description of the donation/giving photo.
     This tool does NOT determine if it's valid or not — it just returns the description.
     """
     try:
-        with open(photo_path, "rb") as img_file:
-            encoded = base64.b64encode(img_file.read()).decode("utf-8")
-        data_uri = f"data:image/jpeg;base64,{encoded}"
+        # Decoding and resizing is CPU-bound, keep it off the event loop
+        data_uri, image_sha256 = await asyncio.to_thread(encode_photo, photo_path)
     except FileNotFoundError:
         logger.error(f"Photo not found: {photo_path}")
         return "Image file error"
+    except (OSError, ValueError) as e:
+        logger.error(f"Unreadable photo {photo_path}: {e}")
+        return "Image file error"
 
-    client = Groq()
-
-    completion = client.chat.completions.create(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Describe what's happening in this image."},
-                    {"type": "image_url", "image_url": {"url": data_uri}}
-                ]
-            }
-        ],
-        temperature=0.4,
-        max_tokens=512
+    provider = get_provider()
+
+    return await scheduler.call(
+        lambda: provider.complete_vision(
+            VISION_MODEL,
+            "Describe what's happening in this image.",
+            data_uri,
+            temperature=0.4,
+            max_tokens=512,
+            image_sha256=image_sha256
+        ),
+        tokens=VISION_TOKEN_ESTIMATE,
+        key=("describe", provider.name, image_sha256)
+    )
+
+
+def parse_single_call_response(text: str) -> tuple[float, str]:
+    """
+    Parses the JSON reply of the single-call mode. Falls back to the
+    "Score: <value>" pattern if the model did not return valid JSON.
+    """
+    try:
+        payload = json.loads(text)
+        score = float(payload.get("score", 0.0))
+        reasoning = str(payload.get("reasoning", ""))
+    except (ValueError, TypeError, AttributeError):
+        match = re.search(r"(score[\"':\s]*)(\d+(\.\d+)?)", text.lower())
+        if not match:
+            logger.warning("[PhotoValidatorAgent] - No score found in single-call output.")
+            return 0.0, text
+        score, reasoning = float(match.group(2)), text
+    return min(max(score, 0.0), 1.0), reasoning
+
+
+@traced("PhotoValidatorAgent.single_call", kind="llm")
+async def validate_single_call(photo_path: str, threshold: float = 0.75) -> dict:
+    """
+    Scores the photo with one vision request instead of the tool-calling loop.
+    """
+    try:
+        # Decoding and resizing is CPU-bound, keep it off the event loop
+        data_uri, image_sha256 = await asyncio.to_thread(encode_photo, photo_path)
+    except FileNotFoundError:
+        logger.error(f"Photo not found: {photo_path}")
+        return {"validation_result": False, "score": 0.0, "reasoning": "Image file error"}
+    except (OSError, ValueError) as e:
+        logger.error(f"Unreadable photo {photo_path}: {e}")
+        return {"validation_result": False, "score": 0.0, "reasoning": "Image file error"}
+
+    provider = get_provider()
+
+    content = await scheduler.call(
+        lambda: provider.complete_vision(
+            VISION_MODEL,
+            SINGLE_CALL_PROMPT,
+            data_uri,
+            temperature=0.2,
+            max_tokens=256,
+            json_mode=True,
+            image_sha256=image_sha256
+        ),
+        tokens=VISION_TOKEN_ESTIMATE,
+        key=("score", provider.name, image_sha256)
     )
 
-    return completion.choices[0].message.content
+    score, reasoning = parse_single_call_response(content)
+    logger.info(f"[PhotoValidatorAgent] - Single-call reasoning: {reasoning}")
+    return {
+        "validation_result": score >= threshold,
+        "score": score,
+        "reasoning": reasoning
+    }
+
 
 class AgentState(TypedDict):
+    # Reducer appends: nodes return only the messages they add
     messages: Annotated[list[AnyMessage], operator.add]
     score: float
     validation_result: bool
+    model_failed: bool
+    model_error: str
+    turns: int
+    tokens_used: int
+    started_at: float
+    budget_exhausted: Optional[str]
+    tool_error: bool
 
 class PhotoValidatorAgent:
-    def __init__(self, model, tools, system_prompt: str = "", threshold: float = 0.75):
+    def __init__(self, model, tools, system_prompt: str = "", threshold: float = 0.75,
+                 max_turns: int = AGENT_MAX_TURNS, token_budget: int = AGENT_TOKEN_BUDGET,
+                 time_budget: float = AGENT_TIME_BUDGET, history_messages: int = AGENT_HISTORY_MESSAGES):
         self.system = system_prompt or "You are a donation validator. Assign a score and decide if the photo is valid."
         self.tools = {t.name: t for t in tools}
         self.model = model.bind_tools(tools)
         self.threshold = threshold
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.time_budget = time_budget
+        self.history_messages = history_messages
 
         graph = StateGraph(AgentState)
         graph.add_node("llm", self.call_model)
         graph.add_node("action", self.take_action)
         graph.add_conditional_edges("llm", self.exists_action, {True: "action", False: END})
-        graph.add_edge("action", "llm")
+        graph.add_conditional_edges("action", self.within_budget, {True: "llm", False: END})
         graph.set_entry_point("llm")
 
-        self.graph = graph.compile()
+        # Never inherit a checkpointer from the master flow's config: its saver is
+        # sync-only, and a validation is one unit of work that is not resumed mid-loop
+        self.graph = graph.compile(checkpointer=False)
 
     def exists_action(self, state: AgentState) -> bool:
         if state.get("model_failed"):
             logger.warning("[PhotoValidatorAgent] - Model failed, stopping flow.")
             return False
+        if state.get("budget_exhausted"):
+            return False
         last_message = state["messages"][-1]
         logger.info(f"[PhotoValidatorAgent] - Checking for tool calls in message")
         return len(last_message.tool_calls) > 0
 
-    def call_model(self, state: AgentState) -> AgentState:
-        messages = state["messages"]
+    def within_budget(self, state: AgentState) -> bool:
+        return not (state.get("model_failed") or state.get("budget_exhausted") or state.get("tool_error"))
+
+    def check_budget(self, state: AgentState) -> str | None:
+        """
+        Name of the first exhausted budget, or None.
+        """
+        if state.get("turns", 0) >= self.max_turns:
+            return "max_turns"
+        if state.get("tokens_used", 0) >= self.token_budget:
+            return "tokens"
+        if time.monotonic() - state.get("started_at", time.monotonic()) >= self.time_budget:
+            return "time"
+        return None
+
+    def trim_history(self, messages: list[AnyMessage]) -> list[AnyMessage]:
+        """
+        The original request plus the most recent messages, never starting the
+        tail on a ToolMessage whose tool call was cut off.
+        """
+        if len(messages) <= self.history_messages + 1:
+            return messages
+        tail = messages[-self.history_messages:]
+        while tail and isinstance(tail[0], ToolMessage):
+            tail = tail[1:]
+        return [messages[0]] + tail
+
+    @traced("PhotoValidatorAgent.llm", kind="llm")
+    async def call_model(self, state: AgentState) -> AgentState:
+        exhausted = self.check_budget(state)
+        if exhausted:
+            logger.warning(f"[PhotoValidatorAgent] - Budget exhausted ({exhausted}) after {state.get('turns', 0)} turns")
+            return {"budget_exhausted": exhausted}
+
+        messages = self.trim_history(state["messages"])
         if self.system:
+            # Sent with every request, never stored in the state
             messages = [SystemMessage(content=self.system)] + messages
-        logger.info(f"[PhotoValidatorAgent] - Calling model with messages")
+        logger.info(f"[PhotoValidatorAgent] - Calling model with {len(messages)} messages")
+        remaining = self.time_budget - (time.monotonic() - state.get("started_at", time.monotonic()))
         try:
-            response = self.model.invoke(messages)
-            score = self.extract_score(response.content)
-            validation = score >= self.threshold
-            return {
-                "messages": messages + [response],
-                "score": score,
-                "validation_result": validation
-            }
-        except Exception as e:
+            response = await asyncio.wait_for(
+                scheduler.call(lambda: self.model.ainvoke(messages), tokens=TEXT_TOKEN_ESTIMATE),
+                timeout=max(remaining, 0.001)
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"[PhotoValidatorAgent] - Budget exhausted (time) waiting for the model")
+            return {"turns": state.get("turns", 0) + 1, "budget_exhausted": "time"}
+        except LLMUnavailableError as e:
+            # A rejected request propagates as an error; only outages end the loop as model_failed
             logger.error(f"[PhotoValidatorAgent] - {e}")
             return {
-                **state,
                 "validation_result": False,
                 "score": 0.0,
-                "model_failed": True
+                "model_failed": True,
+                "model_error": str(e)
             }
 
-    def take_action(self, state: AgentState):
+        usage = getattr(response, "usage_metadata", None) or {}
+        update = {
+            "messages": [response],
+            "turns": state.get("turns", 0) + 1,
+            "tokens_used": state.get("tokens_used", 0) + usage.get("total_tokens", TEXT_TOKEN_ESTIMATE)
+        }
+        if not response.tool_calls:
+            score = self.extract_score(response.content)
+            update.update(score=score, validation_result=score >= self.threshold)
+        return update
+
+    @traced("PhotoValidatorAgent.action")
+    async def take_action(self, state: AgentState):
+        # A tool result that no further model turn could read is not worth running
+        exhausted = self.check_budget(state)
+        if exhausted:
+            logger.warning(f"[PhotoValidatorAgent] - Budget exhausted ({exhausted}) before running tools")
+            return {"budget_exhausted": exhausted}
+
         tool_call = state["messages"][-1].tool_calls
         results = []
+        tokens_used = state.get("tokens_used", 0)
 
         for t in tool_call:
             logger.debug(f"[PhotoValidatorAgent] - Calling tool: {t['name']}")
@@ -124,19 +540,30 @@ class PhotoValidatorAgent:
             else:
                 args = t.get("args", {})
                 photo_path = args.get("photo_path", "")
-                result = self.tools[t["name"]].invoke(photo_path)
+                try:
+                    with span(f"tool.{t['name']}", kind="tool", inputs=args) as tool_span:
+                        result = await self.tools[t["name"]].ainvoke(photo_path)
+                        if tool_span:
+                            tool_span.set_output(result)
+                    # The vision call reports no usage back through the tool; count its estimate
+                    tokens_used += VISION_TOKEN_ESTIMATE
+                except LLMUnavailableError as e:
+                    logger.error(f"[PhotoValidatorAgent] - {e}")
+                    return {"validation_result": False, "score": 0.0, "model_failed": True, "model_error": str(e)}
 
             # Short-circuit: if result is error, do not return to loop
             if result == "Image file error":
                 logger.warning("Stopping early due to image error.")
                 return {
-                    "messages": state["messages"] + [ToolMessage(
+                    "messages": results + [ToolMessage(
                         tool_call_id=t["id"],
                         name=t["name"],
                         content=str(result)
                     )],
                     "score": 0.0,
-                    "validation_result": False
+                    "validation_result": False,
+                    "tokens_used": tokens_used,
+                    "tool_error": True
                 }
             
             results.append(
@@ -147,7 +574,8 @@ class PhotoValidatorAgent:
                 )
             )
         return {
-            "messages": state["messages"] + results
+            "messages": results,
+            "tokens_used": tokens_used
         }
 
     def extract_score(self, text: str) -> float:
@@ -158,45 +586,317 @@ class PhotoValidatorAgent:
         return 0.0
 
 
-def test(photo_path: str) -> dict:
+def get_photo_agent() -> PhotoValidatorAgent:
+    """
+    One compiled agent per event loop and provider, bound to the shared async clients.
+    """
+    provider = get_provider()
+    return loop_cached(("photo_agent", provider.name), lambda: PhotoValidatorAgent(
+        provider.chat_model(TEXT_MODEL),
+        tools=[validate_donation_photo],
+        system_prompt=VALIDATION_PROMPT
+    ))
+
 
+@traced("PhotoValidatorAgent.validate", kind="agent")
+async def avalidate_photo(
+    photo_path: str = None, mode: ValidationMode = "agent", image_bytes: bytes = None,
+    fallback: PhotoFallback = None, give_ref: str = None, vendor_id: str = None
+) -> dict:
+    """
+    Validates a photo given either a path on this server or the raw uploaded bytes.
+    `fallback` (default W2G_PHOTO_FALLBACK) decides what happens when the model is unavailable.
+    `give_ref` and `vendor_id` identify the give the photo proves, for duplicate detection.
+    """
+    if image_bytes is not None:
+        with registered_upload(image_bytes) as ref:
+            return await avalidate_photo(ref, mode=mode, fallback=fallback, give_ref=give_ref, vendor_id=vendor_id)
+
+    log_run_banner(logger)
     logger.info("")
-    logger.info("[2/4] Running PhotoValidatorAgent...")
-    model = ChatGroq(model_name="llama-3.3-70b-versatile")
+    logger.info(f"[2/4] Running PhotoValidatorAgent (mode={mode})...")
+    started = time.perf_counter()
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode '{mode}', expected one of {VALIDATION_MODES}")
+    fallback = fallback or PHOTO_FALLBACK
+    if fallback not in PHOTO_FALLBACKS:
+        raise ValueError(f"Unknown photo fallback '{fallback}', expected one of {PHOTO_FALLBACKS}")
 
-    photo_agent = PhotoValidatorAgent(
-        model,
-        tools=[validate_donation_photo],
-        system_prompt="""
-        You are a donation validation agent. You'll be given a description of an image.
-        Based on the description, determine whether the image clearly shows a successful donation,
-        such as a child receiving a snack or a donation being handed over.
-        Assign a score (0 to 1) based on how likely the image is valid, where 1 is highly valid.
-        Reply with Score: <value> and explain why.
-        """
+    try:
+        prefilter = await asyncio.to_thread(prefilter_photo, photo_path, give_ref, vendor_id)
+    except (OSError, ValueError) as e:
+        logger.error(f"Unreadable photo {photo_path}: {e}")
+        return {"validation_result": False, "score": 0.0, "reason": "Image file error"}
+
+    if prefilter["rejected"]:
+        logger.warning(f"[PhotoValidatorAgent] - Rejected locally: {prefilter['rejected']}")
+        return {"validation_result": False, "score": 0.0, "reason": prefilter["rejected"]}
+
+    try:
+        if mode == "single":
+            result = await validate_single_call(photo_path)
+        else:
+            result = await get_photo_agent().graph.ainvoke({
+                "messages": [
+                    HumanMessage(content=f"Please validate this donation photo: {photo_path}")
+                ],
+                "score": 0.0,
+                "validation_result": False,
+                "turns": 0,
+                "tokens_used": 0,
+                "started_at": time.monotonic()
+            })
+            if result.get("model_failed"):
+                # Surface outages to the caller instead of recording them as a failed proof
+                raise LLMUnavailableError(result.get("model_error", "Model call failed"))
+    except LLMUnavailableError as e:
+        if fallback == "none":
+            raise
+        return await fallback_result(photo_path, mode, fallback, prefilter, e, started)
+
+    if result.get("budget_exhausted"):
+        logger.warning(
+            f"[PhotoValidatorAgent] - Validation stopped: {result['budget_exhausted']} budget exhausted "
+            f"({result['turns']} turns, {result['tokens_used']} tokens)"
+        )
+
+    if result["validation_result"]:
+        await asyncio.to_thread(proof_index.add, prefilter["phash"], prefilter["proof"])
+
+    logger.info(f"[PhotoValidatorAgent] - Score: {result['score']}")
+    logger.info(f"[PhotoValidatorAgent] - Result: {result['validation_result']}")
+    usage = {
+        "turns": result.get("turns", 1),
+        "tokens": result.get("tokens_used", VISION_TOKEN_ESTIMATE),
+        "budget_exhausted": result.get("budget_exhausted")
+    }
+    logger.info(
+        "[PhotoValidatorAgent] Execution completed.",
+        extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1), "mode": mode, **usage}
     )
+    logger.info("")
+    return {
+        "validation_result": result["validation_result"],
+        "score": result["score"],
+        "usage": usage
+    }
+
 
-    photo_path = photo_path
-
-    result = photo_agent.graph.invoke({
-        "messages": [
-            HumanMessage(content=f"Please validate this donation photo: {photo_path}")
-        ],
-        "score": 0.0,
-        "validation_result": False
-    })
-    
-    val_result = result['validation_result']
-    score = result['score']
-    logger.info(f"[PhotoValidatorAgent] - Score: {score}")
-    logger.info(f"[PhotoValidatorAgent] - Result: {val_result}")
-    logger.info("[PhotoValidatorAgent] Execution completed.")
+def decide_policy(policy: MultiPhotoPolicy, results: list, total: int) -> bool | None:
+    """
+    The combined verdict once it can no longer change, else None. `results`
+    holds the verdicts of the photos validated so far.
+    """
+    passed = sum(1 for r in results if r["validation_result"])
+    failed = len(results) - passed
+    if policy == "any":
+        if passed:
+            return True
+        return False if failed == total else None
+    if policy == "majority":
+        needed = total // 2 + 1
+        if passed >= needed:
+            return True
+        return False if failed > total - needed else None
+    # "max": only a perfect score can't be beaten by the photos still running
+    if any(r["score"] is not None and r["score"] >= 1.0 for r in results):
+        return True
+    if len(results) == total:
+        best = max(results, key=lambda r: r["score"] or 0.0)
+        return best["validation_result"]
+    return None
+
+
+async def avalidate_photos(
+    photo_paths: list[str], mode: ValidationMode = "agent", policy: MultiPhotoPolicy = None,
+    fallback: PhotoFallback = None, give_ref: str = None, vendor_id: str = None
+) -> dict:
+    """
+    Validates several proof photos of one give concurrently and combines them
+    with `policy` (default W2G_PHOTO_POLICY). As soon as the verdict is
+    settled the remaining validations are cancelled, along with their model
+    calls, so a give costs as much as the photos needed to decide it.
+    """
+    policy = policy or PHOTO_POLICY
+    if policy not in PHOTO_POLICIES:
+        raise ValueError(f"Unknown photo policy '{policy}', expected one of {PHOTO_POLICIES}")
+    if not photo_paths:
+        raise ValueError("At least one photo is required")
+    if len(photo_paths) > MAX_PROOF_PHOTOS:
+        raise ValueError(f"At most {MAX_PROOF_PHOTOS} photos can be validated per give")
+    if len(photo_paths) == 1:
+        result = await avalidate_photo(photo_paths[0], mode=mode, fallback=fallback, give_ref=give_ref, vendor_id=vendor_id)
+        return {**result, "policy": policy, "photos": [{"photo": photo_paths[0], **result}]}
+
+    started = time.perf_counter()
+    tasks = {
+        asyncio.ensure_future(avalidate_photo(
+            path, mode=mode, fallback=fallback, give_ref=give_ref, vendor_id=vendor_id
+        )): i
+        for i, path in enumerate(photo_paths)
+    }
+    photos = [{"photo": path, "status": "cancelled"} for path in photo_paths]
+    results, outage, verdict = [], None, None
+    pending = set(tasks)
+    try:
+        while pending and verdict is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = tasks[task]
+                try:
+                    result = task.result()
+                except LLMUnavailableError as e:
+                    # An outage is not a negative verdict: it only counts if nothing else settles the give
+                    outage = e
+                    result = {"validation_result": False, "score": None, "status": "model_unavailable"}
+                photos[i] = {"photo": photo_paths[i], **result}
+                results.append(result)
+            verdict = decide_policy(policy, results, len(photo_paths))
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if not verdict and outage is not None:
+        raise outage
+    scored = [r for r in results if r["score"] is not None]
+    best = max(scored, key=lambda r: r["score"]) if scored else {"score": None}
+    logger.info(
+        f"[PhotoValidatorAgent] - {policy} of {len(photo_paths)} photos: {verdict} "
+        f"after {len(results)} validations ({len(pending)} cancelled)",
+        extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1), "mode": mode}
+    )
+    return {
+        "validation_result": verdict,
+        "score": best["score"],
+        "policy": policy,
+        "photos": photos,
+    }
+
+
+async def fallback_result(
+    photo_path: str, mode: ValidationMode, fallback: PhotoFallback, prefilter: dict,
+    error: LLMUnavailableError, started: float
+) -> dict:
+    """
+    Answers without the model: the photo is queued for re-validation and, for
+    the "heuristic" fallback, given a provisional local score. Neither counts
+    as an accepted proof.
+    """
+    image_bytes = read_photo(photo_path) if photo_path.startswith("upload:") else None
+    item_id = await asyncio.to_thread(get_revalidation_queue().add, photo_path, mode, image_bytes)
+    logger.warning(f"[PhotoValidatorAgent] - Model unavailable ({error}); queued for re-validation as #{item_id}")
+
+    result = {"validation_result": False, "status": "queued_for_revalidation", "revalidation_id": item_id}
+    if fallback == "heuristic":
+        result.update(score=heuristic_score(prefilter), provisional=True)
+        logger.info(f"[PhotoValidatorAgent] - Provisional heuristic score: {result['score']}")
+    else:
+        result["score"] = None
+    logger.info(
+        "[PhotoValidatorAgent] Execution completed.",
+        extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1), "mode": mode, "fallback": fallback}
+    )
     logger.info("")
-    return val_result, score
+    return result
+
+
+async def revalidate_queued(limit: int = 100) -> dict:
+    """
+    Re-runs validation for photos queued during an outage. Stops early while
+    the model is still unavailable, leaving the rest queued.
+    """
+    queue = get_revalidation_queue()
+    counts = {"validated": 0, "failed": 0, "remaining": 0}
+    for item in await asyncio.to_thread(queue.pending, limit):
+        try:
+            image_bytes = await asyncio.to_thread(queue.load, item)
+            result = await avalidate_photo(
+                item["photo_path"], mode=item["mode"], image_bytes=image_bytes, fallback="none"
+            )
+        except LLMUnavailableError as e:
+            await asyncio.to_thread(queue.fail, item["item_id"], str(e))
+            logger.warning(f"[PhotoValidatorAgent] - Model still unavailable, re-validation paused: {e}")
+            break
+        except Exception as e:
+            await asyncio.to_thread(queue.fail, item["item_id"], str(e))
+            counts["failed"] += 1
+            continue
+        await asyncio.to_thread(queue.complete, item["item_id"], result["validation_result"], result["score"])
+        counts["validated"] += 1
+    counts["remaining"] = (await asyncio.to_thread(queue.summary)).get("pending", 0)
+    return counts
+
+
+def test(photo_path: str, mode: ValidationMode = "agent", give_ref: str = None,
+         vendor_id: str = None) -> tuple[bool, float]:
+    """
+    Blocking entry point for scripts and the master flow, run on the shared
+    background loop. From a running event loop, await avalidate_photo() instead.
+    """
+    result = run_sync(avalidate_photo(photo_path, mode=mode, give_ref=give_ref, vendor_id=vendor_id))
+    return result["validation_result"], result["score"]
+
+
+def test_photos(photo_paths: list[str], mode: ValidationMode = "agent", policy: MultiPhotoPolicy = None,
+                give_ref: str = None, vendor_id: str = None) -> dict:
+    """
+    Blocking counterpart of avalidate_photos() for several proof photos.
+    """
+    return run_sync(avalidate_photos(photo_paths, mode=mode, policy=policy, give_ref=give_ref, vendor_id=vendor_id))
+
+
+def compare_modes(image_dir: str = "images") -> list[dict]:
+    """
+    Runs both validation modes over the sample giving_*/not_giving_* images
+    so the single-call scores can be checked against the agent loop. Photos
+    accepted here go to a throwaway proof index, not the real one.
+    """
+    global proof_index
+    rows = []
+    real_index = proof_index
+    with tempfile.TemporaryDirectory() as scratch:
+        proof_index = ProofHashIndex(os.path.join(scratch, "proof_hashes.jsonl"))
+        try:
+            for photo in sorted(Path(image_dir).glob("*giving_*.jpg")):
+                row = {"photo": photo.name, "expected": not photo.name.startswith("not_")}
+                for mode in VALIDATION_MODES:
+                    row[f"{mode}_result"], row[f"{mode}_score"] = test(str(photo), mode=mode)
+                rows.append(row)
+                print(row)
+        finally:
+            proof_index = real_index
+    return rows
 
 
 # Example usage
 if __name__ == "__main__":
-    result, score = test("../images/sharing.jpg")
-    print("Final Result:", result)
-    print("Score:", score)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Validate a donation photo.")
+    parser.add_argument("photo_paths", nargs="*", default=["../images/sharing.jpg"])
+    parser.add_argument("--mode", choices=VALIDATION_MODES, default="agent")
+    parser.add_argument("--policy", choices=PHOTO_POLICIES, help="How several photos combine (default W2G_PHOTO_POLICY)")
+    parser.add_argument("--compare", metavar="IMAGE_DIR", help="Compare both modes over the sample images")
+    parser.add_argument("--revalidate", type=int, nargs="?", const=100, metavar="LIMIT",
+                        help="Re-validate photos queued while the model was unavailable")
+    args = parser.parse_args()
+
+    if args.revalidate:
+        async def _revalidate():
+            try:
+                return await revalidate_queued(args.revalidate)
+            finally:
+                await llm_client.aclose()
+        print(asyncio.run(_revalidate()))
+    elif args.compare:
+        compare_modes(args.compare)
+    elif len(args.photo_paths) > 1:
+        result = test_photos(args.photo_paths, mode=args.mode, policy=args.policy)
+        print("Final Result:", result["validation_result"])
+        print("Score:", result["score"])
+        for photo in result["photos"]:
+            print(photo)
+    else:
+        result, score = test(args.photo_paths[0], mode=args.mode)
+        print("Final Result:", result)
+        print("Score:", score)
\ No newline at end of file
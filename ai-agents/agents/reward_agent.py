@@ -1,34 +1,97 @@
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, Callable
 from langgraph.graph import StateGraph, END
 
-from datetime import datetime
+import argparse
+import bisect
+import os
+import sqlite3
+import time
+from functools import lru_cache
 
-from utils.logger import setup_logger
+import numpy as np
+
+from utils.logger import log_run_banner, setup_logger
+from utils.tracing import traced
 
 logger = setup_logger("RewardAgent", "reward_agent", "reward.log")
 
-# Just for logging purposes
-logger.info("")
-logger.info("=" * 60)
-logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-logger.info("=" * 60)
-logger.info("")
+# The rewards service's database (users.gives holds each viewer's verified give count)
+REWARDS_DB = os.getenv("W2G_REWARDS_DB", os.path.join(os.path.dirname(__file__), "../../rewards.db"))
+# Which tier every viewer was last paid, so a sweep only dispatches upgrades
+SWEEP_STATE_DB = os.getenv(
+    "W2G_REWARD_SWEEP_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/reward_sweep.db")
+)
+SWEEP_CHUNK_SIZE = int(os.getenv("W2G_REWARD_SWEEP_CHUNK", "50000"))
+
+DEFAULT_REWARD_THRESHOLDS = {
+    10: "v-bucks",
+    20: "robux",
+    50: "mystery-nft"
+}
+
+
+class RewardTierTable:
+    """
+    Reward thresholds compiled once into ascending arrays. A viewer's tier is
+    the highest threshold <= their give count: bisect for one viewer,
+    np.searchsorted for a whole batch.
+    """
+
+    def __init__(self, reward_thresholds: dict):
+        items = sorted(reward_thresholds.items())
+        self.thresholds = [threshold for threshold, _ in items]
+        self.rewards = [reward for _, reward in items]
+        self.threshold_array = np.asarray(self.thresholds, dtype=np.int64)
+        self.reward_array = np.asarray(self.rewards, dtype=object)
+
+    def lookup(self, gives: int) -> tuple[int, str] | None:
+        i = bisect.bisect_right(self.thresholds, gives) - 1
+        return (self.thresholds[i], self.rewards[i]) if i >= 0 else None
+
+    def lookup_many(self, gives: np.ndarray) -> np.ndarray:
+        """
+        Tier index per give count; -1 where no reward is reached.
+        """
+        return np.searchsorted(self.threshold_array, gives, side="right") - 1
+
+
+@lru_cache(maxsize=32)
+def _compile_tiers(items: tuple) -> RewardTierTable:
+    return RewardTierTable(dict(items))
+
+
+def compile_tiers(reward_thresholds: dict) -> RewardTierTable:
+    # Agents are built per give; share the compiled table between them
+    return _compile_tiers(tuple(sorted(reward_thresholds.items())))
+
+
+def read_verified_gives(viewer_id: str, db_path: str = REWARDS_DB) -> int:
+    if not os.path.exists(db_path):
+        logger.warning(f"[RewardAgent] - Rewards database {db_path} not found, assuming 0 gives")
+        return 0
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT gives FROM users WHERE user_id = ?", (viewer_id,)).fetchone()
+    finally:
+        conn.close()
+    return int(row[0] or 0) if row else 0
+
 
 class RewardAgentState(TypedDict):
     viewer_id: str
-    verified_gives: int
+    verified_gives: Optional[int]
     reward_type: Optional[str]
     reward_gives: int
     reward_status: Optional[str]
 
 
 class RewardAgent:
-    def __init__(self, reward_thresholds=None):
-        self.reward_thresholds = reward_thresholds or {
-            10: "v-bucks",
-            20: "robux",
-            50: "mystery-nft"
-        }
+    def __init__(self, reward_thresholds=None, rewards_db: str = REWARDS_DB):
+        log_run_banner(logger)
+        self.reward_thresholds = reward_thresholds or DEFAULT_REWARD_THRESHOLDS
+        self.tiers = compile_tiers(self.reward_thresholds)
+        self.rewards_db = rewards_db
         self.graph = self._build_graph()
 
     def _build_graph(self):
@@ -53,34 +116,38 @@ class RewardAgent:
         builder.set_entry_point("check_reward")
         return builder.compile()
 
+    @traced("RewardAgent.check_eligibility")
     def check_eligibility(self, state: RewardAgentState) -> RewardAgentState:
+        if state.get("verified_gives") is None:
+            # Not supplied by the caller: ask the rewards service's database
+            state = {**state, "verified_gives": read_verified_gives(state["viewer_id"], self.rewards_db)}
         logger.info(f"[RewardAgent] - Checking eligibility for viewer '{state['viewer_id']}' with {state['verified_gives']} gives")
         return state
 
     def reward_router(self, state: RewardAgentState) -> str:
-        gives = state["verified_gives"]
-        for threshold in sorted(self.reward_thresholds.keys(), reverse=True):
-            if gives >= threshold:
-                state["reward_type"] = self.reward_thresholds[threshold]
-                return "dispatch_reward"
+        tier = self.tiers.lookup(state["verified_gives"])
+        if tier:
+            state["reward_type"] = tier[1]
+            return "dispatch_reward"
         return "__end__"
 
     def should_dispatch(self, state: RewardAgentState) -> str:
         return "dispatch_reward" if state.get("reward_type") else "__end__"
 
+    @traced("RewardAgent.dispatch_reward")
     def dispatch_reward(self, state: RewardAgentState) -> RewardAgentState:
         logger.info(f"[RewardAgent] - Dispatching '{state['reward_type']}' to viewer '{state['viewer_id']}'")
         # Simulate API call or smart contract interaction here
         state["reward_status"] = "delivered"
         return state
 
+    @traced("RewardAgent.assign_reward")
     def assign_reward(self, state: RewardAgentState) -> RewardAgentState:
-        gives = state["verified_gives"]
-        for threshold in sorted(self.reward_thresholds.keys(), reverse=True):
-            if gives >= threshold:
-                reward = self.reward_thresholds[threshold]
-                logger.info(f"[RewardAgent] - Assigning '{reward}' for {threshold} gives")
-                return {**state, "reward_type": reward, "reward_gives": threshold}
+        tier = self.tiers.lookup(state["verified_gives"])
+        if tier:
+            threshold, reward = tier
+            logger.info(f"[RewardAgent] - Assigning '{reward}' for {threshold} gives")
+            return {**state, "reward_type": reward, "reward_gives": threshold}
         logger.warning("[RewardAgent] - No reward eligible")
         return {**state, "reward_type": None}
 
@@ -91,13 +158,103 @@ class RewardAgent:
         logger.info("")
         return result
 
+    def sweep(self, dispatch: Callable[[list[dict]], None] = None, chunk_size: int = SWEEP_CHUNK_SIZE,
+              state_db: str = SWEEP_STATE_DB) -> dict:
+        """
+        Nightly payout over every viewer in the rewards database. Give counts
+        are streamed in chunks joined against the last tier each viewer was
+        paid; tiers are computed per chunk with searchsorted and only upgrades
+        are handed to `dispatch` (one call per chunk with a list of
+        {"viewer_id", "verified_gives", "reward_type", "reward_gives"}).
+        A chunk's new tiers are recorded only after its dispatch succeeds, so
+        an interrupted sweep resumes without paying anyone twice.
+        """
+        dispatch = dispatch or _simulate_dispatch
+        logger.info(f"[RewardAgent] - Starting reward sweep over {self.rewards_db}")
+        started = time.perf_counter()
+        stats = {"viewers": 0, "dispatched": 0, "by_reward": {}}
+
+        os.makedirs(os.path.dirname(os.path.abspath(state_db)), exist_ok=True)
+        conn = sqlite3.connect(f"file:{self.rewards_db}?mode=ro", uri=True)
+        state_conn = sqlite3.connect(state_db)
+        try:
+            with state_conn:
+                state_conn.execute("PRAGMA journal_mode=WAL")
+                state_conn.execute("""
+                    CREATE TABLE IF NOT EXISTS reward_sweep (
+                        user_id TEXT PRIMARY KEY,
+                        reward_gives INTEGER NOT NULL,
+                        reward_type TEXT NOT NULL,
+                        swept_at REAL NOT NULL
+                    )
+                """)
+            conn.execute("ATTACH DATABASE ? AS sweep", (state_db,))
+            cursor = conn.execute("""
+                SELECT u.user_id, COALESCE(u.gives, 0), COALESCE(s.reward_gives, -1)
+                FROM users u LEFT JOIN sweep.reward_sweep s ON s.user_id = u.user_id
+            """)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                viewer_ids, gives, paid = zip(*rows)
+                gives = np.fromiter(gives, dtype=np.int64, count=len(rows))
+                paid = np.fromiter(paid, dtype=np.int64, count=len(rows))
+
+                tier = self.tiers.lookup_many(gives)
+                reached = np.where(tier >= 0, self.tiers.threshold_array[np.maximum(tier, 0)], -1)
+                upgraded = np.flatnonzero(reached > paid)
+                stats["viewers"] += len(rows)
+                if not upgraded.size:
+                    continue
+
+                batch = [
+                    {"viewer_id": viewer_ids[i], "verified_gives": int(gives[i]),
+                     "reward_type": self.tiers.rewards[tier[i]], "reward_gives": int(reached[i])}
+                    for i in upgraded
+                ]
+                dispatch(batch)
+
+                now = time.time()
+                with state_conn:
+                    state_conn.executemany(
+                        "INSERT OR REPLACE INTO reward_sweep (user_id, reward_gives, reward_type, swept_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        [(r["viewer_id"], r["reward_gives"], r["reward_type"], now) for r in batch]
+                    )
+                stats["dispatched"] += len(batch)
+                rewards, counts = np.unique(self.tiers.reward_array[tier[upgraded]], return_counts=True)
+                for reward, count in zip(rewards, counts):
+                    stats["by_reward"][reward] = stats["by_reward"].get(reward, 0) + int(count)
+        finally:
+            conn.close()
+            state_conn.close()
+
+        stats["duration_s"] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"[RewardAgent] - Sweep completed: {stats['viewers']} viewers, {stats['dispatched']} rewards "
+            f"dispatched {stats['by_reward']} in {stats['duration_s']}s"
+        )
+        return stats
+
+
+def _simulate_dispatch(batch: list[dict]):
+    # Simulate API call or smart contract interaction here (one call per batch)
+    logger.info(f"[RewardAgent] - Dispatching {len(batch)} rewards")
+
 
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign a viewer's reward, or sweep rewards for every viewer.")
+    parser.add_argument("--viewer-id", default="user_123")
+    parser.add_argument("--gives", type=int, help="Verified gives (read from the rewards database if omitted)")
+    parser.add_argument("--sweep", action="store_true", help="Dispatch changed rewards for all viewers")
+    parser.add_argument("--chunk-size", type=int, default=SWEEP_CHUNK_SIZE)
+    args = parser.parse_args()
+
     agent = RewardAgent()
-    test_input = {
-        "viewer_id": "user_123",
-        "verified_gives": 60  # Should unlock mystery-nft
-    }
-    result = agent.run(test_input)
-    print(f"[RewardAgent] - Final Result: {result}")
+    if args.sweep:
+        print(f"[RewardAgent] - Sweep: {agent.sweep(chunk_size=args.chunk_size)}")
+    else:
+        result = agent.run({"viewer_id": args.viewer_id, "verified_gives": args.gives})
+        print(f"[RewardAgent] - Final Result: {result}")
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.apy_registry import VENDOR_VAULTS, get_apy_registry
+
+# JSON list of {"vendor_id", "apy", "cap", "min_stake"}; defaults to the demo vaults
+VAULT_BOOK = os.getenv("W2G_VAULT_BOOK")
+# How many of the best-yielding vaults a single allocation may spread over
+ALLOCATION_TOP_K = int(os.getenv("W2G_ALLOCATION_TOP_K", "5"))
+
+
+class VaultAllocator:
+    """
+    Splits a token amount across the best-yielding vaults, respecting each
+    vault's remaining capacity (`cap`) and minimum stake (`min_stake`).
+
+    Vault data is kept in parallel numpy arrays so ranking thousands of
+    candidates is a few vectorized passes: mask the eligible vaults, select the
+    top k by APY with argpartition (O(n), no full sort), then fill them greedily
+    in APY order with a cumulative sum.
+    """
+
+    def __init__(self, vendor_ids: list[str], apys, caps=None, minimums=None):
+        n = len(vendor_ids)
+        self.vendor_ids = np.asarray(vendor_ids, dtype=object)
+        self.index = {v: i for i, v in enumerate(vendor_ids)}
+        self.apys = np.asarray(apys, dtype=np.float64)
+        self.caps = np.full(n, np.inf) if caps is None else np.asarray(caps, dtype=np.float64)
+        self.minimums = np.zeros(n) if minimums is None else np.asarray(minimums, dtype=np.float64)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "VaultAllocator":
+        return cls(
+            [r["vendor_id"] for r in records],
+            [r["apy"] for r in records],
+            [np.inf if r.get("cap") is None else r["cap"] for r in records],
+            [r.get("min_stake", 0) for r in records],
+        )
+
+    def __len__(self) -> int:
+        return len(self.vendor_ids)
+
+    def update(self, vendor_id: str, apy: float = None, cap: float = None):
+        """
+        Refreshes one vault in place, e.g. from the APY registry or after a stake.
+        """
+        i = self.index.get(vendor_id)
+        if i is None:
+            return
+        with self.lock:
+            if apy is not None:
+                self.apys[i] = apy
+            if cap is not None:
+                self.caps[i] = cap
+
+    def update_apys(self, apys: dict):
+        """
+        Applies a batch of registry APYs; a vault the registry no longer knows (None) gets 0 and is skipped.
+        """
+        known = [(self.index[v], apy) for v, apy in apys.items() if v in self.index]
+        if not known:
+            return
+        indices, values = zip(*known)
+        with self.lock:
+            self.apys[list(indices)] = [apy or 0.0 for apy in values]
+
+    def top_k(self, k: int, min_apy: float = 0.0, tokens: float = np.inf) -> np.ndarray:
+        """
+        Indices of the k highest-APY vaults able to take a stake of at most
+        `tokens`, best first.
+        """
+        eligible = np.flatnonzero(
+            (self.apys >= min_apy) & (self.apys > 0) & (self.caps >= np.maximum(self.minimums, 1))
+            & (self.minimums <= tokens)
+        )
+        if eligible.size > k:
+            part = np.argpartition(-self.apys[eligible], k - 1)[:k]
+            eligible = eligible[part]
+        return eligible[np.argsort(-self.apys[eligible], kind="stable")]
+
+    def allocate(self, tokens: int, k: int = ALLOCATION_TOP_K, min_apy: float = 0.0, commit: bool = False) -> dict:
+        """
+        Greedy split of `tokens` over the top k vaults: each takes as much as
+        its cap allows, in APY order. A vault whose share would fall below its
+        minimum stake is skipped and the remainder moves on to the next one.
+        With `commit=True` the allocated amounts are deducted from the caps.
+        """
+        with self.lock:
+            chosen = self.top_k(k, min_apy, tokens)
+            caps = np.floor(self.caps[chosen])
+            minimums = self.minimums[chosen]
+
+            # Vectorized greedy fill: each vault gets what is left after the better ones
+            filled_before = np.concatenate(([0.0], np.cumsum(caps)[:-1]))
+            amounts = np.clip(tokens - filled_before, 0, caps)
+            # Only the vault at the fill boundary can be short of its minimum; re-run the
+            # (at most k) tail without it until every share is viable
+            short = np.flatnonzero((amounts > 0) & (amounts < minimums))
+            while short.size:
+                keep = np.ones(len(chosen), dtype=bool)
+                keep[short[0]] = False
+                chosen, caps, minimums = chosen[keep], caps[keep], minimums[keep]
+                filled_before = np.concatenate(([0.0], np.cumsum(caps)[:-1]))
+                amounts = np.clip(tokens - filled_before, 0, caps)
+                short = np.flatnonzero((amounts > 0) & (amounts < minimums))
+
+            used = amounts > 0
+            chosen, amounts = chosen[used], amounts[used].astype(np.int64)
+            if commit:
+                self.caps[chosen] -= amounts
+
+            apys = self.apys[chosen]
+            allocated = int(amounts.sum())
+            return {
+                "allocations": [
+                    {"vendor_id": v, "tokens": int(a), "apy": float(y)}
+                    for v, a, y in zip(self.vendor_ids[chosen], amounts, apys)
+                ],
+                "unallocated": int(tokens) - allocated,
+                "blended_apy": round(float(amounts @ apys / allocated), 4) if allocated else 0.0,
+            }
+
+
+def load_vault_book(path: str = VAULT_BOOK) -> VaultAllocator:
+    if path:
+        with open(path, "r") as f:
+            return VaultAllocator.from_records(json.load(f))
+    return VaultAllocator.from_records([{"vendor_id": v, **vault} for v, vault in VENDOR_VAULTS.items()])
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_vault_allocator() -> VaultAllocator:
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                allocator = load_vault_book()
+                # The book only seeds the vaults; their APYs follow the registry from here on
+                registry = get_apy_registry()
+                registry.subscribe(allocator.update_apys)
+                registry.prefetch(list(allocator.vendor_ids), wait=True, timeout=registry.miss_wait)
+                _allocator = allocator
+    return _allocator
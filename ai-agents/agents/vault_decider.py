@@ -1,25 +1,23 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, Literal
+import os
 
-from datetime import datetime
 
-from utils.logger import setup_logger
+from agents.vault_allocator import VaultAllocator, get_vault_allocator
+from utils.apy_registry import APYNotLoadedError, CachedAPYRegistry, get_apy_registry
+from utils.logger import log_run_banner, setup_logger
+from utils.tracing import traced
 
 logger = setup_logger("VaultDecider", "vault_decider", "vault.log")
 
-# Just for logging purposes
-logger.info("")
-logger.info("=" * 60)
-logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-logger.info("=" * 60)
-logger.info("")
-
-# Simulated vault data (could come from on-chain query in real deployment)
-VENDOR_VAULTS = {
-    "vendor_123": {"apy": 9.0},
-    "vendor_456": {"apy": 12.5},
-    "vendor_789": {"apy": 6.7},
-}
+# "single" stakes everything with the requesting vendor; "allocate" splits across the best vaults
+VaultMode = Literal["single", "allocate"]
+VAULT_MODE = os.getenv("W2G_VAULT_MODE", "single")
+# Default decision rules (also used by simulation.py): stake big gives with high-APY
+# vendors, redeem smaller ones, leave the rest
+STAKE_THRESHOLD = 10
+REDEEM_THRESHOLD = 3
+APY_THRESHOLD = 10
 
 class VaultDeciderState(TypedDict):
     tokens: int
@@ -27,12 +25,19 @@ class VaultDeciderState(TypedDict):
     vendor_apy: float
     action: Optional[str]
     selected_vault: Optional[str]
+    allocations: Optional[list]
 
 class VaultDeciderAgent:
-    def __init__(self, stake_threshold=10, redeem_threshold=3, apy_threshold=10):
+    def __init__(self, stake_threshold=STAKE_THRESHOLD, redeem_threshold=REDEEM_THRESHOLD,
+                 apy_threshold=APY_THRESHOLD, apy_registry: CachedAPYRegistry = None,
+                 mode: VaultMode = VAULT_MODE, allocator: VaultAllocator = None):
+        log_run_banner(logger)
         self.stake_threshold = stake_threshold
         self.redeem_threshold = redeem_threshold
         self.apy_threshold = apy_threshold
+        self.apy_registry = apy_registry or get_apy_registry()
+        self.mode = mode
+        self.allocator = allocator or (get_vault_allocator() if mode == "allocate" else None)
         self.graph = self._build_graph()
 
     def _build_graph(self):
@@ -42,6 +47,8 @@ class VaultDeciderAgent:
         graph.add_node("fetch_vendor_apy", self.fetch_vendor_apy)
         graph.add_node("stake_tokens", self.stake)
         graph.add_node("redeem_tokens", self.redeem)
+        graph.add_node("allocate_tokens", self.allocate)
+        graph.add_node("defer_decision", self.defer)
 
         graph.add_edge("check_balance", "fetch_vendor_apy")
 
@@ -50,28 +57,45 @@ class VaultDeciderAgent:
             self.route_decision,  # <- now this only returns a string
             {
                 "stake": "stake_tokens",
+                "allocate": "allocate_tokens",
                 "redeem": "redeem_tokens",
+                "pending": "defer_decision",
                 "__end__": END
             }
         )
 
         graph.add_edge("stake_tokens", END)
         graph.add_edge("redeem_tokens", END)
+        graph.add_edge("allocate_tokens", END)
+        graph.add_edge("defer_decision", END)
         graph.set_entry_point("check_balance")
 
         return graph.compile()
 
+    @traced("VaultDecider.check_balance")
     def check_balance(self, state: VaultDeciderState) -> VaultDeciderState:
         logger.info(f"[VaultDecider] Checking token balance: {state['tokens']}")
         return state
 
+    @traced("VaultDecider.fetch_vendor_apy")
     def fetch_vendor_apy(self, state: VaultDeciderState) -> VaultDeciderState:
-        apy = VENDOR_VAULTS.get(state["vendor_id"], {}).get("apy", 0)
+        # Served from the registry's cache; never waits on a remote fetch beyond its miss budget
+        try:
+            apy = self.apy_registry.get(state["vendor_id"]) or 0
+        except APYNotLoadedError as e:
+            logger.warning(f"[VaultDecider] {e}")
+            return {**state, "vendor_apy": None}
         logger.info(f"[VaultDecider] Vendor APY: {apy}%")
         return {**state, "vendor_apy": apy}
 
     def route_decision(self, state: VaultDeciderState) -> str:
+        # Allocation spreads over the best known vaults, whatever the requesting vendor's own vault
+        if self.mode == "allocate" and state["tokens"] >= self.stake_threshold:
+            return "allocate"
+
         apy = state.get("vendor_apy", 0)
+        if apy is None:
+            return "pending"
         if not apy:
             logger.warning(f"Vendor {state['vendor_id']} not found in vault registry.")
             return "__end__"
@@ -82,12 +106,49 @@ class VaultDeciderAgent:
             return "redeem"
         return "__end__"
 
+    @traced("VaultDecider.stake")
     def stake(self, state: VaultDeciderState) -> VaultDeciderState:
         logger.info(f"[VaultDecider] Staking {state['tokens']} tokens with vendor {state['vendor_id']}.")
         state["action"] = "staked"
         state["selected_vault"] = state["vendor_id"]
         return state
 
+    @traced("VaultDecider.allocate")
+    def allocate(self, state: VaultDeciderState) -> VaultDeciderState:
+        # Refreshes expired vault APYs in the background; the allocator picks them up as they land.
+        # A single comparison until the registry's earliest entry expires
+        self.apy_registry.refresh_expired()
+        plan = self.allocator.allocate(state["tokens"], min_apy=self.apy_threshold, commit=True)
+        if not plan["allocations"]:
+            # No vault clears the APY threshold with room left: fall back to the requesting vendor
+            logger.info(f"[VaultDecider] No vault can take {state['tokens']} tokens at >= {self.apy_threshold}% APY.")
+            if state.get("vendor_apy") is None:
+                return self.defer(state)
+            if not state["vendor_apy"]:
+                logger.warning(f"Vendor {state['vendor_id']} not found in vault registry.")
+                return state
+            return self.redeem(state)
+        logger.info(
+            f"[VaultDecider] Allocated {state['tokens'] - plan['unallocated']} tokens across "
+            f"{len(plan['allocations'])} vaults at {plan['blended_apy']}% blended APY "
+            f"({plan['unallocated']} unallocated)."
+        )
+        state["action"] = "allocated"
+        state["allocations"] = plan["allocations"]
+        state["selected_vault"] = plan["allocations"][0]["vendor_id"]
+        return state
+
+    @traced("VaultDecider.defer")
+    def defer(self, state: VaultDeciderState) -> VaultDeciderState:
+        # Not the same as "no vault": the vendor may well have one, its APY just isn't loaded yet
+        logger.warning(
+            f"[VaultDecider] APY of vendor '{state['vendor_id']}' not loaded yet; "
+            f"vault decision for {state['tokens']} tokens left pending."
+        )
+        state["action"] = "pending"
+        return state
+
+    @traced("VaultDecider.redeem")
     def redeem(self, state: VaultDeciderState) -> VaultDeciderState:
         logger.info(f"[VaultDecider] Redeeming {state['tokens']} tokens with vendor - '{state['vendor_id']}'.")
         state["action"] = "redeemed"
@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.logger import setup_logger
+
+logger = setup_logger("PhotoJobs", "../logs/api", "jobs.log")
+
+JOB_DB_PATH = os.getenv(
+    "W2G_PHOTO_JOB_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/photo_jobs.db")
+)
+JOB_WORKERS = int(os.getenv("W2G_PHOTO_JOB_WORKERS", "8"))
+JOB_QUEUE_MAX = int(os.getenv("W2G_PHOTO_JOB_QUEUE_MAX", "500"))
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobStore:
+    """
+    Durable SQLite record of every photo validation job and its result.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def create(self, payload: dict, priority: int) -> dict:
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "priority": priority,
+            "payload": payload,
+            "created_at": now
+        }
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (job_id, status, priority, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job["job_id"], "queued", priority, json.dumps(payload), now, now)
+            )
+        return job
+
+    def update(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished(self) -> list[dict]:
+        """
+        Jobs that were queued or mid-flight when the process last stopped.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY priority DESC, created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def close(self):
+        self.conn.close()
+
+
+class PhotoJobQueue:
+    """
+    Bounded priority queue drained by a fixed pool of async workers.
+    Higher `priority` runs first, FIFO within a priority. Submissions are
+    refused with QueueFullError once `max_pending` jobs are waiting.
+    """
+
+    def __init__(self, handler, store: JobStore = None, workers: int = JOB_WORKERS, max_pending: int = JOB_QUEUE_MAX):
+        self.handler = handler
+        self.store = store or JobStore()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue = None
+        self.tasks = []
+        self.waiters = {}
+        self.sequence = itertools.count()
+
+    async def start(self):
+        self.queue = asyncio.PriorityQueue()
+        recovered = await asyncio.to_thread(self.store.unfinished)
+        for job in recovered:
+            self._enqueue(job)
+        if recovered:
+            logger.info(f"[PhotoJobs] - Re-queued {len(recovered)} unfinished jobs")
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"[PhotoJobs] - Started {self.workers} workers")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # Anything still queued or running stays in the store and is recovered on next start
+        self.store.close()
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    async def submit(self, payload: dict, priority: int = 0) -> dict:
+        if self.depth() >= self.max_pending:
+            raise QueueFullError(f"{self.depth()} jobs pending")
+        job = await asyncio.to_thread(self.store.create, payload, priority)
+        self._enqueue(job)
+        return job
+
+    def _enqueue(self, job: dict):
+        self.queue.put_nowait((-job["priority"], next(self.sequence), job["job_id"], job["payload"]))
+
+    async def get(self, job_id: str, wait: float = 0) -> dict | None:
+        """
+        Returns the job, waiting up to `wait` seconds for it to finish (long-poll).
+        """
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in ("done", "failed") or wait <= 0:
+            return job
+        event = self.waiters.setdefault(job_id, asyncio.Event())
+        # Re-check now that the waiter is registered, the job may have just finished
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        try:
+            await asyncio.wait_for(event.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id, payload = await self.queue.get()
+            try:
+                await asyncio.to_thread(self.store.update, job_id, "running")
+                result = await self.handler(payload)
+                await asyncio.to_thread(self.store.update, job_id, "done", result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[PhotoJobs] - Job {job_id} failed: {e}")
+                await asyncio.to_thread(self.store.update, job_id, "failed", None, str(e))
+            finally:
+                self.queue.task_done()
+                event = self.waiters.pop(job_id, None)
+                if event:
+                    event.set()
@@ -1,21 +1,89 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
 
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
 
-from agents.give_router import RouterAgent
-from agents.reward_agent import RewardAgent
-from agents.vault_decider import VaultDeciderAgent
-from agents.photo_validator import test as validate_photo
+from pydantic import BaseModel, model_validator
+from typing import Literal, Optional
+
+from api.jobs import PhotoJobQueue, QueueFullError
+from utils.llm_scheduler import LLMUnavailableError, scheduler
 
 from utils.logger import setup_logger
+from utils import llm_client
+from utils.apy_registry import get_apy_registry
+from utils.blob_store import BlobStore
+from utils.result_store import ResultStore
+from utils.settlement import SETTLEMENT_MODE, get_settlement_service
+from utils.tracing import trace_run
 
 from datetime import datetime
 
+UPLOAD_MAX_BYTES = int(os.getenv("W2G_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_SPOOL = os.getenv("W2G_UPLOAD_SPOOL", "0") == "1"
+# Import the photo validator stack in the background once the worker is serving
+PRELOAD_AGENTS = os.getenv("W2G_PRELOAD_AGENTS", "0") == "1"
+blob_store = BlobStore()
+
+_photo_validator = None
+_result_store = None
+
+
+async def photo_validator():
+    """
+    The agents.photo_validator module, imported on first use. It pulls in LangChain,
+    LangGraph, Pillow and the model clients, so it is loaded off the event loop and
+    only by workers that actually serve photo validations.
+    """
+    global _photo_validator
+    if _photo_validator is None:
+        _photo_validator = await asyncio.to_thread(importlib.import_module, "agents.photo_validator")
+    return _photo_validator
+
+
+async def validate_request(payload: dict) -> dict:
+    validator = await photo_validator()
+    give = {"give_ref": payload.get("give_ref"), "vendor_id": payload.get("vendor_id")}
+    if payload.get("photo_paths"):
+        paths = ([payload["photo_path"]] if payload.get("photo_path") else []) + payload["photo_paths"]
+        return await validator.avalidate_photos(paths, mode=payload["mode"], policy=payload.get("policy"), **give)
+    return await validator.avalidate_photo(payload["photo_path"], mode=payload["mode"], **give)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Built here rather than at import: its job store opens SQLite and creates data/
+    app.state.photo_jobs = await asyncio.to_thread(PhotoJobQueue, validate_request)
+    await app.state.photo_jobs.start()
+    if SETTLEMENT_MODE:
+        # Settle what earlier workers left open, without waiting for a new give
+        await asyncio.to_thread(get_settlement_service().start)
+    if PRELOAD_AGENTS:
+        asyncio.create_task(photo_validator())
+    yield
+    await app.state.photo_jobs.stop()
+    if SETTLEMENT_MODE:
+        get_settlement_service().stop()
+    # Release the pooled LLM connections of this worker's event loop
+    await llm_client.aclose()
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 logger = setup_logger("API", "../logs/api", "api.log")
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # One trace run per request; spans from every agent/tool inside share its run id
+    with trace_run() as run_id:
+        response = await call_next(request)
+    response.headers["X-Run-Id"] = run_id
+    return response
+
 # -------------------------
 # Pydantic Request Schemas
 # -------------------------
@@ -23,6 +91,8 @@ logger = setup_logger("API", "../logs/api", "api.log")
 class GiveRouterRequest(BaseModel):
     tokens: int
     vendor_id: str
+    # Recorded with the give in the settlement ledger
+    give_ref: Optional[str] = None
 
 class VaultRequest(BaseModel):
     tokens: int
@@ -33,7 +103,29 @@ class RewardRequest(BaseModel):
     verified_gives: int
 
 class PhotoRequest(BaseModel):
-    photo_path: str
+    photo_path: Optional[str] = None
+    # Several proof photos of one give, combined by `policy`
+    photo_paths: list[str] = []
+    policy: Optional[Literal["any", "majority", "max"]] = None
+    mode: Literal["agent", "single"] = "agent"
+    # The give the photos prove: a photo accepted for another give or vendor is a recycled proof
+    give_ref: Optional[str] = None
+    vendor_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_photo(self):
+        if not self.photo_path and not self.photo_paths:
+            raise ValueError("photo_path or photo_paths is required")
+        return self
+
+class PhotoJobRequest(PhotoRequest):
+    priority: int = 0
+
+
+def retry_after(error: LLMUnavailableError) -> str:
+    # An open circuit knows when it will probe the provider again
+    return str(max(1, round(error.retry_after))) if error.retry_after else "30"
+
 
 # -------------------------
 # API Endpoints
@@ -44,6 +136,7 @@ def run_give_router(data: GiveRouterRequest):
     logger.info(f"[GiveRouter] Running GiveRouterAgent...")
     try:
         logger.info(f"[RouterAgent] - Received data: {data.model_dump_json()}")
+        from agents.give_router import RouterAgent
         agent = RouterAgent()
         result = agent.run(data.model_dump())
         logger.info(f"[RouterAgent] - GiveRouter result: {result}")
@@ -58,6 +151,7 @@ def run_vault_decider(data: VaultRequest):
     logger.info(f"[VaultDecider] Running VaultDeciderAgent...")
     try:
         logger.info(f"[VaultDecider] - Received data: {data.model_dump_json()}")
+        from agents.vault_decider import VaultDeciderAgent
         agent = VaultDeciderAgent()
         result = agent.run(data.model_dump())
         logger.info(f"[VaultDecider] - VaultDecider result: {result}")
@@ -72,6 +166,7 @@ def run_reward(data: RewardRequest):
     logger.info(f"[RewardAgent] Running RewardAgent...")
     try:
         logger.info(f"[RewardAgent] - Received data: {data.model_dump_json()}")
+        from agents.reward_agent import RewardAgent
         agent = RewardAgent()
         result = agent.run(data.model_dump())
         logger.info(f"[RewardAgent] - Reward result: {result}")
@@ -82,17 +177,114 @@ def run_reward(data: RewardRequest):
 
 
 @app.post("/agent/photo-validator")
-def run_photo_validator(data: PhotoRequest):
+async def run_photo_validator(data: PhotoRequest):
     logger.info(f"[PhotoValidator] Running PhotoValidatorAgent...")
     try:
         logger.info(f"[PhotoValidator] - Received data: {data.model_dump_json()}")
-        val_result, score = validate_photo(data.photo_path)
-        logger.info(f"[PhotoValidator] - Validation result: {val_result}, Score: {score}")
-        return {
-            "validation_result": val_result,
-            "score": score
-        }
+        result = await validate_request(data.model_dump())
+        logger.info(f"[PhotoValidator] - Validation result: {result['validation_result']}, Score: {result['score']}")
+        return result
 
+    except LLMUnavailableError as e:
+        logger.error(f"[PhotoValidator] - Model unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after(e)})
     except Exception as e:
         logger.error(f"[PhotoValidator] - PhotoValidator Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/agent/photo-validator/jobs", status_code=202)
+async def submit_photo_job(data: PhotoJobRequest, request: Request):
+    logger.info(f"[PhotoValidator] - Queueing job: {data.model_dump_json()}")
+    photo_jobs = request.app.state.photo_jobs
+    try:
+        job = await photo_jobs.submit(data.model_dump(exclude={"priority"}), priority=data.priority)
+    except QueueFullError as e:
+        logger.warning(f"[PhotoValidator] - Job queue full: {e}")
+        raise HTTPException(status_code=503, detail="Photo validation queue is full", headers={"Retry-After": "5"})
+    return {"job_id": job["job_id"], "status": job["status"], "queue_depth": photo_jobs.depth()}
+
+
+@app.get("/agent/photo-validator/jobs/{job_id}")
+async def get_photo_job(job_id: str, request: Request, wait: float = Query(0, ge=0, le=30)):
+    job = await request.app.state.photo_jobs.get(job_id, wait=wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/agent/photo-validator/upload")
+async def upload_photo(
+    request: Request,
+    mode: Literal["agent", "single"] = "agent",
+    spool: bool = UPLOAD_SPOOL,
+    give_ref: str = None,
+    vendor_id: str = None
+):
+    """
+    Validates an image sent as the raw request body (e.g. Content-Type: image/jpeg).
+    The bytes are streamed into memory and validated directly, never written to
+    and re-read from disk; `spool=true` additionally keeps a content-addressed copy.
+    """
+    declared = request.headers.get("content-length")
+    if declared:
+        try:
+            declared_bytes = int(declared)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if declared_bytes > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {UPLOAD_MAX_BYTES} bytes")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {UPLOAD_MAX_BYTES} bytes")
+    if not body:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    image_bytes = bytes(body)
+    del body
+
+    logger.info(f"[PhotoValidator] - Received upload: {len(image_bytes)} bytes, mode={mode}")
+    try:
+        sha256 = await asyncio.to_thread(blob_store.put, image_bytes) if spool else None
+        validator = await photo_validator()
+        result = await validator.avalidate_photo(
+            image_bytes=image_bytes, mode=mode, give_ref=give_ref, vendor_id=vendor_id
+        )
+        logger.info(f"[PhotoValidator] - Validation result: {result['validation_result']}, Score: {result['score']}")
+        return {**result, "sha256": sha256}
+    except LLMUnavailableError as e:
+        logger.error(f"[PhotoValidator] - Model unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after(e)})
+    except Exception as e:
+        logger.error(f"[PhotoValidator] - PhotoValidator Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/results")
+def list_results(
+    after_id: int = Query(0, ge=0),
+    vendor_id: str = None,
+    viewer_id: str = None,
+    since: float = None,
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """
+    Master-flow results appended after `after_id`; poll with the returned `last_id`.
+    """
+    global _result_store
+    if _result_store is None:
+        _result_store = ResultStore()
+    results = _result_store.query(after_id, vendor_id=vendor_id, viewer_id=viewer_id, since=since, limit=limit)
+    return {"results": results, "last_id": results[-1]["id"] if results else after_id}
+
+
+@app.get("/metrics/llm")
+def llm_metrics(request: Request):
+    return {**scheduler.metrics(), "photo_job_queue_depth": request.app.state.photo_jobs.depth()}
+
+
+@app.get("/metrics/apy")
+def apy_metrics():
+    return get_apy_registry().metrics()
@@ -0,0 +1,95 @@
+# Cold-start benchmark: import cost of each ai-agents module in a fresh interpreter.
+#
+#   cd ai-agents
+#   python -m benchmarks.import_bench --repeat 5 --output import_times.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = [
+    "utils.logger",
+    "utils.tracing",
+    "utils.llm_client",
+    "agents.give_router",
+    "agents.vault_decider",
+    "agents.reward_agent",
+    "agents.photo_validator",
+    "api.server",
+    "main",
+]
+
+
+def measure(module: str) -> dict:
+    """
+    Imports `module` in a new interpreter with -X importtime and returns the
+    cumulative import time of the module itself plus the process wall time.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative_us = None
+    children, heaviest = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        raw = line[len("import time:"):].split("|")
+        if not raw[0].strip().isdigit():
+            continue
+        cumulative, name = int(raw[1]), raw[2].strip()
+        depth = (len(raw[2]) - len(raw[2].lstrip()) - 1) // 2
+        # importtime lists children before their parent, one indent level deeper
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            if name == module:
+                cumulative_us = cumulative
+                heaviest = sorted(children, reverse=True)
+            children = []
+    return {
+        "import_ms": round((cumulative_us or 0) / 1000, 1),
+        "process_ms": round(wall * 1000, 1),
+        "top_imports": [{"module": n, "ms": round(c / 1000, 1)} for c, n in heaviest[:5]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of ai-agents modules.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'module':<26}{'import ms':>11}{'process ms':>12}   heaviest top-level imports")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["import_ms"])
+        results[module] = {
+            "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+            "process_ms_median": round(statistics.median(r["process_ms"] for r in runs), 1),
+            "top_imports": best["top_imports"],
+        }
+        top = ", ".join(f"{t['module']} {t['ms']}ms" for t in best["top_imports"][:3])
+        print(f"{module:<26}{results[module]['import_ms_median']:>11}{results[module]['process_ms_median']:>12}   {top}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "modules": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# End-to-end benchmark of the master flow in main.py on synthetic gives.
+#
+#   cd ai-agents
+#   python -m benchmarks.pipeline_bench --gives 200 --workers 8 --output bench_results.json
+#   python -m benchmarks.pipeline_bench --baseline bench_results.json   # compare against a previous run
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+IMAGE_DIR = Path(__file__).resolve().parent.parent / "images"
+KNOWN_VENDORS = ["vendor_123", "vendor_456", "vendor_789"]
+EXECUTORS = ("serial", "thread", "process")
+
+
+def bench_env(args) -> dict:
+    """
+    Environment for the stubbed photo validator, applied before main.py is imported
+    (in this process and in every pool worker).
+    """
+    return {
+        "W2G_MODEL_PROVIDER": "stub",
+        "W2G_STUB_LATENCY": str(args.stub_latency),
+        "W2G_STUB_ERROR_RATE": str(args.stub_error_rate),
+        "W2G_STUB_SEED": str(args.seed),
+        # The benchmark replays the same sample images, so keep dedup and rate limits out of the way
+        "W2G_DUPLICATE_MAX_DISTANCE": "-1",
+        "W2G_PROOF_HASH_INDEX": os.path.join(tempfile.gettempdir(), "w2g_bench_proof_hashes.jsonl"),
+        "W2G_LLM_RPM": "1000000",
+        "W2G_LLM_TPM": "1000000000",
+    }
+
+
+def generate_states(n: int, vendors: int, viewers: int, distribution: str, seed: int) -> list[dict]:
+    """
+    Synthetic GlobalState inputs across vendors, viewers and token distributions.
+    Roughly a third of gives target vendors missing from the vault registry.
+    """
+    rng = np.random.default_rng(seed)
+    photos = sorted(str(p) for p in IMAGE_DIR.glob("*.jpg"))
+    vendor_ids = KNOWN_VENDORS + [f"vendor_{i:05d}" for i in range(max(vendors - len(KNOWN_VENDORS), 0))]
+
+    if distribution == "uniform":
+        tokens = rng.integers(1, 60, size=n)
+    elif distribution == "poisson":
+        tokens = rng.poisson(12, size=n) + 1
+    else:
+        tokens = np.ceil(rng.lognormal(2.0, 0.9, size=n)).astype(int)
+
+    return [
+        {
+            "tokens": int(tokens[i]),
+            "vendor_id": vendor_ids[int(rng.integers(len(vendor_ids)))],
+            "viewer_id": f"user_{int(rng.integers(viewers)):06d}",
+            "verified_gives": int(rng.poisson(15)),
+            "photo_path": photos[int(rng.integers(len(photos)))],
+            "validation_mode": "single" if rng.random() < 0.5 else "agent",
+        }
+        for i in range(n)
+    ]
+
+
+_compiled = None
+
+
+def _init_worker(env: dict):
+    global _compiled
+    os.environ.update(env)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from main import compiled
+    _compiled = compiled
+
+
+def run_one(state: dict) -> dict:
+    """
+    Runs one give through the compiled workflow, timing each node from the update stream.
+    """
+    nodes = {}
+    start = last = time.perf_counter()
+    error = None
+    try:
+        for update in _compiled.stream(state, stream_mode="updates"):
+            now = time.perf_counter()
+            for node in update:
+                nodes[node] = now - last
+            last = now
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"nodes": nodes, "total": time.perf_counter() - start, "error": error}
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    arr = np.asarray(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def max_rss_mb(children: bool = False) -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def run_executor(kind: str, states: list[dict], workers: int, env: dict) -> dict:
+    start = time.perf_counter()
+    if kind == "serial":
+        results = [run_one(s) for s in states]
+    elif kind == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_one, states))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(env,)) as pool:
+            results = list(pool.map(run_one, states, chunksize=max(1, len(states) // (workers * 4))))
+    wall = time.perf_counter() - start
+
+    node_times = {}
+    for r in results:
+        for node, elapsed in r["nodes"].items():
+            node_times.setdefault(node, []).append(elapsed)
+    errors = [r["error"] for r in results if r["error"]]
+    return {
+        "executor": kind,
+        "workers": 1 if kind == "serial" else workers,
+        "gives": len(states),
+        "wall_s": round(wall, 3),
+        "throughput_gives_per_s": round(len(states) / wall, 2),
+        "errors": len(errors),
+        "sample_errors": errors[:3],
+        "latency": percentiles([r["total"] for r in results]),
+        "nodes": {node: percentiles(times) for node, times in sorted(node_times.items())},
+        "max_rss_mb": max_rss_mb(children=(kind == "process")),
+    }
+
+
+def print_report(report: dict, baseline: dict = None):
+    base = {r["executor"]: r for r in (baseline or {}).get("runs", [])}
+    print(f"\n{'executor':<10}{'workers':>8}{'gives/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'rss MB':>9}")
+    for run in report["runs"]:
+        line = (f"{run['executor']:<10}{run['workers']:>8}{run['throughput_gives_per_s']:>10}"
+                f"{run['latency'].get('p50_ms', 0):>10}{run['latency'].get('p95_ms', 0):>10}"
+                f"{run['errors']:>8}{run['max_rss_mb']:>9}")
+        previous = base.get(run["executor"])
+        if previous:
+            ratio = run["throughput_gives_per_s"] / max(previous["throughput_gives_per_s"], 1e-9)
+            line += f"   {ratio:.2f}x vs baseline"
+        print(line)
+        for node, stats in run["nodes"].items():
+            print(f"    {node:<18} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the master flow on synthetic gives.")
+    parser.add_argument("--gives", type=int, default=200)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--viewers", type=int, default=1000)
+    parser.add_argument("--distribution", choices=["uniform", "poisson", "lognormal"], default="lognormal")
+    parser.add_argument("--executors", nargs="+", choices=EXECUTORS, default=list(EXECUTORS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Mean simulated model latency in seconds")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="Previous --output file to compare throughput against")
+    args = parser.parse_args()
+
+    env = bench_env(args)
+    _init_worker(env)
+    states = generate_states(args.gives, args.vendors, args.viewers, args.distribution, args.seed)
+
+    # Batch runs warm the APY cache up front, as a production batch would
+    from utils.apy_registry import get_apy_registry
+    get_apy_registry().prefetch(s["vendor_id"] for s in states)
+
+    # Warm up imports, graph compilation and image decoding outside the timed runs
+    run_one(dict(states[0]))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "runs": [run_executor(kind, [dict(s) for s in states], args.workers, env) for kind in args.executors],
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
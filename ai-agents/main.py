@@ -4,19 +4,32 @@ from langgraph.graph import StateGraph, END
 from typing import TypedDict, Optional
 
 from agents.give_router import RouterAgent
-from agents.photo_validator import test
+from agents.photo_validator import test, test_photos
 from agents.vault_decider import VaultDeciderAgent
 from agents.reward_agent import RewardAgent
 
+from utils.checkpoints import get_checkpoint_store
 from utils.logger import setup_logger  
+from utils.result_store import ResultStore
+from utils.settlement import SETTLEMENT_MODE, get_settlement_service
+from utils.tracing import current_run_id, trace_run, traced
 
+import argparse
 import json
 import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import Iterator
 
 # --- Setup logger ---
 logger = setup_logger("MainFlow", "main", "main.log")
 
+# Persist every node's output so a failed run resumes after its last completed node
+CHECKPOINTS = os.getenv("W2G_CHECKPOINTS", "1") == "1"
+
 # --- Shared State Across Agents ---
 class GlobalState(TypedDict):
     tokens: int
@@ -27,19 +40,26 @@ class GlobalState(TypedDict):
     validation_result: bool
     action: Optional[str]
     selected_vault: Optional[str]
+    allocations: Optional[list]
     viewer_id: str
     verified_gives: int
     reward_type: Optional[str]
     reward_status: Optional[str]
     photo_path: Optional[str]
+    photo_paths: Optional[list]
+    photo_policy: Optional[str]
+    photo_results: Optional[list]
+    validation_mode: Optional[str]
 
 # --- Wrapper for GiveRouterAgent ---
+@traced("give_router")
 def give_router_node(state: GlobalState) -> GlobalState:
     logger.info("[1/4] Running GiveRouterAgent...")
     agent = RouterAgent()
     result = agent.run({
         "tokens": state["tokens"],
-        "vendor_id": state["vendor_id"]
+        "vendor_id": state["vendor_id"],
+        "give_ref": current_run_id()
     })
     state["status"] = result.get("status", "not_transferred")
     state["action"] = state["status"]
@@ -47,15 +67,26 @@ def give_router_node(state: GlobalState) -> GlobalState:
     return state
 
 # --- Wrapper for PhotoValidatorAgent ---
+@traced("photo_validator")
 def photo_validator_node(state: GlobalState) -> GlobalState:
     logger.info("[2/4] Running PhotoValidatorAgent...")
-    val_result, score = test(state.get("photo_path"))
+    mode = state.get("validation_mode") or "agent"
+    # The run id stays the same when a failed run is resumed, so its photo is not taken for a recycled proof
+    give = {"give_ref": current_run_id(), "vendor_id": state["vendor_id"]}
+    if state.get("photo_paths"):
+        # Several proof photos: validated concurrently, combined by the give's policy
+        result = test_photos(state["photo_paths"], mode=mode, policy=state.get("photo_policy"), **give)
+        val_result, score = result["validation_result"], result["score"]
+        state["photo_results"] = result["photos"]
+    else:
+        val_result, score = test(state.get("photo_path"), mode=mode, **give)
     state["validation_result"] = val_result
     state["score"] = score
     logger.info(f"[PhotoValidator] Result: valid={val_result}, score={score}")
     return state
 
 # --- Wrapper for VaultDeciderAgent ---
+@traced("vault_decider")
 def vault_decider_node(state: GlobalState) -> GlobalState:
     logger.info("[3/4] Running VaultDeciderAgent...")
     agent = VaultDeciderAgent()
@@ -68,12 +99,13 @@ def vault_decider_node(state: GlobalState) -> GlobalState:
     return state
 
 # --- Wrapper for RewardAgent ---
+@traced("reward_agent")
 def reward_agent_node(state: GlobalState) -> GlobalState:
     logger.info("[4/4] Running RewardAgent...")
     agent = RewardAgent()
     result = agent.run({
         "viewer_id": state["viewer_id"],
-        "verified_gives": state["verified_gives"]
+        "verified_gives": state.get("verified_gives")
     })
     state.update(result)
     logger.info(f"[RewardAgent] Result: reward={state.get('reward_type')}, status={state.get('reward_status')}")
@@ -94,15 +126,163 @@ workflow.add_edge("reward_agent", END)
 
 compiled = workflow.compile()
 
-# --- End-to-End Test ---
-if __name__ == "__main__":
-    logger.info("")
-    logger.info("=" * 80)
-    logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info("=" * 80)
-    logger.info("")
+_checkpointed = None
+
+
+def get_checkpointed_graph():
+    """
+    The master graph compiled with the SQLite checkpointer (built on first use).
+    """
+    global _checkpointed
+    if _checkpointed is None:
+        _checkpointed = workflow.compile(checkpointer=get_checkpoint_store().saver)
+    return _checkpointed
+
+
+def run_give(state: dict | None, run_id: str = None) -> tuple[str, dict]:
+    """
+    Runs one give with its progress checkpointed under `run_id`. Calling it
+    again with the run id of a failed run resumes from the last completed
+    node (`state` may then be None), so e.g. a photo validation that already
+    succeeded is not paid for again. Checkpoints are dropped once a run completes.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    if not CHECKPOINTS:
+        with trace_run(run_id):
+            return run_id, compiled.invoke(state)
+
+    store = get_checkpoint_store()
+    graph = get_checkpointed_graph()
+    config = {"configurable": {"thread_id": run_id}}
+    snapshot = graph.get_state(config)
+
+    with trace_run(run_id):
+        try:
+            if snapshot.next:
+                logger.info(f"[Master Flow] Resuming run {run_id} at {list(snapshot.next)}")
+                result = graph.invoke(None, config)
+            elif snapshot.values:
+                # Finished before, but the process died before cleaning up
+                result = snapshot.values
+            else:
+                if state is None:
+                    raise ValueError(f"No checkpoint found for run {run_id}")
+                store.mark(run_id, "running")
+                result = graph.invoke(state, config)
+        except Exception as e:
+            store.mark(run_id, "failed", error=f"{type(e).__name__}: {e}")
+            logger.error(f"[Master Flow] Run {run_id} failed, resume it with --resume {run_id}: {e}")
+            raise
+    store.complete(run_id)
+    return run_id, result
+
+# --- Streaming mode ---
+def read_events(source: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Lazily yields (line number, give event, parse error) from a JSONL file, or stdin for "-".
+    """
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(event, dict):
+                yield line_no, None, "event is not a JSON object"
+                continue
+            missing = [k for k in ("tokens", "vendor_id", "viewer_id") if k not in event]
+            yield line_no, event, f"missing fields: {missing}" if missing else None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_event(line_no: int, event: dict) -> dict:
+    """
+    Runs one give through the compiled workflow. Module-level so process pools can pickle it.
+    An event carrying a "run_id" resumes that run if it failed part-way before.
+    """
+    started = time.perf_counter()
+    event = dict(event)
+    run_id = event.pop("run_id", None) or uuid.uuid4().hex
+    try:
+        run_id, result = run_give(event, run_id)
+        error = None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    return {
+        "line": line_no,
+        "run_id": run_id,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "result": result,
+        "error": error
+    }
+
 
-    initial_state = {
+def stream_events(events, executor: str = "thread", workers: int = 4, max_in_flight: int = None) -> Iterator[dict]:
+    """
+    Pushes events through the workflow on a thread or process pool, keeping at
+    most `max_in_flight` submitted at once so a large input is never read ahead
+    into memory. Results are yielded as they complete (each carries its line).
+    """
+    max_in_flight = max_in_flight or workers * 2
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        in_flight = set()
+        for line_no, event, error in events:
+            if error:
+                yield {"line": line_no, "run_id": None, "duration_ms": 0.0, "result": None, "error": error}
+                continue
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(pool.submit(run_event, line_no, event))
+        for future in wait(in_flight).done:
+            yield future.result()
+
+
+def run_stream(args):
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    store = ResultStore() if args.store else None
+    started = last_report = time.perf_counter()
+    processed = errors = 0
+
+    logger.info(f"[Master Flow] Streaming events from {args.events} ({args.executor} x{args.workers})")
+    try:
+        for record in stream_events(read_events(args.events), args.executor, args.workers, args.max_in_flight):
+            processed += 1
+            if record["error"]:
+                errors += 1
+            elif store:
+                store.append(record["result"], run_id=record["run_id"])
+            out.write(json.dumps(record, default=str) + "\n")
+
+            now = time.perf_counter()
+            if now - last_report >= args.stats_interval:
+                out.flush()
+                print(f"[Master Flow] {processed} events, {errors} errors, "
+                      f"{processed / (now - started):.1f} events/s", file=sys.stderr)
+                last_report = now
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if store:
+            store.close()
+
+    elapsed = time.perf_counter() - started
+    summary = (f"[Master Flow] Done: {processed} events, {errors} errors in {elapsed:.1f}s "
+               f"({processed / elapsed if elapsed else 0:.1f} events/s)")
+    logger.info(summary)
+    print(summary, file=sys.stderr)
+
+
+def run_demo(resume: str = None):
+    initial_state = None if resume else {
         "tokens": 20,
         "vendor_id": "vendor_456",
         "viewer_id": "user_123",
@@ -113,37 +293,60 @@ if __name__ == "__main__":
     print("\n[Master Flow] Running end-to-end simulation...")
     logger.info("[Master Flow] Starting workflow execution...")
 
-    result = compiled.invoke(initial_state)
+    started = time.perf_counter()
+    run_id = resume or uuid.uuid4().hex
+    logger.info(f"[Master Flow] Run id: {run_id}")
+    run_id, result = run_give(initial_state, run_id)
 
-    logger.info("[Master Flow] Execution complete.")
+    logger.info(
+        "[Master Flow] Execution complete.",
+        extra={"run_id": run_id, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+    )
     print("\n+++++++++++++++++ Master Flow Simulation Ended +++++++++++++++++")
 
-    logger.info("Saving result to ../data/result.json...")
-
-    # Path to shared result.json
-    data_path = os.path.join(os.path.dirname(__file__), "../data/result.json")
+    logger.info("Saving result to ../data/results.db...")
 
     try:
-        if os.path.exists(data_path):
-            with open(data_path, "r") as f:
-                try:
-                    existing = json.load(f)
-                except json.decoder.JSONDecodeError:
-                    existing = []
-            if isinstance(existing, list):
-                existing.append(result)
-            else:
-                existing = [existing, result]
-        else:
-            existing = [result]
-
-        with open(data_path, "w") as f:
-            json.dump(existing, f, indent=4)
+        store = ResultStore()
+        result_id = store.append(result, run_id=run_id)
+        store.close()
 
-        logger.info("Result successfully saved to shared /data/result.json")
-        print("\n✅ Result saved to shared /data/result.json\n")
+        logger.info(f"Result successfully saved to shared /data/results.db (id={result_id})")
+        print("\n✅ Result saved to shared /data/results.db\n")
         logger.info("")
     except Exception as e:
-        logger.error(f"Failed to save result.json: {e}")
-        print("\n❌ Error saving result to shared /data/result.json\n")
+        logger.error(f"Failed to save result: {e}")
+        print("\n❌ Error saving result to shared /data/results.db\n")
         logger.info("")
+
+
+# --- End-to-End Test ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Watch2Give master flow.")
+    parser.add_argument("--events", metavar="JSONL", help="Stream give events from a JSONL file ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="Where to write JSONL results (default stdout)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-in-flight", type=int, help="Events submitted at once (default 2 x workers)")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between throughput reports")
+    parser.add_argument("--store", action="store_true", help="Also append successful results to data/results.db")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume a failed run from its last completed node")
+    parser.add_argument("--gc-checkpoints", action="store_true", help="Drop checkpoints of long-abandoned runs")
+    args = parser.parse_args()
+
+    logger.info("")
+    logger.info("=" * 80)
+    logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("=" * 80)
+    logger.info("")
+
+    if SETTLEMENT_MODE:
+        # Settle what earlier runs left open, without waiting for this run's first give
+        get_settlement_service().start()
+
+    if args.gc_checkpoints:
+        print(f"[Master Flow] Removed checkpoints of {get_checkpoint_store().gc()} abandoned runs")
+    elif args.events:
+        run_stream(args)
+    else:
+        run_demo(resume=args.resume)
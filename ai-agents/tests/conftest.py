@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+# Settings are read at import time, so they are pinned before any project module is
+# imported: the offline stub provider, and every store under a throwaway directory
+DATA_DIR = tempfile.mkdtemp(prefix="w2g-tests-")
+IMAGES = Path(__file__).resolve().parent.parent / "images"
+# Stub verdicts pinned by image sha256: the giving photos pass, the others don't
+RECORDINGS = {
+    hashlib.sha256(image.read_bytes()).hexdigest(): {"score": 0.2 if image.name.startswith("not_") else 0.9}
+    for image in IMAGES.glob("*.jpg")
+}
+with open(os.path.join(DATA_DIR, "stub_recordings.json"), "w") as f:
+    json.dump(RECORDINGS, f)
+os.environ.update({
+    "W2G_MODEL_PROVIDER": "stub",
+    "W2G_STUB_RECORDINGS": os.path.join(DATA_DIR, "stub_recordings.json"),
+    "W2G_LOG_ASYNC": "0",
+    "W2G_CHECKPOINT_DB": os.path.join(DATA_DIR, "checkpoints.db"),
+    "W2G_PROOF_HASH_INDEX": os.path.join(DATA_DIR, "proof_hashes.jsonl"),
+    "W2G_REVALIDATION_DB": os.path.join(DATA_DIR, "revalidation.db"),
+    "W2G_RESULT_DB": os.path.join(DATA_DIR, "results.db"),
+    "W2G_PHOTO_JOB_DB": os.path.join(DATA_DIR, "photo_jobs.db"),
+    "W2G_SETTLEMENT_DB": os.path.join(DATA_DIR, "settlement.db"),
+    "W2G_REWARD_SWEEP_DB": os.path.join(DATA_DIR, "reward_sweep.db"),
+    "W2G_BLOB_DIR": os.path.join(DATA_DIR, "blobs"),
+})
+# Loggers write to ./logs relative to the working directory
+os.chdir(DATA_DIR)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def proof_index(tmp_path, monkeypatch):
+    """
+    An empty proof-hash index, so photos accepted by one test are not duplicates in the next.
+    """
+    from agents import photo_validator
+
+    index = photo_validator.ProofHashIndex(str(tmp_path / "proof_hashes.jsonl"))
+    monkeypatch.setattr(photo_validator, "proof_index", index)
+    return index
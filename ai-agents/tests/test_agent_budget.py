@@ -0,0 +1,150 @@
+import asyncio
+import time
+import uuid
+from typing import Any
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+
+from agents import photo_validator
+from agents.photo_validator import PhotoValidatorAgent, avalidate_photo
+from tests.conftest import IMAGES
+from utils.llm_scheduler import LLMScheduler
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    # Runaway loops would otherwise spend the shared scheduler's per-minute quota for later tests
+    scheduler = LLMScheduler()
+    monkeypatch.setattr(photo_validator, "scheduler", scheduler)
+    return scheduler
+
+
+class RunawayModel(BaseChatModel):
+    """
+    Never settles on a score: every turn asks for the tool again.
+    """
+    tokens_per_turn: int = 100
+    latency: float = 0.0
+    calls: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "runaway"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls.append(len(messages))
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content="", tool_calls=[{
+            "name": "describe", "args": {"photo_path": "photo.jpg"}, "id": f"call_{uuid.uuid4().hex[:8]}"
+        }])
+        message.usage_metadata = {"input_tokens": self.tokens_per_turn, "output_tokens": 0,
+                                  "total_tokens": self.tokens_per_turn}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@tool
+async def describe(photo_path: str) -> str:
+    """
+    Describes the photo.
+    """
+    return "People handing out food. Maybe."
+
+
+def runaway_agent(max_turns=50, token_budget=10**9, time_budget=60.0, tokens_per_turn=100, latency=0.0):
+    model = RunawayModel(tokens_per_turn=tokens_per_turn, latency=latency, calls=[])
+    agent = PhotoValidatorAgent(model, tools=[describe], max_turns=max_turns, token_budget=token_budget,
+                                time_budget=time_budget)
+    return agent, model
+
+
+def run(agent: PhotoValidatorAgent) -> dict:
+    return asyncio.run(agent.graph.ainvoke({
+        "messages": [HumanMessage(content="Please validate this donation photo: photo.jpg")],
+        "score": 0.0,
+        "validation_result": False,
+        "turns": 0,
+        "tokens_used": 0,
+        "started_at": time.monotonic()
+    }))
+
+
+def test_turn_limit_stops_a_runaway_loop():
+    agent, model = runaway_agent(max_turns=3)
+    result = run(agent)
+    assert result["budget_exhausted"] == "max_turns"
+    assert result["turns"] == 3
+    assert len(model.calls) == 3
+    assert (result["validation_result"], result["score"]) == (False, 0.0)
+
+
+def test_token_budget_counts_model_usage_and_vision_estimates():
+    # Each turn costs 1000 model tokens plus the vision call's estimate
+    per_turn = 1000 + photo_validator.VISION_TOKEN_ESTIMATE
+    agent, model = runaway_agent(token_budget=2 * per_turn, tokens_per_turn=1000)
+    result = run(agent)
+    assert result["budget_exhausted"] == "tokens"
+    assert len(model.calls) == 2
+    assert result["tokens_used"] == 2 * per_turn
+    assert result["validation_result"] is False
+
+
+def test_time_budget_cuts_a_slow_model_call_short():
+    agent, model = runaway_agent(time_budget=0.3, latency=0.2)
+    started = time.monotonic()
+    result = run(agent)
+    assert result["budget_exhausted"] == "time"
+    assert time.monotonic() - started < 1.0
+    assert len(model.calls) == 2
+    assert result["validation_result"] is False
+
+
+def test_history_sent_to_the_model_stays_bounded():
+    agent, model = runaway_agent(max_turns=8)
+    agent.history_messages = 4
+    run(agent)
+    # System prompt + original request + the last 4 messages at most
+    assert max(model.calls) <= 6
+
+
+def test_exhausted_budget_rejects_the_photo_without_indexing_it(proof_index, monkeypatch):
+    agent, _ = runaway_agent(max_turns=2)
+    monkeypatch.setattr(photo_validator, "get_photo_agent", lambda: agent)
+    result = asyncio.run(avalidate_photo(str(IMAGES / "giving_1.jpg"), mode="agent"))
+
+    assert result["validation_result"] is False
+    assert result["score"] == 0.0
+    assert result["usage"]["budget_exhausted"] == "max_turns"
+    assert result["usage"]["turns"] == 2
+    assert proof_index.find_duplicate(
+        photo_validator.prefilter_photo(str(IMAGES / "giving_1.jpg"))["phash"], {"give_ref": "other"}
+    ) is None
+
+
+class RejectingModel(RunawayModel):
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls.append(len(messages))
+        error = ValueError("invalid request: unsupported parameter")
+        error.status_code = 400
+        raise error
+
+
+def test_rejected_request_is_an_error_not_an_outage(proof_index, monkeypatch, scheduler):
+    model = RejectingModel(calls=[])
+    agent = PhotoValidatorAgent(model, tools=[describe])
+    monkeypatch.setattr(photo_validator, "get_photo_agent", lambda: agent)
+
+    # No heuristic stand-in score and no open circuit for a request the provider refused
+    with pytest.raises(ValueError, match="invalid request"):
+        asyncio.run(avalidate_photo(str(IMAGES / "giving_1.jpg"), mode="agent", fallback="heuristic"))
+    assert len(model.calls) == 1
+    assert scheduler.breaker.state == "closed"
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from api.server import app, UPLOAD_MAX_BYTES
+from tests.conftest import IMAGES
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent
+
+client = TestClient(app)
+
+
+def test_upload_rejects_malformed_content_length():
+    response = client.post(
+        "/agent/photo-validator/upload", content=b"\xff\xd8", headers={"Content-Length": "abc"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid Content-Length header"
+
+
+def test_upload_rejects_oversized_content_length():
+    response = client.post(
+        "/agent/photo-validator/upload", content=b"\xff\xd8", headers={"Content-Length": str(UPLOAD_MAX_BYTES + 1)}
+    )
+    assert response.status_code == 413
+
+
+def test_upload_rejects_empty_body():
+    assert client.post("/agent/photo-validator/upload", content=b"").status_code == 400
+
+
+def test_import_opens_no_job_store(tmp_path):
+    job_db = tmp_path / "data" / "photo_jobs.db"
+    env = {**os.environ, "W2G_PHOTO_JOB_DB": str(job_db)}
+    subprocess.run([sys.executable, "-c", "import api.server"], cwd=AGENTS_DIR, env=env, check=True)
+    assert not job_db.parent.exists()
+
+
+def test_photo_jobs_run_through_the_lifespan_queue(proof_index):
+    with TestClient(app) as started:
+        submitted = started.post(
+            "/agent/photo-validator/jobs", json={"photo_path": str(IMAGES / "giving_3.jpg"), "mode": "single"}
+        )
+        assert submitted.status_code == 202
+        job = started.get(f"/agent/photo-validator/jobs/{submitted.json()['job_id']}", params={"wait": 10}).json()
+        assert job["status"] == "done"
+        assert job["result"]["score"] is not None
+        assert started.get("/metrics/llm").json()["photo_job_queue_depth"] == 0
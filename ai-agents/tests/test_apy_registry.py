@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+
+from agents.vault_decider import VaultDeciderAgent
+from utils.apy_registry import APYNotLoadedError, APYProvider, CachedAPYRegistry, StaticAPYProvider
+
+VAULTS = {"vendor_a": {"apy": 12.0}, "vendor_b": {"apy": 4.0}}
+
+
+class GatedProvider(APYProvider):
+    """
+    Static APYs, but every fetch blocks until the test opens the gate.
+    """
+    name = "gated"
+
+    def __init__(self, vaults=VAULTS):
+        self.inner = StaticAPYProvider(vaults)
+        self.gate = threading.Event()
+        self.fetches = 0
+
+    def fetch_many(self, vendor_ids):
+        self.fetches += 1
+        assert self.gate.wait(5)
+        return self.inner.fetch_many(vendor_ids)
+
+
+class FailingProvider(APYProvider):
+    name = "failing"
+
+    def fetch_many(self, vendor_ids):
+        raise ConnectionError("provider down")
+
+
+def test_get_serves_cached_apys():
+    registry = CachedAPYRegistry(StaticAPYProvider(VAULTS), miss_wait=1)
+    assert registry.get("vendor_a") == 12.0
+    assert registry.get("vendor_a") == 12.0
+    assert registry.metrics()["hits"] == 1
+
+
+def test_vendor_without_vault_is_none_and_cached():
+    provider = GatedProvider()
+    provider.gate.set()
+    registry = CachedAPYRegistry(provider, miss_wait=1)
+    assert registry.get("vendor_x") is None
+    assert registry.get("vendor_x") is None
+    assert provider.fetches == 1
+
+
+def test_slow_miss_is_not_loaded_rather_than_no_vault():
+    provider = GatedProvider()
+    registry = CachedAPYRegistry(provider, miss_wait=0.01)
+    with pytest.raises(APYNotLoadedError, match="vendor_a"):
+        registry.get("vendor_a")
+    assert registry.metrics()["miss_timeouts"] == 1
+
+    provider.gate.set()
+    registry.prefetch(["vendor_a"], wait=True, timeout=5)
+    assert registry.get("vendor_a") == 12.0
+
+
+def test_failed_fetch_is_not_loaded():
+    registry = CachedAPYRegistry(FailingProvider(), miss_wait=1)
+    with pytest.raises(APYNotLoadedError, match="provider down"):
+        registry.get("vendor_a")
+
+
+def test_stale_entries_are_served_while_refreshing():
+    registry = CachedAPYRegistry(StaticAPYProvider(VAULTS), ttl=0, max_stale=60, miss_wait=1)
+    assert registry.get("vendor_a") == 12.0
+    assert registry.get("vendor_a") == 12.0
+    assert registry.metrics()["stale_hits"] == 1
+
+
+def test_vault_decider_leaves_decision_pending_until_apy_loads():
+    provider = GatedProvider()
+    agent = VaultDeciderAgent(apy_registry=CachedAPYRegistry(provider, miss_wait=0.01), mode="single")
+    assert agent.run({"tokens": 20, "vendor_id": "vendor_a"})["action"] == "pending"
+
+    provider.gate.set()
+    agent.apy_registry.prefetch(["vendor_a"], wait=True, timeout=5)
+    result = agent.run({"tokens": 20, "vendor_id": "vendor_a"})
+    assert result["action"] == "staked"
+    assert result["vendor_apy"] == 12.0
+
+
+def test_vault_decider_takes_no_action_without_vault():
+    agent = VaultDeciderAgent(apy_registry=CachedAPYRegistry(StaticAPYProvider(VAULTS)), mode="single")
+    result = agent.run({"tokens": 20, "vendor_id": "vendor_x"})
+    assert result["vendor_apy"] == 0
+    assert result.get("action") is None
+
+
+class CountingProvider(APYProvider):
+    name = "counting"
+
+    def __init__(self, vaults):
+        self.inner = StaticAPYProvider(vaults)
+        self.fetched = []
+        self.down = False
+
+    def fetch_many(self, vendor_ids):
+        if self.down:
+            raise ConnectionError("provider down")
+        self.fetched.extend(vendor_ids)
+        return self.inner.fetch_many(vendor_ids)
+
+
+def wait_for_refreshes(registry: CachedAPYRegistry):
+    for future in list(registry.inflight.values()):
+        try:
+            future.result(timeout=5)
+        except Exception:
+            pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    from types import SimpleNamespace
+
+    from utils import apy_registry
+
+    now = [1000.0]
+    monkeypatch.setattr(apy_registry, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+def test_refresh_expired_is_a_noop_until_the_earliest_entry_expires(clock):
+    vaults = {f"vendor_{i}": {"apy": 5.0 + i % 10} for i in range(2000)}
+    provider = CountingProvider(vaults)
+    registry = CachedAPYRegistry(provider, ttl=100)
+    registry.prefetch(list(vaults), wait=True, timeout=5)
+    provider.fetched.clear()
+
+    clock[0] += 99
+    assert registry.refresh_expired() == 0
+    assert provider.fetched == []
+
+    clock[0] += 1
+    assert registry.refresh_expired() == 2000
+    wait_for_refreshes(registry)
+    assert sorted(provider.fetched) == sorted(vaults)
+    # Everything was just refreshed: nothing is due for another TTL
+    assert registry.refresh_expired() == 0
+    assert registry.next_refresh == clock[0] + 100
+
+
+def test_refresh_expired_retries_failed_fetches(clock, monkeypatch):
+    from utils import apy_registry
+
+    monkeypatch.setattr(apy_registry, "APY_RETRY_SECONDS", 10)
+    provider = CountingProvider(VAULTS)
+    provider.down = True
+    registry = CachedAPYRegistry(provider, ttl=100)
+    registry.prefetch(list(VAULTS), wait=True, timeout=5)
+    assert registry.metrics()["size"] == 0
+
+    provider.down = False
+    assert registry.refresh_expired() == 0
+    clock[0] += 10
+    assert registry.refresh_expired() == 2
+    wait_for_refreshes(registry)
+    assert registry.get("vendor_a") == 12.0
@@ -0,0 +1,53 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from utils import async_runner, llm_client
+
+
+async def loop_resources():
+    return asyncio.get_running_loop(), llm_client._get_resources()
+
+
+def test_blocking_callers_share_one_loop_and_client_pool():
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: async_runner.run_sync(loop_resources()), range(8)))
+    loops = {id(loop) for loop, _ in results}
+    pools = {id(resources.http_client) for _, resources in results}
+    assert len(loops) == 1 and len(pools) == 1
+    loop = results[0][0]
+    assert loop.is_running() and async_runner._thread is not threading.current_thread()
+
+
+def test_shutdown_closes_the_client_once_and_restarts_on_demand():
+    loop, resources = async_runner.run_sync(loop_resources())
+    async_runner.shutdown()
+    assert resources.http_client.is_closed
+    assert loop.is_closed()
+
+    new_loop, new_resources = async_runner.run_sync(loop_resources())
+    assert new_loop is not loop and new_resources is not resources
+
+
+def test_run_sync_refuses_to_deadlock_on_its_own_loop():
+    async def nested():
+        return async_runner.run_sync(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError, match="deadlock"):
+        async_runner.run_sync(nested())
+
+
+def child_loop_id():
+    loop, _ = async_runner.run_sync(loop_resources())
+    return id(loop), async_runner._thread.ident
+
+
+def test_forked_workers_start_their_own_loop():
+    parent_loop, _ = async_runner.run_sync(loop_resources())
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("fork")) as pool:
+        results = [pool.submit(child_loop_id).result(timeout=30) for _ in range(4)]
+    assert all(thread_ident for _, thread_ident in results)
+    assert async_runner._loop is parent_loop
@@ -0,0 +1,73 @@
+import pytest
+
+import main
+from tests.conftest import IMAGES
+from utils.checkpoints import get_checkpoint_store
+
+
+def give(mode: str) -> dict:
+    return {
+        "tokens": 20,
+        "vendor_id": "vendor_456",
+        "viewer_id": "user_123",
+        "verified_gives": 22,
+        "photo_path": str(IMAGES / "giving_3.jpg"),
+        "validation_mode": mode,
+    }
+
+
+def open_runs() -> set:
+    return {run["run_id"] for run in get_checkpoint_store().failed_runs()}
+
+
+@pytest.mark.parametrize("mode", ["agent", "single"])
+def test_run_give_with_checkpoints(mode, proof_index):
+    assert main.CHECKPOINTS
+    run_id, result = main.run_give(give(mode))
+
+    assert result["validation_result"] is True
+    assert result["score"] > 0.75
+    assert result["reward_type"] == "robux"
+    # A completed run leaves no checkpoints behind
+    assert run_id not in open_runs()
+    assert not main.get_checkpointed_graph().get_state({"configurable": {"thread_id": run_id}}).values
+
+
+class FailingVaultDecider:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run(self, state):
+        raise ConnectionError("vault registry down")
+
+
+@pytest.mark.parametrize("mode", ["agent", "single"])
+def test_failed_run_resumes_after_last_completed_node(mode, proof_index, monkeypatch):
+    validations = []
+    validate = main.test
+
+    def counting_test(*args, **kwargs):
+        validations.append(args)
+        return validate(*args, **kwargs)
+
+    monkeypatch.setattr(main, "test", counting_test)
+    monkeypatch.setattr(main, "VaultDeciderAgent", FailingVaultDecider)
+    with pytest.raises(ConnectionError):
+        main.run_give(give(mode), run_id=f"resume-{mode}")
+    assert f"resume-{mode}" in open_runs()
+    assert len(validations) == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(main, "test", counting_test)
+    run_id, result = main.run_give(None, run_id=f"resume-{mode}")
+
+    # The photo was validated once, before the failure; the resumed run starts at the vault decider
+    assert len(validations) == 1
+    assert result["validation_result"] is True
+    assert result["action"] == "staked"
+    assert run_id not in open_runs()
+
+
+def test_resume_of_unknown_run_fails():
+    with pytest.raises(ValueError, match="No checkpoint"):
+        main.run_give(None, run_id="never-started")
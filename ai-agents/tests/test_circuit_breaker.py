@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = {"window": 10, "min_calls": 4, "failure_rate": 0.5, "slow_call_seconds": 5,
+               "slow_rate": 0.75, "open_seconds": 30, "max_open_seconds": 100}
+    return CircuitBreaker("llm", **{**options, **kwargs})
+
+
+def trip(cb: CircuitBreaker):
+    for _ in range(cb.min_calls):
+        cb.record(0.1, failed=True)
+    assert cb.state == OPEN
+
+
+def test_stays_closed_below_min_calls_and_failure_rate(clock):
+    cb = breaker()
+    for _ in range(3):
+        cb.record(0.1, failed=True)
+    assert cb.state == CLOSED
+
+    cb = breaker()
+    for failed in (True, False, False, False, True, False):
+        cb.record(0.1, failed=failed)
+    assert cb.state == CLOSED
+    assert cb.before_call() is False
+
+
+def test_opens_on_failure_rate_and_fails_fast(clock):
+    cb = breaker()
+    trip(cb)
+    with pytest.raises(CircuitOpenError) as error:
+        cb.before_call()
+    assert error.value.retry_after == 30
+    clock.now += 20
+    with pytest.raises(CircuitOpenError) as error:
+        cb.before_call()
+    assert error.value.retry_after == 10
+    assert cb.metrics()["rejected"] == 2
+    assert cb.metrics()["trips"] == 1
+
+
+def test_opens_on_slow_calls(clock):
+    cb = breaker()
+    for _ in range(4):
+        cb.record(6.0, failed=False)
+    assert cb.state == OPEN
+
+
+def test_half_open_lets_exactly_one_probe_through(clock):
+    cb = breaker()
+    trip(cb)
+    clock.now += 30
+
+    # A check without claiming the probe leaves it for the next caller
+    assert cb.before_call(probe=False) is False
+    assert cb.state == HALF_OPEN
+    assert cb.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+
+    cb.release_probe()
+    assert cb.before_call() is True
+    assert cb.metrics()["probes"] == 2
+
+
+def test_successful_probe_closes_and_resets_backoff(clock):
+    cb = breaker()
+    trip(cb)
+    clock.now += 30
+    assert cb.before_call() is True
+    cb.record(0.1, failed=True)
+    assert cb.state == OPEN
+    assert cb.open_seconds == 60
+
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+    clock.now += 1
+    assert cb.before_call() is True
+    cb.record(0.1, failed=False)
+    assert cb.state == CLOSED
+    assert cb.open_seconds == 30
+    assert cb.metrics()["window_calls"] == 0
+
+
+def test_failed_probes_back_off_up_to_the_max(clock):
+    cb = breaker()
+    trip(cb)
+    waits = []
+    for _ in range(4):
+        clock.now += cb.open_seconds
+        assert cb.before_call() is True
+        # A slow probe counts as a failed one
+        cb.record(6.0, failed=False)
+        waits.append(cb.open_seconds)
+    assert waits == [60, 100, 100, 100]
+
+
+def test_outcomes_while_open_are_ignored(clock):
+    cb = breaker()
+    trip(cb)
+    # Calls that were already in flight when the circuit opened
+    cb.record(0.1, failed=False)
+    assert cb.state == OPEN
+    assert cb.metrics()["window_calls"] == 0
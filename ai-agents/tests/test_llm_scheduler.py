@@ -0,0 +1,175 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import llm_client, llm_scheduler
+from utils.llm_scheduler import LLMScheduler, LLMUnavailableError, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_scheduler, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_token_bucket_starts_full_and_refills(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.available() == 60
+    assert bucket.reserve(50) == 0.0
+    assert bucket.available() == 10
+
+    clock.now += 20
+    assert bucket.available() == 30
+    clock.now += 600
+    assert bucket.available() == 60
+
+
+def test_token_bucket_debt_turns_into_wait(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(60)
+    # One token per second: the next caller waits 5s, the one after it 10s (FIFO)
+    assert bucket.reserve(5) == pytest.approx(5.0)
+    assert bucket.reserve(5) == pytest.approx(10.0)
+    clock.now += 10
+    assert bucket.available() == pytest.approx(0.0)
+
+
+def test_token_bucket_caps_oversized_requests(clock):
+    bucket = TokenBucket(per_minute=60, burst=10)
+    # A request above the burst size costs a full bucket instead of waiting forever
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def run(coro_factory):
+    async def main():
+        try:
+            return await coro_factory()
+        finally:
+            await llm_client.aclose()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "BACKOFF_BASE", 0.001)
+    return LLMScheduler(requests_per_minute=6000, tokens_per_minute=10**7, max_retries=2, call_timeout=1)
+
+
+def test_scheduler_retries_rate_limits(scheduler):
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert run(lambda: scheduler.call(flaky)) == "ok"
+    assert len(attempts) == 3
+    assert scheduler.stats["retries"] == 2
+
+
+def test_scheduler_gives_up_after_max_retries(scheduler):
+    async def down():
+        raise RateLimited()
+
+    with pytest.raises(LLMUnavailableError, match="after 3 attempt"):
+        run(lambda: scheduler.call(down))
+
+
+def test_scheduler_does_not_retry_bad_requests(scheduler):
+    attempts = []
+
+    async def bad():
+        attempts.append(1)
+        raise BadRequest()
+
+    # Not an outage: the provider's own error reaches the caller
+    with pytest.raises(BadRequest):
+        run(lambda: scheduler.call(bad))
+    assert len(attempts) == 1
+
+
+def test_rejected_requests_never_open_the_circuit(scheduler):
+    async def bad():
+        raise BadRequest()
+
+    for _ in range(3 * scheduler.breaker.min_calls):
+        with pytest.raises(BadRequest):
+            run(lambda: scheduler.call(bad))
+    assert scheduler.breaker.state == "closed"
+    assert scheduler.breaker.metrics()["window_failure_rate"] == 0.0
+
+
+def test_transport_errors_and_server_errors_open_the_circuit(scheduler):
+    class ServerError(Exception):
+        status_code = 503
+
+    attempts = []
+
+    async def down():
+        attempts.append(1)
+        raise (ConnectionError("connection reset") if len(attempts) % 2 else ServerError())
+
+    while scheduler.breaker.state == "closed":
+        with pytest.raises(LLMUnavailableError):
+            run(lambda: scheduler.call(down))
+    # Every attempt, retries included, counted as a failure
+    assert len(attempts) == scheduler.breaker.min_calls
+    with pytest.raises(LLMUnavailableError, match="is open"):
+        run(lambda: scheduler.call(down))
+    assert len(attempts) == scheduler.breaker.min_calls
+
+
+def test_scheduler_coalesces_identical_calls(scheduler):
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "described"
+
+    async def both():
+        return await asyncio.gather(*(scheduler.call(slow, key="same") for _ in range(3)))
+
+    assert run(both) == ["described"] * 3
+    assert len(calls) == 1
+    assert scheduler.stats["coalesced"] == 2
+
+
+def test_scheduler_cancels_shared_call_without_waiters(scheduler):
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        finished.append(1)
+
+    async def cancel_all():
+        waiters = [asyncio.ensure_future(scheduler.call(slow, key="same")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.3)
+
+    run(cancel_all)
+    assert finished == []
@@ -0,0 +1,58 @@
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.logger import setup_logger
+
+
+def log_lines(name: str) -> list[str]:
+    path = Path("logs") / "tests" / f"{name}.log"
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def flush(logger: logging.Logger):
+    # Stopping a listener drains its queue; restart it for whoever logs next
+    for handler in logger.handlers:
+        if getattr(handler, "started", False):
+            handler.listener.stop()
+            handler.listener.start()
+
+
+def test_queue_logger_writes_on_listener_thread():
+    logger = setup_logger("QueueTest", "tests", "queue.log", use_queue=True)
+    logger.info("[QueueTest] - hello")
+    flush(logger)
+    assert log_lines("queue")[-1].endswith("[INFO] [QueueTest] - hello")
+
+
+def test_json_format_keeps_extra_fields():
+    logger = setup_logger("JsonTest", "tests", "json.log", fmt="json", use_queue=False)
+    logger.info("[JsonTest] - done", extra={"duration_ms": 12.5})
+    entry = json.loads(log_lines("json")[-1])
+    assert entry["agent"] == "JsonTest"
+    assert entry["msg"] == "[JsonTest] - done"
+    assert entry["duration_ms"] == 12.5
+
+
+def log_in_worker(i: int) -> int:
+    logger = setup_logger("ForkTest", "tests", "fork.log", use_queue=True)
+    logger.info(f"[ForkTest] - worker record {i}")
+    return i
+
+
+def test_queue_logger_survives_fork():
+    logger = setup_logger("ForkTest", "tests", "fork.log", use_queue=True)
+    # The parent's listener is running before the pool forks
+    logger.info("[ForkTest] - parent record")
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        assert sorted(pool.map(log_in_worker, range(8))) == list(range(8))
+    flush(logger)
+
+    lines = log_lines("fork")
+    assert sum("worker record" in line for line in lines) == 8
+    # Records queued in the parent are not written again by the children
+    assert sum("parent record" in line for line in lines) == 1
@@ -0,0 +1,27 @@
+import asyncio
+import hashlib
+import json
+
+from agents.photo_validator import encode_photo
+from tests.conftest import IMAGES
+from utils.image_preprocessing import preprocess_image
+from utils.model_provider import StubProvider
+
+
+def test_stub_recordings_are_keyed_by_the_image_file_sha256(tmp_path):
+    photo = IMAGES / "giving_1.jpg"
+    digest = hashlib.sha256(photo.read_bytes()).hexdigest()
+    recordings = tmp_path / "recordings.json"
+    recordings.write_text(json.dumps({digest: {"score": 0.42, "reasoning": "recorded", "description": "A donation."}}))
+    provider = StubProvider(recordings_path=str(recordings))
+
+    data_uri, image_sha256 = encode_photo(str(photo))
+    assert image_sha256 == digest
+    reply = json.loads(asyncio.run(provider.complete_vision("m", "p", data_uri, json_mode=True, image_sha256=image_sha256)))
+    assert reply == {"score": 0.42, "reasoning": "recorded"}
+
+    # Other preprocessing settings send other bytes, but the recording still matches
+    smaller = preprocess_image(photo.read_bytes(), max_edge=320).data_uri
+    assert smaller != data_uri
+    description = asyncio.run(provider.complete_vision("m", "p", smaller, image_sha256=image_sha256))
+    assert description == "A donation. [stub-score=0.42]"
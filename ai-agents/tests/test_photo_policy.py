@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from agents.photo_validator import avalidate_photos, decide_policy
+from tests.conftest import IMAGES
+
+
+def verdict(passed: bool, score: float = None) -> dict:
+    return {"validation_result": passed, "score": score if score is not None else (0.9 if passed else 0.2)}
+
+
+@pytest.mark.parametrize("results, expected", [
+    ([], None),
+    ([verdict(False)], None),
+    ([verdict(False), verdict(True)], True),
+    ([verdict(False)] * 3, False),
+])
+def test_any_policy(results, expected):
+    assert decide_policy("any", results, total=3) is expected
+
+
+@pytest.mark.parametrize("results, total, expected", [
+    ([verdict(True)], 3, None),
+    ([verdict(True), verdict(True)], 3, True),
+    ([verdict(False), verdict(False)], 3, False),
+    ([verdict(True), verdict(False)], 3, None),
+    # 2 of 4 is not a majority: it fails once a third photo can't pass
+    ([verdict(True), verdict(True), verdict(False)], 4, None),
+    ([verdict(True), verdict(True), verdict(False), verdict(False)], 4, False),
+    ([verdict(True)] * 3, 4, True),
+])
+def test_majority_policy(results, total, expected):
+    assert decide_policy("majority", results, total) is expected
+
+
+@pytest.mark.parametrize("results, expected", [
+    ([verdict(True, 0.95)], None),
+    ([verdict(False, 0.4), verdict(True, 1.0)], True),
+    ([verdict(True, 0.8), verdict(False, 0.6), verdict(False, 0.3)], True),
+    ([verdict(False, 0.7), verdict(True, 0.5), verdict(False, None)], False),
+])
+def test_max_policy(results, expected):
+    assert decide_policy("max", results, total=len(results) if expected is not None else 3) is expected
+
+
+def test_avalidate_photos_combines_with_policy(proof_index):
+    photos = [str(IMAGES / "not_giving_1.jpg"), str(IMAGES / "giving_3.jpg")]
+    result = asyncio.run(avalidate_photos(photos, mode="single", policy="any"))
+    assert result["validation_result"] is True
+
+    result = asyncio.run(avalidate_photos(photos[:1], mode="single", policy="majority"))
+    assert result["validation_result"] is False
+
+
+def test_avalidate_photos_rejects_unknown_policy():
+    with pytest.raises(ValueError, match="Unknown photo policy"):
+        asyncio.run(avalidate_photos([str(IMAGES / "giving_1.jpg")], policy="all"))
@@ -0,0 +1,106 @@
+from agents.photo_validator import BKTree, ProofHashIndex, hamming_distance, prefilter_photo
+
+from tests.conftest import IMAGES
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(2**64 - 1, 0) == 64
+
+
+def test_bktree_search_within_radius():
+    tree = BKTree()
+    hashes = [0x0, 0x1, 0x3, 0xFF, 0xFFFF, 2**64 - 1]
+    for h in hashes:
+        tree.add(h, hex(h))
+
+    assert tree.size == len(hashes)
+    assert tree.search(0x0, 0) == [(0, "0x0")]
+    assert tree.search(0x0, 2) == [(0, "0x0"), (1, "0x1"), (2, "0x3")]
+    # Same answer as a linear scan, for every radius
+    for radius in range(0, 65, 8):
+        expected = sorted(hamming_distance(0xF0, h) for h in hashes if hamming_distance(0xF0, h) <= radius)
+        assert [d for d, _ in tree.search(0xF0, radius)] == expected
+
+
+def test_bktree_empty():
+    assert BKTree().search(0x1234, 64) == []
+
+
+def proof(photo="a.jpg", sha256="aa", give_ref="give-1", vendor_id="vendor-1"):
+    return {"photo": photo, "sha256": sha256, "give_ref": give_ref, "vendor_id": vendor_id}
+
+
+def test_index_does_not_match_the_same_proof(tmp_path):
+    index = ProofHashIndex(str(tmp_path / "hashes.jsonl"))
+    index.add(0xABCD, proof())
+
+    assert index.find_duplicate(0xABCD, proof(), max_distance=6) is None
+    assert index.find_duplicate(0xABCF, proof(), max_distance=6) is None
+
+
+def test_index_matches_recycled_proofs(tmp_path):
+    index = ProofHashIndex(str(tmp_path / "hashes.jsonl"))
+    index.add(0xABCD, proof())
+
+    for recycled in (proof(give_ref="give-2"), proof(vendor_id="vendor-2"), proof(sha256="bb"), proof(photo="b.jpg")):
+        distance, entry = index.find_duplicate(0xABCF, recycled, max_distance=6)
+        assert distance == 1
+        assert entry["photo"] == "a.jpg"
+    assert index.find_duplicate(0xFFFF_0000, proof(give_ref="give-2"), max_distance=6) is None
+
+
+def test_index_persists_and_skips_repeated_adds(tmp_path):
+    path = tmp_path / "hashes.jsonl"
+    index = ProofHashIndex(str(path))
+    index.add(0xABCD, proof())
+    index.add(0xABCD, proof())
+    assert len(path.read_text().splitlines()) == 1
+
+    reloaded = ProofHashIndex(str(path))
+    assert reloaded.find_duplicate(0xABCD, proof(give_ref="give-2"))[1] == proof()
+
+
+def test_index_matches_repeats_without_give_ref(tmp_path):
+    index = ProofHashIndex(str(tmp_path / "hashes.jsonl"))
+    index.add(0xABCD, proof(give_ref=None, vendor_id=None))
+
+    # A byte-identical re-upload that names no give can't be told apart from a recycled proof
+    distance, entry = index.find_duplicate(0xABCD, proof(give_ref=None, vendor_id=None))
+    assert distance == 0
+    assert entry["photo"] == "a.jpg"
+    assert index.find_duplicate(0xABCD, proof(give_ref="give-1", vendor_id=None)) is not None
+
+
+def test_index_reads_older_entries(tmp_path):
+    path = tmp_path / "hashes.jsonl"
+    path.write_text('{"phash": "000000000000abcd", "photo": "a.jpg"}\n')
+    index = ProofHashIndex(str(path))
+
+    # Older lines record no give, so nothing is exempt from them
+    assert index.find_duplicate(0xABCD, proof(photo="a.jpg"))[1] == {"photo": "a.jpg"}
+    assert index.find_duplicate(0xABCD, proof(photo="b.jpg"))[1] == {"photo": "a.jpg"}
+
+
+def test_prefilter_rejects_only_other_gives(proof_index):
+    photo = str(IMAGES / "giving_1.jpg")
+    first = prefilter_photo(photo, give_ref="give-1", vendor_id="vendor-1")
+    assert first["rejected"] is None
+    proof_index.add(first["phash"], first["proof"])
+
+    # Resuming or retrying the same give re-validates the same photo
+    assert prefilter_photo(photo, give_ref="give-1", vendor_id="vendor-1")["rejected"] is None
+    again = prefilter_photo(photo, give_ref="give-2", vendor_id="vendor-1")
+    assert again["rejected"].startswith("near-duplicate")
+    assert again["duplicate_of"] == photo
+
+
+def test_prefilter_rejects_reupload_without_give_ref(proof_index):
+    photo = str(IMAGES / "giving_1.jpg")
+    first = prefilter_photo(photo)
+    assert first["rejected"] is None
+    proof_index.add(first["phash"], first["proof"])
+
+    again = prefilter_photo(photo)
+    assert again["rejected"].startswith("near-duplicate")
+    assert again["duplicate_of"] == photo
@@ -0,0 +1,84 @@
+import json
+import sqlite3
+
+from utils.result_store import ResultStore
+
+
+def give(vendor_id="vendor_1", viewer_id="user_1", **extra) -> dict:
+    return {"vendor_id": vendor_id, "viewer_id": viewer_id, "tokens": 12, "action": "staked", **extra}
+
+
+def test_append_and_read_only_what_was_appended_since(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), legacy_json=None)
+    first = store.append(give(), run_id="run-1")
+    second = store.append(give(viewer_id="user_2"))
+
+    rows = store.query()
+    assert [r["id"] for r in rows] == [first, second]
+    assert rows[0]["run_id"] == "run-1" and rows[0]["tokens"] == 12
+
+    last_id = rows[-1]["id"]
+    assert store.query(after_id=last_id) == []
+    third = store.append(give(vendor_id="vendor_2"))
+    assert [r["id"] for r in store.query(after_id=last_id)] == [third]
+    assert store.count() == 3
+
+
+def test_query_filters_and_limit(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), legacy_json=None)
+    for i in range(5):
+        store.append(give(vendor_id=f"vendor_{i % 2}", viewer_id=f"user_{i}"))
+
+    assert [r["viewer_id"] for r in store.query(vendor_id="vendor_1")] == ["user_1", "user_3"]
+    assert [r["viewer_id"] for r in store.query(viewer_id="user_4")] == ["user_4"]
+    assert len(store.query(limit=2)) == 2
+    assert store.query(since=4102444800) == []
+
+
+def test_dashboard_incremental_read(tmp_path):
+    # The dashboard reads the store read-only with its own query, paging by id
+    path = tmp_path / "results.db"
+    store = ResultStore(str(path), legacy_json=None)
+    store.append(give(viewer_id="user_1"))
+
+    def read_since(last_id):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT id, payload FROM results WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        finally:
+            conn.close()
+
+    rows = read_since(0)
+    assert [json.loads(payload)["viewer_id"] for _, payload in rows] == ["user_1"]
+    store.append(give(viewer_id="user_2"))
+    assert [json.loads(payload)["viewer_id"] for _, payload in read_since(rows[-1][0])] == ["user_2"]
+
+
+def test_legacy_result_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "result.json"
+    legacy.write_text(json.dumps([give(viewer_id="old_1"), give(viewer_id="old_2")]))
+    path = str(tmp_path / "results.db")
+
+    store = ResultStore(path, legacy_json=str(legacy))
+    assert [r["viewer_id"] for r in store.query()] == ["old_1", "old_2"]
+    assert store.query()[0]["created_at"] == legacy.stat().st_mtime
+
+    store.append(give(viewer_id="new"))
+    store.close()
+    # Reopening (e.g. another worker) does not import the file again
+    reopened = ResultStore(path, legacy_json=str(legacy))
+    assert [r["viewer_id"] for r in reopened.query()] == ["old_1", "old_2", "new"]
+    assert reopened.migrate_from_json(str(legacy)) == 0
+
+
+def test_legacy_single_result_and_corrupt_file(tmp_path):
+    single = tmp_path / "result.json"
+    single.write_text(json.dumps(give(viewer_id="only")))
+    store = ResultStore(str(tmp_path / "a.db"), legacy_json=str(single))
+    assert [r["viewer_id"] for r in store.query()] == ["only"]
+
+    corrupt = tmp_path / "corrupt" / "result.json"
+    corrupt.parent.mkdir()
+    corrupt.write_text("{not json")
+    store = ResultStore(str(tmp_path / "b.db"), legacy_json=str(corrupt))
+    assert store.count() == 0
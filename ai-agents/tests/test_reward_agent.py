@@ -0,0 +1,96 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from agents.reward_agent import DEFAULT_REWARD_THRESHOLDS, RewardAgent, RewardTierTable, compile_tiers
+
+
+def test_tier_lookup_boundaries():
+    tiers = RewardTierTable(DEFAULT_REWARD_THRESHOLDS)
+    assert tiers.lookup(9) is None
+    assert tiers.lookup(10) == (10, "v-bucks")
+    assert tiers.lookup(49) == (20, "robux")
+    assert tiers.lookup(10**6) == (50, "mystery-nft")
+
+
+def test_lookup_many_matches_lookup():
+    tiers = RewardTierTable({20: "robux", 10: "v-bucks", 50: "mystery-nft"})
+    gives = np.arange(0, 70)
+    indices = tiers.lookup_many(gives)
+    for g, i in zip(gives, indices):
+        expected = tiers.lookup(int(g))
+        if i < 0:
+            assert expected is None
+        else:
+            assert (tiers.thresholds[i], tiers.rewards[i]) == expected
+
+
+def test_compiled_tiers_are_shared():
+    assert compile_tiers({10: "a", 20: "b"}) is compile_tiers({20: "b", 10: "a"})
+
+
+def test_agent_assigns_highest_reached_tier():
+    result = RewardAgent().run({"viewer_id": "user_1", "verified_gives": 22})
+    assert result["reward_type"] == "robux"
+    assert result["reward_status"] == "delivered"
+    assert RewardAgent().run({"viewer_id": "user_2", "verified_gives": 3})["reward_type"] is None
+
+
+@pytest.fixture
+def rewards_db(tmp_path):
+    path = tmp_path / "rewards.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, gives INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)", [
+            ("a", 5), ("b", 10), ("c", 25), ("d", 60), ("e", None),
+        ])
+    return path
+
+
+def set_gives(db, user_id, gives):
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE users SET gives = ? WHERE user_id = ?", (gives, user_id))
+
+
+def test_sweep_dispatches_only_upgrades(rewards_db, tmp_path):
+    state_db = str(tmp_path / "sweep.db")
+    agent = RewardAgent(rewards_db=str(rewards_db))
+    batches = []
+
+    stats = agent.sweep(dispatch=batches.append, chunk_size=2, state_db=state_db)
+    assert stats["viewers"] == 5
+    assert stats["by_reward"] == {"v-bucks": 1, "robux": 1, "mystery-nft": 1}
+    dispatched = {r["viewer_id"]: r["reward_type"] for batch in batches for r in batch}
+    assert dispatched == {"b": "v-bucks", "c": "robux", "d": "mystery-nft"}
+
+    # Nothing changed: a second sweep pays nobody
+    batches.clear()
+    assert agent.sweep(dispatch=batches.append, state_db=state_db)["dispatched"] == 0
+
+    # Only viewers who reached a higher tier are paid again
+    set_gives(rewards_db, "a", 12)
+    set_gives(rewards_db, "c", 29)
+    set_gives(rewards_db, "b", 51)
+    agent.sweep(dispatch=batches.append, state_db=state_db)
+    assert {r["viewer_id"]: r["reward_type"] for batch in batches for r in batch} == {
+        "a": "v-bucks", "b": "mystery-nft"
+    }
+
+
+def test_interrupted_sweep_resumes_without_paying_twice(rewards_db, tmp_path):
+    state_db = str(tmp_path / "sweep.db")
+    agent = RewardAgent(rewards_db=str(rewards_db))
+    paid = []
+
+    def failing_dispatch(batch):
+        if paid:
+            raise ConnectionError("payout service down")
+        paid.extend(r["viewer_id"] for r in batch)
+
+    with pytest.raises(ConnectionError):
+        agent.sweep(dispatch=failing_dispatch, chunk_size=2, state_db=state_db)
+
+    resumed = []
+    agent.sweep(dispatch=lambda batch: resumed.extend(r["viewer_id"] for r in batch), chunk_size=2, state_db=state_db)
+    assert sorted(paid + resumed) == ["b", "c", "d"]
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from agents.give_router import RouterAgent
+from utils.settlement import MockTransferBackend, SettlementLedger, SettlementService
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = SettlementLedger(str(tmp_path / "settlement.db"))
+    yield ledger
+    ledger.close()
+
+
+def test_record_reports_open_tokens(ledger):
+    assert ledger.record("v1", 5, give_ref="g1")[1] == 5
+    assert ledger.record("v1", 7, give_ref="g2")[1] == 12
+    assert ledger.record("v2", 1)[1] == 1
+
+
+def test_same_give_is_recorded_once(ledger):
+    entry_id, open_tokens, duplicate = ledger.record("v1", 5, give_ref="g1")
+    assert (open_tokens, duplicate) == (5, False)
+    # A retried API call or re-run router step for the same give
+    assert ledger.record("v1", 5, give_ref="g1") == (entry_id, 5, True)
+    assert ledger.summary()["open_gives"] == 1
+
+    # Still recognized once the entry has been claimed into a batch
+    ledger.claim("v1")
+    assert ledger.record("v1", 5, give_ref="g1") == (entry_id, 0, True)
+    assert ledger.claim("v1") is None
+
+    # Gives without a reference can't be told apart and are all kept
+    ledger.record("v2", 1)
+    ledger.record("v2", 1)
+    assert ledger.claim("v2")["gives"] == 2
+
+
+def test_claim_nets_open_entries_once(ledger):
+    for tokens in (5, 7, 8):
+        ledger.record("v1", tokens)
+    ledger.record("v2", 3)
+
+    batch = ledger.claim("v1")
+    assert (batch["vendor_id"], batch["tokens"], batch["gives"]) == ("v1", 20, 3)
+    assert ledger.claim("v1") is None
+
+    # Gives recorded after the claim go into the next batch
+    ledger.record("v1", 4)
+    assert ledger.claim("v1")["tokens"] == 4
+    assert ledger.summary() == {"open_gives": 1, "open_tokens": 3, "batches": {"pending": 2}}
+
+
+def test_concurrent_claims_never_share_an_entry(ledger):
+    for _ in range(200):
+        ledger.record("v1", 1)
+    batches = []
+
+    def claim():
+        batch = ledger.claim("v1")
+        if batch:
+            batches.append(batch)
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(batches) == 1
+    assert batches[0]["tokens"] == 200
+
+
+def test_due_vendors_by_window_or_amount(ledger):
+    ledger.record("small", 1)
+    ledger.record("big", 100)
+    assert ledger.due_vendors(window_seconds=60, max_tokens=50) == ["big"]
+    assert sorted(ledger.due_vendors(window_seconds=0, max_tokens=50)) == ["big", "small"]
+
+
+def test_unsettled_retries_failed_and_orphaned_batches(ledger):
+    ledger.record("v1", 5)
+    ledger.record("v2", 6)
+    failed, in_flight = ledger.claim("v1"), ledger.claim("v2")
+    ledger.mark(failed["batch_id"], "failed", error="boom")
+
+    assert [b["batch_id"] for b in ledger.unsettled(orphaned_after=60)] == [failed["batch_id"]]
+    assert {b["batch_id"] for b in ledger.unsettled(orphaned_after=0)} == {failed["batch_id"], in_flight["batch_id"]}
+
+
+def test_service_settles_netted_batches(ledger):
+    backend = MockTransferBackend()
+    service = SettlementService(ledger, backend, window_seconds=3600, max_tokens=10)
+    service.record("v1", 4)
+    service.record("v1", 4)
+    assert service.settle_due() == []
+
+    service.record("v1", 4)
+    [settled] = service.settle_due()
+    assert settled["status"] == "settled"
+    assert backend.transfers == [{"vendor_id": "v1", "tokens": 12, "reference": settled["batch_id"],
+                                  "tx_id": settled["tx_id"]}]
+    service.stop()
+
+
+def test_start_settles_what_a_previous_process_left_open(tmp_path):
+    path = str(tmp_path / "settlement.db")
+    previous = SettlementLedger(path)
+    previous.record("v1", 5)
+    previous.record("v2", 6)
+    previous.close()
+    time.sleep(0.05)
+
+    backend = MockTransferBackend()
+    service = SettlementService(SettlementLedger(path), backend, window_seconds=0.01, poll_interval=60)
+    service.start()
+    deadline = time.monotonic() + 5
+    while len(backend.transfers) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    service.stop()
+    assert sorted((t["vendor_id"], t["tokens"]) for t in backend.transfers) == [("v1", 5), ("v2", 6)]
+
+
+def test_router_records_the_give_ref(ledger):
+    service = SettlementService(ledger, MockTransferBackend(), window_seconds=3600)
+    result = RouterAgent(settlement=True, settlement_service=service).run(
+        {"tokens": 9, "vendor_id": "v1", "give_ref": "run-42"}
+    )
+    assert result["status"] == "pending_settlement"
+    row = ledger.conn.execute(
+        "SELECT give_ref, tokens FROM pending_transfers WHERE entry_id = ?", (result["settlement_entry"],)
+    ).fetchone()
+    assert row == ("run-42", 9)
+    service.stop()
+
+
+def test_rerun_router_queues_the_give_once(ledger):
+    backend = MockTransferBackend()
+    service = SettlementService(ledger, backend, window_seconds=3600)
+    router = RouterAgent(settlement=True, settlement_service=service)
+    first = router.run({"tokens": 9, "vendor_id": "v1", "give_ref": "run-42"})
+    again = router.run({"tokens": 9, "vendor_id": "v1", "give_ref": "run-42"})
+
+    assert again["settlement_entry"] == first["settlement_entry"]
+    service.flush()
+    assert [(t["vendor_id"], t["tokens"]) for t in backend.transfers] == [("v1", 9)]
+    service.stop()
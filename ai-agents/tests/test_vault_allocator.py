@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from agents.vault_allocator import VaultAllocator
+from agents.vault_decider import VaultDeciderAgent
+from utils.apy_registry import CachedAPYRegistry, StaticAPYProvider
+
+
+def make_allocator():
+    return VaultAllocator.from_records([
+        {"vendor_id": "low", "apy": 5.0},
+        {"vendor_id": "best", "apy": 15.0, "cap": 10},
+        {"vendor_id": "second", "apy": 12.0, "cap": 8, "min_stake": 3},
+        {"vendor_id": "third", "apy": 11.0, "cap": 100, "min_stake": 5},
+        {"vendor_id": "empty", "apy": 0.0},
+    ])
+
+
+def test_allocate_fills_best_vaults_in_apy_order():
+    plan = make_allocator().allocate(20, k=3)
+    assert plan["allocations"] == [
+        {"vendor_id": "best", "tokens": 10, "apy": 15.0},
+        {"vendor_id": "second", "tokens": 8, "apy": 12.0},
+    ]
+    # The 2 left over are below third's minimum stake
+    assert plan["unallocated"] == 2
+    assert plan["blended_apy"] == pytest.approx((10 * 15 + 8 * 12) / 18, abs=1e-4)
+
+
+def test_allocate_skips_vault_short_of_its_minimum():
+    plan = make_allocator().allocate(12, k=3)
+    # second would only get 2 (< 3): the remainder moves on, but third needs 5
+    assert [a["vendor_id"] for a in plan["allocations"]] == ["best"]
+    assert plan["unallocated"] == 2
+
+    plan = make_allocator().allocate(16, k=3)
+    assert [(a["vendor_id"], a["tokens"]) for a in plan["allocations"]] == [("best", 10), ("second", 6)]
+
+
+def test_allocate_respects_min_apy_and_top_k():
+    allocator = make_allocator()
+    assert [a["vendor_id"] for a in allocator.allocate(500, k=5, min_apy=12)["allocations"]] == ["best", "second"]
+    assert [a["vendor_id"] for a in allocator.allocate(500, k=1)["allocations"]] == ["best"]
+    assert allocator.allocate(500, min_apy=20) == {"allocations": [], "unallocated": 500, "blended_apy": 0.0}
+
+
+def test_allocate_commit_uses_up_capacity():
+    allocator = make_allocator()
+    allocator.allocate(10, k=1, commit=True)
+    assert allocator.caps[allocator.index["best"]] == 0
+    assert allocator.allocate(5, k=1)["allocations"][0]["vendor_id"] == "second"
+
+
+def test_top_k_matches_full_sort_on_many_vaults():
+    rng = np.random.default_rng(0)
+    apys = rng.uniform(0, 30, size=5000)
+    allocator = VaultAllocator([f"v{i}" for i in range(5000)], apys)
+    expected = np.argsort(-apys, kind="stable")[:7]
+    assert list(allocator.top_k(7)) == list(expected)
+
+
+def test_update_apys_from_registry():
+    allocator = make_allocator()
+    registry = CachedAPYRegistry(StaticAPYProvider({"low": {"apy": 30.0}}), miss_wait=1)
+    registry.subscribe(allocator.update_apys)
+    registry.prefetch(list(allocator.vendor_ids), wait=True, timeout=5)
+
+    # "low" is now the best vault; vaults the registry does not know are dropped
+    assert allocator.allocate(20)["allocations"] == [{"vendor_id": "low", "tokens": 20, "apy": 30.0}]
+
+
+def test_subscribe_replays_cached_apys():
+    registry = CachedAPYRegistry(StaticAPYProvider({"best": {"apy": 1.0}}), miss_wait=1)
+    registry.get("best")
+    allocator = make_allocator()
+    registry.subscribe(allocator.update_apys)
+    assert allocator.apys[allocator.index["best"]] == 1.0
+
+
+def test_allocate_mode_allocates_for_unknown_vendor():
+    allocator = make_allocator()
+    registry = CachedAPYRegistry(StaticAPYProvider({"best": {"apy": 15.0}}), miss_wait=1)
+    agent = VaultDeciderAgent(apy_registry=registry, mode="allocate", allocator=allocator)
+    result = agent.run({"tokens": 10, "vendor_id": "vendor_unknown"})
+    assert result["action"] == "allocated"
+    assert result["allocations"][0]["vendor_id"] == "best"
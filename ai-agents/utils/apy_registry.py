@@ -0,0 +1,332 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from utils.logger import setup_logger
+
+logger = setup_logger("APYRegistry", "vault_decider", "apy.log")
+
+# "static" (built-in demo vaults), "file" (JSON) or "sqlite"
+APY_PROVIDER = os.getenv("W2G_APY_PROVIDER", "static")
+APY_SOURCE = os.getenv("W2G_APY_SOURCE")
+# Entries younger than TTL are served as-is; older ones up to MAX_STALE are served while refreshing
+APY_TTL = float(os.getenv("W2G_APY_TTL", "300"))
+APY_MAX_STALE = float(os.getenv("W2G_APY_MAX_STALE", "3600"))
+# How long a cache miss may wait for its background fetch before the vault decision is left pending
+APY_MISS_WAIT = float(os.getenv("W2G_APY_MISS_WAIT", "0.2"))
+APY_REFRESH_WORKERS = int(os.getenv("W2G_APY_REFRESH_WORKERS", "4"))
+APY_BATCH_SIZE = int(os.getenv("W2G_APY_BATCH_SIZE", "500"))
+# After a failed fetch, refresh_expired() retries its vendors this much later
+APY_RETRY_SECONDS = float(os.getenv("W2G_APY_RETRY_SECONDS", "30"))
+
+# Simulated vault data (could come from on-chain query in real deployment)
+VENDOR_VAULTS = {
+    "vendor_123": {"apy": 9.0},
+    "vendor_456": {"apy": 12.5},
+    "vendor_789": {"apy": 6.7},
+}
+
+
+class APYNotLoadedError(RuntimeError):
+    """
+    The vendor's APY is not cached and its fetch did not complete in time or
+    failed. Unlike a vendor without a vault (a None APY), this says nothing
+    about the vendor: the decision should be retried, not skipped.
+    """
+
+    def __init__(self, vendor_id: str, reason: str):
+        super().__init__(f"APY of {vendor_id} not loaded: {reason}")
+        self.vendor_id = vendor_id
+
+
+class APYProvider:
+    """
+    Source of vendor vault APYs. `fetch_many` returns the APY of every vendor
+    it knows; vendors without a vault are simply absent from the result.
+    """
+    name = "base"
+
+    def fetch_many(self, vendor_ids: list[str]) -> dict[str, float]:
+        raise NotImplementedError
+
+
+class StaticAPYProvider(APYProvider):
+    name = "static"
+
+    def __init__(self, vaults: dict = None):
+        self.vaults = VENDOR_VAULTS if vaults is None else vaults
+
+    def fetch_many(self, vendor_ids: list[str]) -> dict[str, float]:
+        return {v: self.vaults[v]["apy"] for v in vendor_ids if v in self.vaults}
+
+
+class FileAPYProvider(APYProvider):
+    """
+    JSON file of {vendor_id: apy} or {vendor_id: {"apy": apy}}, re-read when it changes.
+    """
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.apys = {}
+        self.lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self.mtime:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            self.apys = {k: float(v["apy"] if isinstance(v, dict) else v) for k, v in raw.items()}
+            self.mtime = mtime
+
+    def fetch_many(self, vendor_ids: list[str]) -> dict[str, float]:
+        with self.lock:
+            self._load()
+            return {v: self.apys[v] for v in vendor_ids if v in self.apys}
+
+
+class SqliteAPYProvider(APYProvider):
+    """
+    Local stand-in for the on-chain lookup: a `vendor_apy (vendor_id, apy, updated_at)` table.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        with sqlite3.connect(path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vendor_apy (
+                    vendor_id TEXT PRIMARY KEY,
+                    apy REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def fetch_many(self, vendor_ids: list[str]) -> dict[str, float]:
+        # One connection per call: fetches run on the refresh pool's threads
+        conn = sqlite3.connect(self.path)
+        try:
+            found = {}
+            for i in range(0, len(vendor_ids), APY_BATCH_SIZE):
+                chunk = vendor_ids[i:i + APY_BATCH_SIZE]
+                rows = conn.execute(
+                    f"SELECT vendor_id, apy FROM vendor_apy WHERE vendor_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+            return found
+        finally:
+            conn.close()
+
+    def upsert(self, apys: dict[str, float]):
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO vendor_apy (vendor_id, apy, updated_at) VALUES (?, ?, ?)",
+                [(v, float(a), time.time()) for v, a in apys.items()]
+            )
+
+
+class CachedAPYRegistry:
+    """
+    In-memory TTL cache in front of an APYProvider. Lookups never block on the
+    provider: stale entries are served while a background refresh runs, and a
+    miss waits at most `miss_wait` seconds for its fetch before raising
+    APYNotLoadedError. Vendors without a vault are cached too (as None), so
+    unknown vendors don't hit the provider every give.
+    """
+
+    def __init__(self, provider: APYProvider, ttl: float = APY_TTL, max_stale: float = APY_MAX_STALE,
+                 miss_wait: float = APY_MISS_WAIT, workers: int = APY_REFRESH_WORKERS):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.miss_wait = miss_wait
+        self.workers = workers
+        self.entries = {}  # vendor_id -> (apy or None, fetched_at)
+        self.inflight = {}  # vendor_id -> Future of its pending fetch
+        self.lock = threading.Lock()
+        self.executor = None
+        self.listeners = []
+        # Earliest time a cached entry expires or a failed fetch is due again; refresh_expired()
+        # does nothing before it. It may be early (an extra scan), never late
+        self.next_refresh = float("inf")
+        self.failed = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "miss_timeouts": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def get(self, vendor_id: str) -> float | None:
+        """
+        The vendor's APY, or None if the vendor has no vault. Raises
+        APYNotLoadedError when that is not known yet.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(vendor_id)
+            if entry is not None:
+                age = now - entry[1]
+                if age < self.ttl:
+                    self.stats["hits"] += 1
+                    return entry[0]
+                if age < self.max_stale:
+                    self.stats["stale_hits"] += 1
+                    self._schedule([vendor_id])
+                    return entry[0]
+            self.stats["misses"] += 1
+            future = self._schedule([vendor_id])[vendor_id]
+
+        try:
+            return future.result(timeout=self.miss_wait).get(vendor_id)
+        except FutureTimeoutError:
+            with self.lock:
+                self.stats["miss_timeouts"] += 1
+            raise APYNotLoadedError(vendor_id, f"fetch still running after {self.miss_wait}s")
+        except Exception as e:
+            # The refresh already logged the failure
+            raise APYNotLoadedError(vendor_id, f"fetch failed: {e}") from e
+
+    def prefetch(self, vendor_ids, wait: bool = True, timeout: float = None) -> int:
+        """
+        Warms the cache for a batch run in provider-sized chunks. Returns the
+        number of vendors that needed fetching.
+        """
+        now = time.monotonic()
+        with self.lock:
+            missing = [v for v in dict.fromkeys(vendor_ids)
+                       if v not in self.entries or now - self.entries[v][1] >= self.ttl]
+            futures = {id(f): f for f in self._schedule(missing).values()}
+        if wait:
+            for future in futures.values():
+                try:
+                    future.result(timeout=timeout)
+                except Exception:
+                    pass
+        return len(missing)
+
+    def refresh_expired(self) -> int:
+        """
+        Starts background refreshes of every entry past its TTL and every
+        vendor whose last fetch failed. Until the earliest of those is due
+        this is a single comparison, so it can run on every decision.
+        Returns the number of vendors scheduled.
+        """
+        now = time.monotonic()
+        if now < self.next_refresh:
+            return 0
+        with self.lock:
+            if now < self.next_refresh:
+                return 0
+            due = [v for v, (_, fetched_at) in self.entries.items() if now - fetched_at >= self.ttl]
+            due.extend(v for v in self.failed if v not in self.entries)
+            self.failed.clear()
+            self._schedule(due)
+            # Scheduled entries move the watermark again once their refresh lands
+            self.next_refresh = min(
+                (fetched_at + self.ttl for _, fetched_at in self.entries.values() if now - fetched_at < self.ttl),
+                default=float("inf")
+            )
+        return len(due)
+
+    def subscribe(self, listener):
+        """
+        Calls `listener({vendor_id: apy or None})` after every refresh, on the
+        refresh thread. It is first called with everything already cached.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+            cached = {v: apy for v, (apy, _) in self.entries.items()}
+        if cached:
+            listener(cached)
+
+    def invalidate(self, vendor_id: str = None):
+        with self.lock:
+            if vendor_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(vendor_id, None)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else None,
+                "size": len(self.entries),
+                "inflight": len(self.inflight),
+                "provider": self.provider.name,
+            }
+
+    def _schedule(self, vendor_ids: list[str]) -> dict[str, Future]:
+        """
+        Starts background fetches for the vendors not already being fetched.
+        Called with the lock held.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="w2g-apy")
+        futures = {v: self.inflight[v] for v in vendor_ids if v in self.inflight}
+        pending = [v for v in vendor_ids if v not in self.inflight]
+        for i in range(0, len(pending), APY_BATCH_SIZE):
+            chunk = pending[i:i + APY_BATCH_SIZE]
+            future = self.executor.submit(self._refresh, chunk)
+            for v in chunk:
+                self.inflight[v] = futures[v] = future
+        return futures
+
+    def _refresh(self, vendor_ids: list[str]) -> dict[str, float]:
+        try:
+            apys = self.provider.fetch_many(vendor_ids)
+        except Exception as e:
+            # Keep serving whatever is cached; the next lookup retries
+            logger.warning(f"[APYRegistry] - Refresh of {len(vendor_ids)} vendors failed: {e}")
+            with self.lock:
+                self.stats["refresh_errors"] += 1
+                for v in vendor_ids:
+                    self.inflight.pop(v, None)
+                self.failed.update(vendor_ids)
+                self.next_refresh = min(self.next_refresh, time.monotonic() + APY_RETRY_SECONDS)
+            raise
+        fetched_at = time.monotonic()
+        with self.lock:
+            self.stats["refreshes"] += 1
+            for v in vendor_ids:
+                self.entries[v] = (apys.get(v), fetched_at)
+                self.inflight.pop(v, None)
+            self.failed.difference_update(vendor_ids)
+            self.next_refresh = min(self.next_refresh, fetched_at + self.ttl)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener({v: apys.get(v) for v in vendor_ids})
+            except Exception as e:
+                logger.warning(f"[APYRegistry] - APY listener failed: {e}")
+        return apys
+
+
+PROVIDERS = {
+    "static": lambda source: StaticAPYProvider(),
+    "file": FileAPYProvider,
+    "sqlite": SqliteAPYProvider,
+}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_apy_registry() -> CachedAPYRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if APY_PROVIDER not in PROVIDERS:
+                    raise ValueError(f"Unknown APY provider '{APY_PROVIDER}', expected one of {list(PROVIDERS)}")
+                if APY_PROVIDER != "static" and not APY_SOURCE:
+                    raise ValueError(f"W2G_APY_SOURCE is required for the '{APY_PROVIDER}' APY provider")
+                _registry = CachedAPYRegistry(PROVIDERS[APY_PROVIDER](APY_SOURCE))
+    return _registry
+
+
+def set_apy_registry(registry: CachedAPYRegistry):
+    global _registry
+    _registry = registry
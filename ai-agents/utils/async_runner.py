@@ -0,0 +1,87 @@
+import asyncio
+import atexit
+import os
+import sys
+import threading
+
+from utils import llm_client
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_exit_pid = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="w2g-async-runner", daemon=True)
+            _thread.start()
+            _close_at_worker_exit()
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Runs `coro` on this process's shared background event loop and blocks
+    until it finishes. Every blocking caller (master-flow worker threads,
+    scripts) goes through the same loop, so they share one LLM connection
+    pool and the scheduler's concurrency limits instead of building and
+    tearing down both per call as asyncio.run would.
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() would deadlock on the shared loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def shutdown(timeout: float = 10):
+    """
+    Closes the shared loop's LLM clients and stops the loop. Runs at exit;
+    a later run_sync() starts a new loop.
+    """
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(llm_client.aclose(), loop).result(timeout)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+
+def _close_at_worker_exit():
+    """
+    multiprocessing children (e.g. ProcessPoolExecutor workers) leave with
+    os._exit and never run atexit, but do run multiprocessing's finalizers.
+    """
+    global _exit_pid
+    multiprocessing = sys.modules.get("multiprocessing")
+    if multiprocessing is None or multiprocessing.parent_process() is None or _exit_pid == os.getpid():
+        return
+    from multiprocessing import util
+    # Before the log listeners stop (exitpriority=100), so closing can still log
+    util.Finalize(None, shutdown, exitpriority=200)
+    _exit_pid = os.getpid()
+
+
+def _reset_after_fork():
+    global _lock, _loop, _thread
+    # The parent's loop thread does not exist in the child; it starts its own on first use
+    _lock = threading.Lock()
+    _loop = _thread = None
+
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_reset_after_fork)
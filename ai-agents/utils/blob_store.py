@@ -0,0 +1,44 @@
+import hashlib
+import os
+import tempfile
+
+BLOB_DIR = os.getenv(
+    "W2G_BLOB_DIR",
+    os.path.join(os.path.dirname(__file__), "../../data/blobs")
+)
+
+
+class BlobStore:
+    """
+    Content-addressed file store: each blob is written once under its sha256.
+    """
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if os.path.exists(target):
+            return digest
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write to a temp file in the same directory, then rename atomically
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils.logger import setup_logger
+
+logger = setup_logger("Checkpoints", "main", "checkpoints.log")
+
+CHECKPOINT_DB_PATH = os.getenv(
+    "W2G_CHECKPOINT_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/checkpoints.db")
+)
+# Failed runs nobody resumed are dropped after this long
+CHECKPOINT_MAX_AGE = float(os.getenv("W2G_CHECKPOINT_MAX_AGE_HOURS", "72")) * 3600
+
+
+class CheckpointStore:
+    """
+    Local SQLite LangGraph checkpointer plus a small index of runs, so a run
+    that failed part-way can be resumed by its run id (the graph thread id)
+    and finished or abandoned runs can be garbage-collected.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH):
+        # Imported here: only runs that checkpoint pay for the saver
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.saver = SqliteSaver(self.conn)
+        self.saver.setup()
+        # The saver serializes its own use of the connection with this lock; share it
+        self.lock = self.saver.lock
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_runs (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_checkpoint_runs_updated ON checkpoint_runs (updated_at)")
+
+    def mark(self, run_id: str, status: str, error: str = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_runs (run_id, status, error, updated_at) VALUES (?, ?, ?, ?)",
+                (run_id, status, error, time.time())
+            )
+
+    def complete(self, run_id: str):
+        """
+        A finished run needs no checkpoints: drop them right away.
+        """
+        self.saver.delete_thread(run_id)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoint_runs WHERE run_id = ?", (run_id,))
+
+    def failed_runs(self) -> list[dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT run_id, status, error, updated_at FROM checkpoint_runs ORDER BY updated_at"
+            ).fetchall()
+        return [{"run_id": r, "status": s, "error": e, "updated_at": u} for r, s, e, u in rows]
+
+    def gc(self, max_age: float = CHECKPOINT_MAX_AGE) -> int:
+        """
+        Deletes the checkpoints of runs not touched for `max_age` seconds. Returns how many were removed.
+        """
+        with self.lock:
+            stale = [r[0] for r in self.conn.execute(
+                "SELECT run_id FROM checkpoint_runs WHERE updated_at < ?", (time.time() - max_age,)
+            ).fetchall()]
+        for run_id in stale:
+            self.complete(run_id)
+        if stale:
+            logger.info(f"[Checkpoints] - Garbage-collected {len(stale)} abandoned runs")
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore()
+    return _store
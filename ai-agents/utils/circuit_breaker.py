@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Outcomes of the last WINDOW calls decide whether the circuit trips
+BREAKER_WINDOW = int(os.getenv("W2G_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("W2G_BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("W2G_BREAKER_FAILURE_RATE", "0.5"))
+# Calls slower than SLOW_CALL_SECONDS count as slow; too many slow calls trip the circuit too
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("W2G_BREAKER_SLOW_CALL_SECONDS", "15"))
+BREAKER_SLOW_RATE = float(os.getenv("W2G_BREAKER_SLOW_RATE", "0.8"))
+# How long the circuit stays open before a probe; doubles after each failed probe up to the max
+BREAKER_OPEN_SECONDS = float(os.getenv("W2G_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("W2G_BREAKER_MAX_OPEN_SECONDS", "300"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a dependency whose circuit is open.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is failing or too slow. The circuit opens
+    when, over the last `window` calls (at least `min_calls`), the failure rate
+    or the slow-call rate crosses its threshold. After `open_seconds` a single
+    probe call is let through (half-open): success closes the circuit, failure
+    re-opens it with a doubled wait.
+    """
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 slow_rate: float = BREAKER_SLOW_RATE, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 max_open_seconds: float = BREAKER_MAX_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.outcomes = deque(maxlen=window)  # (failed, slow)
+        self.state = CLOSED
+        self.open_seconds = open_seconds
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+        self.stats = {"rejected": 0, "trips": 0, "probes": 0}
+
+    def before_call(self, probe: bool = True) -> bool:
+        """
+        Raises CircuitOpenError unless a call may go ahead now. Returns True
+        when the caller was given the half-open probe. With `probe=False` it
+        only checks, e.g. before queueing, without claiming the probe.
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return False
+            wait = self.opened_at + self.open_seconds - time.monotonic()
+            if self.state == OPEN and wait <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probing:
+                if probe:
+                    # Exactly one probe at a time; everyone else keeps failing fast
+                    self.probing = True
+                    self.stats["probes"] += 1
+                    return True
+                return False
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, max(wait, 1.0))
+
+    def record(self, duration: float, failed: bool):
+        slow = duration >= self.slow_call_seconds
+        with self.lock:
+            if self.state == HALF_OPEN and self.probing:
+                self.probing = False
+                if failed or slow:
+                    self._open(backoff=True)
+                else:
+                    self.state = CLOSED
+                    self.open_seconds = self.base_open_seconds
+                    self.outcomes.clear()
+                return
+            if self.state != CLOSED:
+                return
+
+            self.outcomes.append((failed, slow))
+            calls = len(self.outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(f for f, _ in self.outcomes)
+            slows = sum(s for _, s in self.outcomes)
+            if failures / calls >= self.failure_rate or slows / calls >= self.slow_rate:
+                self._open(backoff=False)
+
+    def release_probe(self):
+        """
+        The probe ended without telling us anything (e.g. cancelled); let another one through.
+        """
+        with self.lock:
+            self.probing = False
+
+    def _open(self, backoff: bool):
+        if backoff:
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self.stats["trips"] += 1
+
+    def metrics(self) -> dict:
+        with self.lock:
+            calls = len(self.outcomes)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failure_rate": round(sum(f for f, _ in self.outcomes) / calls, 3) if calls else 0.0,
+                "open_seconds": self.open_seconds,
+                **self.stats
+            }
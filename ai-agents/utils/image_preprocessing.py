@@ -0,0 +1,109 @@
+import binascii
+import io
+import os
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+# Defaults can be tuned per deployment without touching code
+MAX_EDGE = int(os.getenv("W2G_IMAGE_MAX_EDGE", "1280"))
+JPEG_QUALITY = int(os.getenv("W2G_IMAGE_QUALITY", "82"))
+
+# Magic numbers of the formats the vision model accepts
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+@dataclass
+class PreparedImage:
+    data_uri: str
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    encoded_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.encoded_bytes
+
+
+def detect_format(data: bytes) -> str | None:
+    """
+    Detects the image format from its leading bytes instead of trusting the file extension.
+    """
+    for signature, fmt in _SIGNATURES:
+        if data.startswith(signature):
+            return fmt
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def build_data_uri(mime_type: str, payload) -> str:
+    """
+    Base64-encodes a bytes-like payload (bytes or memoryview) straight into a data URI.
+    """
+    return f"data:{mime_type};base64," + binascii.b2a_base64(payload, newline=False).decode("ascii")
+
+
+def preprocess_image(data: bytes, max_edge: int = MAX_EDGE, quality: int = JPEG_QUALITY) -> PreparedImage:
+    """
+    Normalises an uploaded photo before it is sent to the vision model:
+    applies the EXIF orientation, drops all metadata, downscales so the longest
+    edge is at most `max_edge` and re-encodes (JPEG, or PNG when the image has
+    transparency). The original bytes are kept if re-encoding would not help.
+    """
+    fmt = detect_format(data)
+    if fmt is None:
+        raise ValueError("Unsupported or corrupt image data")
+
+    with Image.open(io.BytesIO(data)) as source:
+        has_exif = bool(source.info.get("exif"))
+        resized = max(source.size) > max_edge
+        if resized and fmt == "jpeg":
+            # Let libjpeg decode at a reduced scale instead of decoding full size and shrinking
+            source.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(source)
+        if resized:
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        out = io.BytesIO()
+        if has_alpha:
+            img.save(out, format="PNG", optimize=True)
+            out_fmt = "png"
+        else:
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+            out_fmt = "jpeg"
+        width, height = img.size
+
+    payload = out.getbuffer()
+    if not resized and not has_exif and out_fmt == fmt and len(payload) >= len(data):
+        # Already small and clean - re-encoding would only cost quality
+        payload.release()
+        payload, out_fmt = memoryview(data), fmt
+
+    prepared = PreparedImage(
+        data_uri=build_data_uri(MIME_TYPES[out_fmt], payload),
+        mime_type=MIME_TYPES[out_fmt],
+        width=width,
+        height=height,
+        original_bytes=len(data),
+        encoded_bytes=len(payload),
+    )
+    payload.release()
+    return prepared
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import weakref
+
+# Process-wide limits, overridable through the environment
+MAX_CONCURRENCY = int(os.getenv("W2G_LLM_MAX_CONCURRENCY", "32"))
+MAX_CONNECTIONS = int(os.getenv("W2G_LLM_MAX_CONNECTIONS", "64"))
+KEEPALIVE_EXPIRY = float(os.getenv("W2G_LLM_KEEPALIVE_SECONDS", "60"))
+REQUEST_TIMEOUT = float(os.getenv("W2G_LLM_TIMEOUT_SECONDS", "60"))
+
+
+class _LoopResources:
+    """
+    Clients and limits shared by every LLM call made on one event loop.
+    httpx connection pools and asyncio primitives are bound to the loop that
+    first uses them, so each loop (the API server's, or the shared background
+    loop of utils.async_runner for blocking callers) gets its own set.
+    """
+
+    def __init__(self):
+        # httpx, groq and langchain_groq are imported on first use to keep cold start cheap
+        import httpx
+
+        _load_env()
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=REQUEST_TIMEOUT,
+        )
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        self.cache = {}
+
+
+_env_loaded = False
+
+
+def _load_env():
+    """
+    Reads .env once, right before the first client needs GROQ_API_KEY.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+_resources: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopResources]" = weakref.WeakKeyDictionary()
+
+
+def _get_resources() -> _LoopResources:
+    loop = asyncio.get_running_loop()
+    resources = _resources.get(loop)
+    if resources is None:
+        resources = _resources[loop] = _LoopResources()
+    return resources
+
+
+def get_async_groq() -> "AsyncGroq":
+    from groq import AsyncGroq
+
+    # Retries are owned by utils.llm_scheduler, not the SDK
+    return loop_cached(
+        "groq",
+        lambda: AsyncGroq(http_client=_get_resources().http_client, max_retries=0),
+    )
+
+
+def get_chat_model(model_name: str) -> "ChatGroq":
+    from langchain_groq import ChatGroq
+
+    return loop_cached(
+        ("chat_model", model_name),
+        lambda: ChatGroq(model_name=model_name, http_async_client=_get_resources().http_client, max_retries=0),
+    )
+
+
+def loop_cached(key, factory):
+    """
+    Returns an object built on top of the shared clients, creating it once per event loop.
+    """
+    cache = _get_resources().cache
+    if key not in cache:
+        cache[key] = factory()
+    return cache[key]
+
+
+def llm_slot() -> asyncio.Semaphore:
+    """
+    Concurrency limiter for outgoing LLM requests: `async with llm_slot(): ...`
+    """
+    return _get_resources().semaphore
+
+
+async def aclose():
+    resources = _resources.pop(asyncio.get_running_loop(), None)
+    if resources is not None:
+        await resources.http_client.aclose()
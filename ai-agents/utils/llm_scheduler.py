@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.llm_client import llm_slot, loop_cached
+
+# Sized to the Groq account quota, overridable through the environment
+REQUESTS_PER_MINUTE = float(os.getenv("W2G_LLM_RPM", "30"))
+TOKENS_PER_MINUTE = float(os.getenv("W2G_LLM_TPM", "30000"))
+MAX_RETRIES = int(os.getenv("W2G_LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("W2G_LLM_BACKOFF_BASE", "1.0"))
+BACKOFF_CAP = float(os.getenv("W2G_LLM_BACKOFF_CAP", "30"))
+# Upper bound on a single attempt, so a hanging provider can't hold a request for the client's full timeout
+CALL_TIMEOUT = float(os.getenv("W2G_LLM_CALL_TIMEOUT", "20"))
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Raised when the provider is unavailable: a call still fails with a
+    transport error, timeout, 429 or 5xx after retries, or is refused because
+    the provider's circuit is open. Callers must not treat this as a negative
+    validation result. Requests the provider rejects (other 4xx) are not an
+    outage and propagate as their original error.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Process-wide token bucket. Callers reserve capacity up front (the level may
+    go negative) and sleep off the debt, which keeps waiters roughly FIFO.
+    """
+
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def available(self) -> float:
+        with self.lock:
+            return min(self.capacity, self.level + (time.monotonic() - self.updated) * self.rate)
+
+    async def acquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _status_code(error: Exception) -> int | None:
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether `error` is provider trouble (transport error, timeout, 429 or 5xx)
+    rather than a request the provider rejected.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # Only look up the SDK's error types if the SDK is loaded; otherwise it cannot have raised them
+    groq = sys.modules.get("groq")
+    if groq is not None and isinstance(error, groq.APIConnectionError):
+        return True
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    status = _status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class LLMScheduler:
+    """
+    Central gate for outgoing LLM requests: request/token rate limiting,
+    jittered exponential backoff on 429/5xx/connection errors, and coalescing
+    of identical in-flight requests that share a `key`. A circuit breaker
+    fails calls fast while the provider is down or too slow.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        max_retries: int = MAX_RETRIES,
+        call_timeout: float = CALL_TIMEOUT,
+        breaker: CircuitBreaker = None
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.call_timeout = call_timeout
+        self.breaker = breaker or CircuitBreaker("llm")
+        self.stats = {
+            "waiting": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "coalesced": 0
+        }
+
+    async def call(self, factory, *, tokens: int = 1000, key=None):
+        """
+        Runs `await factory()` under the rate limits. Requests with the same
+        `key` issued while one is already in flight share its result; the
+        shared call is cancelled only once every request waiting on it is.
+        """
+        if key is None:
+            return await self._call_with_retry(factory, tokens)
+
+        inflight = loop_cached("llm_inflight", dict)
+        entry = inflight.get(key)
+        if entry is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._call_with_retry(factory, tokens))
+            entry = inflight[key] = {"task": task, "waiters": 0}
+            task.add_done_callback(lambda _: inflight.get(key) is entry and inflight.pop(key))
+
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        except asyncio.CancelledError:
+            if entry["waiters"] == 1 and not entry["task"].done():
+                # Nobody else wants the result: stop the call and let a new request start afresh
+                entry["task"].cancel()
+                if inflight.get(key) is entry:
+                    del inflight[key]
+            raise
+        finally:
+            entry["waiters"] -= 1
+
+    async def _call_with_retry(self, factory, tokens: int):
+        attempt = 0
+        while True:
+            # Fail fast instead of queueing behind the rate limits for a dead provider
+            self._check_circuit(probe=False)
+            self.stats["waiting"] += 1
+            try:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(tokens)
+            finally:
+                self.stats["waiting"] -= 1
+
+            async with llm_slot():
+                # The circuit may have opened while this call was queued
+                is_probe = self._check_circuit(probe=True)
+                self.stats["in_flight"] += 1
+                started = time.monotonic()
+                outcome = None
+                try:
+                    result = await asyncio.wait_for(factory(), timeout=self.call_timeout)
+                    outcome = False
+                    self.stats["completed"] += 1
+                    return result
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    # Only provider trouble counts against the circuit, not e.g. a bad request
+                    outcome = retryable
+                    if not retryable:
+                        # The request is at fault: not an outage, so no retry and no fallback
+                        self.stats["failed"] += 1
+                        raise
+                    if attempt >= self.max_retries:
+                        self.stats["failed"] += 1
+                        raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempt(s): {e}") from e
+                    error = e
+                finally:
+                    self.stats["in_flight"] -= 1
+                    if outcome is None:
+                        if is_probe:
+                            self.breaker.release_probe()
+                    else:
+                        self.breaker.record(time.monotonic() - started, failed=outcome)
+
+            # Full jitter, but never sooner than the server asked for
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            delay = max(delay, _retry_after(error) or 0.0)
+            attempt += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def _check_circuit(self, probe: bool) -> bool:
+        try:
+            return self.breaker.before_call(probe)
+        except CircuitOpenError as e:
+            self.stats["failed"] += 1
+            raise LLMUnavailableError(str(e), retry_after=e.retry_after) from e
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "circuit": self.breaker.metrics(),
+            "queue_depth": self.stats["waiting"],
+            "request_capacity": round(self.requests.available(), 2),
+            "token_capacity": round(self.tokens.available(), 2)
+        }
+
+
+scheduler = LLMScheduler()
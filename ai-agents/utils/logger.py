@@ -1,21 +1,187 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import sys
+import threading
+import weakref
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
-def setup_logger(name: str, log_dir: str, log_file: str, level=logging.INFO):
-    # Ensure the log directory exists
+from utils.tracing import current_run_id
+
+# "text" keeps the classic "<time> [LEVEL] message" lines, "json" writes one JSON object per line
+LOG_FORMAT = os.getenv("W2G_LOG_FORMAT", "text")
+# Hand records to a background thread instead of writing files on the calling thread
+LOG_ASYNC = os.getenv("W2G_LOG_ASYNC", "1") == "1"
+# Per-logger levels, e.g. "PhotoValidatorAgent=DEBUG,RouterAgent=WARNING"
+LOG_LEVELS = {
+    name.strip(): level.strip().upper()
+    for name, _, level in (item.partition("=") for item in os.getenv("W2G_LOG_LEVELS", "").split(","))
+    if name.strip() and level.strip()
+}
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+_listeners = []
+_listeners_lock = threading.Lock()
+_queue_handlers = weakref.WeakSet()
+_exit_flush_pid = None
+_banners = set()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with structured fields, so log consumers need no regex.
+    Anything passed via `extra={...}` that is not a standard record attribute is kept.
+    """
+    _reserved = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "run_id"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "agent": record.name,
+            "run_id": getattr(record, "run_id", None),
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._reserved and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RunIdFilter(logging.Filter):
+    """
+    Stamps the active trace run id on the record while still on the calling thread.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "run_id"):
+            record.run_id = current_run_id()
+        return True
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    Opens the file, and creates its directory, on the first record instead of at import.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Starts its listener thread on the first record, so importing a module that
+    sets up a logger spawns no threads.
+    """
+
+    def __init__(self, log_queue, *handlers):
+        super().__init__(log_queue)
+        self.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.started = False
+        _queue_handlers.add(self)
+
+    def enqueue(self, record):
+        if not self.started:
+            with _listeners_lock:
+                if not self.started:
+                    self.listener.start()
+                    _listeners.append(self.listener)
+                    _flush_at_worker_exit()
+                    self.started = True
+        super().enqueue(record)
+
+    def reset_after_fork(self):
+        """
+        A forked child inherits `started` but not the listener thread, plus a copy
+        of whatever the parent still had queued: start over with a fresh queue.
+        """
+        self.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.queue, *self.listener.handlers, respect_handler_level=True)
+        self.started = False
+
+
+def log_run_banner(logger: logging.Logger):
+    """
+    Writes the "NEW RUN STARTED" banner once per process and logger, when the
+    agent is first used rather than when its module is imported.
+    """
+    if logger.name in _banners:
+        return
+    _banners.add(logger.name)
+    logger.info("")
+    logger.info("=" * 60)
+    logger.info(f"NEW RUN STARTED - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("=" * 60)
+    logger.info("")
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+def _flush_at_worker_exit():
+    """
+    multiprocessing children (e.g. ProcessPoolExecutor workers) leave with
+    os._exit and never run atexit, but do run multiprocessing's finalizers.
+    """
+    global _exit_flush_pid
+    multiprocessing = sys.modules.get("multiprocessing")
+    if multiprocessing is None or multiprocessing.parent_process() is None or _exit_flush_pid == os.getpid():
+        return
+    from multiprocessing import util
+    util.Finalize(None, _stop_listeners, exitpriority=100)
+    _exit_flush_pid = os.getpid()
+
+
+def _reset_after_fork():
+    global _listeners_lock
+    # The lock may have been held by another thread at fork time, and the parent's listener threads are gone
+    _listeners_lock = threading.Lock()
+    _listeners.clear()
+    for handler in list(_queue_handlers):
+        handler.reset_after_fork()
+
+
+atexit.register(_stop_listeners)
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def setup_logger(name: str, log_dir: str, log_file: str, level=logging.INFO, fmt: str = None, use_queue: bool = None):
+    # The directory is created when the first record is written
     log_path = Path("logs") / log_dir
-    log_path.mkdir(parents=True, exist_ok=True)
 
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(LOG_LEVELS.get(name, level))
 
     # Avoid duplicate handlers if logger is reused
     if not logger.handlers:
         log_file_path = log_path / log_file
-        file_handler = RotatingFileHandler(log_file_path, maxBytes=5_000_000, backupCount=3)
-        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+        file_handler = LazyRotatingFileHandler(log_file_path, maxBytes=5_000_000, backupCount=3)
+        if (fmt or LOG_FORMAT) == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(TEXT_FORMAT)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+
+        if LOG_ASYNC if use_queue is None else use_queue:
+            # The caller only enqueues; formatting and disk I/O happen on the listener thread
+            handler = LazyQueueHandler(queue.SimpleQueue(), file_handler)
+        else:
+            handler = file_handler
+        handler.addFilter(RunIdFilter())
+        logger.addHandler(handler)
 
     return logger
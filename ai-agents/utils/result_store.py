@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RESULT_DB_PATH = os.getenv(
+    "W2G_RESULT_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/results.db")
+)
+# Pre-store history file, imported once into the store
+LEGACY_RESULT_JSON = os.path.join(os.path.dirname(__file__), "../../data/result.json")
+
+
+class ResultStore:
+    """
+    Append-only SQLite log of master-flow results. Each append is a single
+    INSERT, so concurrent runs don't clobber each other and a crash loses at
+    most the run in progress. Readers page through rows by increasing `id`.
+    """
+
+    def __init__(self, path: str = RESULT_DB_PATH, legacy_json: str = LEGACY_RESULT_JSON):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    run_id TEXT,
+                    vendor_id TEXT,
+                    viewer_id TEXT,
+                    payload TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_vendor ON results (vendor_id, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_viewer ON results (viewer_id, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL NOT NULL)")
+        if legacy_json and os.path.exists(legacy_json):
+            self.migrate_from_json(legacy_json)
+
+    def append(self, result: dict, run_id: str = None) -> int:
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO results (created_at, run_id, vendor_id, viewer_id, payload) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), run_id, result.get("vendor_id"), result.get("viewer_id"), json.dumps(result, default=str))
+            )
+        return cursor.lastrowid
+
+    def query(
+        self, after_id: int = 0, vendor_id: str = None, viewer_id: str = None,
+        since: float = None, limit: int = 1000
+    ) -> list[dict]:
+        """
+        Results with id > `after_id`, oldest first. Pass the last returned id
+        back as `after_id` to read only what was appended since.
+        """
+        clauses, params = ["id > ?"], [after_id]
+        if vendor_id is not None:
+            clauses.append("vendor_id = ?")
+            params.append(vendor_id)
+        if viewer_id is not None:
+            clauses.append("viewer_id = ?")
+            params.append(viewer_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM results WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", params
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Imports the old result.json history once; rows get the file's mtime as
+        their timestamp. Returns the number of results imported.
+        """
+        name = f"json:{os.path.basename(json_path)}"
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return 0
+        try:
+            with open(json_path, "r") as f:
+                existing = json.load(f)
+        except json.decoder.JSONDecodeError:
+            existing = []
+        if isinstance(existing, dict):
+            existing = [existing]
+
+        created_at = os.path.getmtime(json_path)
+        with self.lock, self.conn:
+            # Re-checked under the write lock in case another process migrated meanwhile
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return 0
+            self.conn.executemany(
+                "INSERT INTO results (created_at, vendor_id, viewer_id, payload) VALUES (?, ?, ?, ?)",
+                [(created_at, r.get("vendor_id"), r.get("viewer_id"), json.dumps(r, default=str)) for r in existing]
+            )
+            self.conn.execute("INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (name, time.time()))
+        return len(existing)
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        return {"id": row["id"], "created_at": row["created_at"], "run_id": row["run_id"], **json.loads(row["payload"])}
+
+    def close(self):
+        self.conn.close()
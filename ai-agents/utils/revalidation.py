@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils.blob_store import BlobStore
+
+REVALIDATION_DB_PATH = os.getenv(
+    "W2G_REVALIDATION_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/revalidation.db")
+)
+# A photo still failing after this many re-validation attempts is given up on
+REVALIDATION_MAX_ATTEMPTS = int(os.getenv("W2G_REVALIDATION_MAX_ATTEMPTS", "5"))
+
+
+class RevalidationQueue:
+    """
+    Durable SQLite queue of photos that could not be scored while the model
+    provider was unavailable. Uploaded photos only live in memory for the
+    request, so their bytes are kept in the blob store until re-validated.
+    """
+
+    def __init__(self, path: str = REVALIDATION_DB_PATH, blob_store: BlobStore = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.blob_store = blob_store or BlobStore()
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS revalidation_queue (
+                    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    photo_path TEXT,
+                    blob_digest TEXT,
+                    mode TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    validation_result INTEGER,
+                    score REAL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_revalidation_status ON revalidation_queue (status, item_id)")
+
+    def add(self, photo_path: str, mode: str, image_bytes: bytes = None) -> int:
+        digest = self.blob_store.put(image_bytes) if image_bytes is not None else None
+        now = time.time()
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "INSERT INTO revalidation_queue (photo_path, blob_digest, mode, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?)",
+                (None if digest else photo_path, digest, mode, now, now)
+            ).lastrowid
+
+    def pending(self, limit: int = 100) -> list[dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT item_id, photo_path, blob_digest, mode, attempts FROM revalidation_queue "
+                "WHERE status = 'pending' ORDER BY item_id LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            {"item_id": i, "photo_path": p, "blob_digest": d, "mode": m, "attempts": a}
+            for i, p, d, m, a in rows
+        ]
+
+    def load(self, item: dict) -> bytes | None:
+        """
+        The stored bytes of an uploaded photo, or None for a photo referenced by path.
+        """
+        return self.blob_store.get(item["blob_digest"]) if item["blob_digest"] else None
+
+    def complete(self, item_id: int, validation_result: bool, score: float):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE revalidation_queue SET status = 'done', validation_result = ?, score = ?, error = NULL, "
+                "attempts = attempts + 1, updated_at = ? WHERE item_id = ?",
+                (int(validation_result), score, time.time(), item_id)
+            )
+
+    def fail(self, item_id: int, error: str, max_attempts: int = REVALIDATION_MAX_ATTEMPTS):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE revalidation_queue SET attempts = attempts + 1, error = ?, updated_at = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE item_id = ?",
+                (error, time.time(), max_attempts, item_id)
+            )
+
+    def summary(self) -> dict:
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM revalidation_queue GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_revalidation_queue() -> RevalidationQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = RevalidationQueue()
+    return _queue
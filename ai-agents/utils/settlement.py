@@ -0,0 +1,322 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.logger import setup_logger
+
+logger = setup_logger("Settlement", "router_agent", "settlement.log")
+
+SETTLEMENT_DB_PATH = os.getenv(
+    "W2G_SETTLEMENT_DB",
+    os.path.join(os.path.dirname(__file__), "../../data/settlement.db")
+)
+# A vendor's pending gives are netted into one transfer once the oldest is this old...
+SETTLEMENT_WINDOW_SECONDS = float(os.getenv("W2G_SETTLEMENT_WINDOW_SECONDS", "300"))
+# ...or once they add up to this many tokens, whichever comes first
+SETTLEMENT_MAX_TOKENS = int(os.getenv("W2G_SETTLEMENT_MAX_TOKENS", "1000"))
+# A claimed batch still unconfirmed after this long is assumed orphaned by a crash and retried
+SETTLEMENT_RETRY_AFTER = float(os.getenv("W2G_SETTLEMENT_RETRY_AFTER", "120"))
+TRANSFER_BACKEND = os.getenv("W2G_TRANSFER_BACKEND", "mock")
+# Net transfers per vendor over a settlement window instead of one transfer per give
+SETTLEMENT_MODE = os.getenv("W2G_SETTLEMENT_MODE", "0") == "1"
+
+
+class TransferBackend:
+    """
+    Moves tokens to a vendor. `reference` identifies the settlement batch and
+    is stable across retries, so real backends can use it for idempotency.
+    Returns the backend's transaction id.
+    """
+    name = "base"
+
+    def transfer(self, vendor_id: str, tokens: int, reference: str) -> str:
+        raise NotImplementedError
+
+
+class MockTransferBackend(TransferBackend):
+    """
+    Local stand-in for the on-chain transfer: records every transfer in memory.
+    """
+    name = "mock"
+
+    def __init__(self):
+        self.transfers = []
+        self.lock = threading.Lock()
+
+    def transfer(self, vendor_id: str, tokens: int, reference: str) -> str:
+        tx_id = f"mock-{reference}"
+        with self.lock:
+            self.transfers.append({"vendor_id": vendor_id, "tokens": tokens, "reference": reference, "tx_id": tx_id})
+        logger.info(f"[Settlement] - Mock transfer {tx_id}: {tokens} tokens -> vendor {vendor_id}")
+        return tx_id
+
+
+class SettlementLedger:
+    """
+    Durable SQLite ledger of gives awaiting transfer. Gives are appended to
+    `pending_transfers`; settling a vendor claims all its unclaimed entries
+    into one `settlements` batch in a single transaction, so every give is
+    paid exactly once even if the process dies between claim and transfer.
+    """
+
+    def __init__(self, path: str = SETTLEMENT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_transfers (
+                    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    vendor_id TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    give_ref TEXT,
+                    created_at REAL NOT NULL,
+                    batch_id TEXT
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pending_open ON pending_transfers (batch_id, vendor_id, created_at)"
+            )
+            # A give is queued once, however often its router step is retried or re-run
+            self.conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_pending_give ON pending_transfers (give_ref) "
+                "WHERE give_ref IS NOT NULL"
+            )
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS settlements (
+                    batch_id TEXT PRIMARY KEY,
+                    vendor_id TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    gives INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    tx_id TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    settled_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_settlements_status ON settlements (status)")
+
+    def record(self, vendor_id: str, tokens: int, give_ref: str = None) -> tuple[int, int, bool]:
+        """
+        Appends one give. Returns its entry id, the vendor's open (unsettled)
+        token total and whether `give_ref` was already recorded, in which case
+        the entry id is the existing one and nothing is added.
+        """
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO pending_transfers (vendor_id, tokens, give_ref, created_at) VALUES (?, ?, ?, ?)",
+                (vendor_id, tokens, give_ref, time.time())
+            )
+            duplicate = not cursor.rowcount
+            if duplicate:
+                entry_id, vendor_id = self.conn.execute(
+                    "SELECT entry_id, vendor_id FROM pending_transfers WHERE give_ref = ?", (give_ref,)
+                ).fetchone()
+            else:
+                entry_id = cursor.lastrowid
+            open_tokens = self.conn.execute(
+                "SELECT SUM(tokens) FROM pending_transfers WHERE batch_id IS NULL AND vendor_id = ?", (vendor_id,)
+            ).fetchone()[0]
+        return entry_id, open_tokens or 0, duplicate
+
+    def due_vendors(self, window_seconds: float, max_tokens: int) -> list[str]:
+        cutoff = time.time() - window_seconds
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT vendor_id FROM pending_transfers WHERE batch_id IS NULL
+                GROUP BY vendor_id HAVING MIN(created_at) <= ? OR SUM(tokens) >= ?
+            """, (cutoff, max_tokens)).fetchall()
+        return [r[0] for r in rows]
+
+    def open_vendors(self) -> list[str]:
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT vendor_id FROM pending_transfers WHERE batch_id IS NULL").fetchall()
+        return [r[0] for r in rows]
+
+    def claim(self, vendor_id: str) -> dict | None:
+        """
+        Nets all open entries of a vendor into a new pending batch.
+        """
+        batch_id = uuid.uuid4().hex
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            claimed = self.conn.execute(
+                "UPDATE pending_transfers SET batch_id = ? WHERE batch_id IS NULL AND vendor_id = ?",
+                (batch_id, vendor_id)
+            ).rowcount
+            if not claimed:
+                return None
+            tokens = self.conn.execute(
+                "SELECT SUM(tokens) FROM pending_transfers WHERE batch_id = ?", (batch_id,)
+            ).fetchone()[0]
+            self.conn.execute(
+                "INSERT INTO settlements (batch_id, vendor_id, tokens, gives, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                (batch_id, vendor_id, tokens, claimed, time.time())
+            )
+        return {"batch_id": batch_id, "vendor_id": vendor_id, "tokens": tokens, "gives": claimed}
+
+    def unsettled(self, orphaned_after: float = SETTLEMENT_RETRY_AFTER) -> list[dict]:
+        """
+        Batches to retry: failed transfers, and pending ones old enough to have
+        been orphaned by a crash rather than still being in flight.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT batch_id, vendor_id, tokens, gives FROM settlements "
+                "WHERE status = 'failed' OR (status = 'pending' AND created_at <= ?) ORDER BY created_at",
+                (time.time() - orphaned_after,)
+            ).fetchall()
+        return [{"batch_id": b, "vendor_id": v, "tokens": t, "gives": g} for b, v, t, g in rows]
+
+    def mark(self, batch_id: str, status: str, tx_id: str = None, error: str = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE settlements SET status = ?, tx_id = ?, error = ?, settled_at = ? WHERE batch_id = ?",
+                (status, tx_id, error, time.time() if status == "settled" else None, batch_id)
+            )
+
+    def summary(self) -> dict:
+        with self.lock:
+            open_gives, open_tokens = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM pending_transfers WHERE batch_id IS NULL"
+            ).fetchone()
+            by_status = dict(self.conn.execute("SELECT status, COUNT(*) FROM settlements GROUP BY status").fetchall())
+        return {"open_gives": open_gives, "open_tokens": open_tokens, "batches": by_status}
+
+    def close(self):
+        self.conn.close()
+
+
+class SettlementService:
+    """
+    Accumulates gives in the ledger and settles each vendor with one netted
+    transfer when its time or amount window closes. `record` only writes the
+    ledger; transfers run on a background thread that wakes every
+    `poll_interval` seconds, or immediately when a vendor crosses `max_tokens`.
+    """
+
+    def __init__(self, ledger: SettlementLedger = None, backend: TransferBackend = None,
+                 window_seconds: float = SETTLEMENT_WINDOW_SECONDS, max_tokens: int = SETTLEMENT_MAX_TOKENS,
+                 poll_interval: float = None):
+        self.ledger = ledger or SettlementLedger()
+        self.backend = backend or TRANSFER_BACKENDS[TRANSFER_BACKEND]()
+        self.window_seconds = window_seconds
+        self.max_tokens = max_tokens
+        self.poll_interval = poll_interval or max(min(window_seconds / 10, 30.0), 0.05)
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        # One settlement pass at a time, so a batch is never sent twice concurrently
+        self.settle_lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the settlement thread with an immediate pass, so entries and
+        batches left open by a previous process are settled without waiting
+        for a new give.
+        """
+        self._ensure_thread()
+        self.wake.set()
+
+    def record(self, vendor_id: str, tokens: int, give_ref: str = None) -> dict:
+        entry_id, open_tokens, duplicate = self.ledger.record(vendor_id, tokens, give_ref)
+        if duplicate:
+            logger.info(f"[Settlement] - Give {give_ref} is already queued as entry {entry_id}")
+            return {"entry_id": entry_id, "vendor_open_tokens": open_tokens, "duplicate": True}
+        self._ensure_thread()
+        if open_tokens >= self.max_tokens:
+            self.wake.set()
+        return {"entry_id": entry_id, "vendor_open_tokens": open_tokens, "duplicate": False}
+
+    def settle_due(self) -> list[dict]:
+        """
+        Settles every vendor whose window has closed, after retrying unconfirmed batches.
+        """
+        with self.settle_lock:
+            results = [self._transfer(batch) for batch in self.ledger.unsettled()]
+            for vendor_id in self.ledger.due_vendors(self.window_seconds, self.max_tokens):
+                batch = self.ledger.claim(vendor_id)
+                if batch:
+                    results.append(self._transfer(batch))
+        return results
+
+    def flush(self) -> list[dict]:
+        """
+        Settles all open entries now, regardless of windows (shutdown, end of a batch run).
+        """
+        with self.settle_lock:
+            results = [self._transfer(batch) for batch in self.ledger.unsettled(orphaned_after=0)]
+            for vendor_id in self.ledger.open_vendors():
+                batch = self.ledger.claim(vendor_id)
+                if batch:
+                    results.append(self._transfer(batch))
+        return results
+
+    def stop(self, flush: bool = False):
+        self.stopped.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+            self.thread = None
+        if flush:
+            self.flush()
+
+    def _transfer(self, batch: dict) -> dict:
+        try:
+            tx_id = self.backend.transfer(batch["vendor_id"], batch["tokens"], batch["batch_id"])
+        except Exception as e:
+            logger.error(f"[Settlement] - Transfer of batch {batch['batch_id']} to {batch['vendor_id']} failed: {e}")
+            self.ledger.mark(batch["batch_id"], "failed", error=str(e))
+            return {**batch, "status": "failed", "error": str(e)}
+        self.ledger.mark(batch["batch_id"], "settled", tx_id=tx_id)
+        logger.info(
+            f"[Settlement] - Settled {batch['gives']} gives to {batch['vendor_id']}: {batch['tokens']} tokens ({tx_id})"
+        )
+        return {**batch, "status": "settled", "tx_id": tx_id}
+
+    def _ensure_thread(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.stopped.clear()
+                    self.thread = threading.Thread(target=self._loop, name="w2g-settlement", daemon=True)
+                    self.thread.start()
+
+    def _loop(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
+            if self.stopped.is_set():
+                break
+            try:
+                self.settle_due()
+            except Exception as e:
+                logger.error(f"[Settlement] - Settlement pass failed: {e}")
+
+
+TRANSFER_BACKENDS = {
+    "mock": MockTransferBackend,
+}
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_settlement_service() -> SettlementService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SettlementService()
+    return _service
+
+
+def set_settlement_service(service: SettlementService):
+    global _service
+    _service = service
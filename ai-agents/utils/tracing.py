@@ -0,0 +1,250 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# Fraction of runs that record spans; 0 disables tracing entirely
+TRACE_SAMPLE_RATE = float(os.getenv("W2G_TRACE_SAMPLE_RATE", "0"))
+# Sink file: *.db / *.sqlite writes to SQLite, anything else to JSONL
+TRACE_SINK = os.getenv("W2G_TRACE_SINK", str(Path("logs") / "traces" / "traces.jsonl"))
+TRACE_MAX_FIELD = int(os.getenv("W2G_TRACE_MAX_FIELD", "500"))
+
+
+class _Run:
+    __slots__ = ("run_id", "sampled")
+
+    def __init__(self, run_id: str, sampled: bool):
+        self.run_id = run_id
+        self.sampled = sampled
+
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("w2g_trace_run", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("w2g_trace_span", default=None)
+
+
+def current_run_id() -> str | None:
+    run = _current_run.get()
+    return run.run_id if run else None
+
+
+def _summarize(value, depth: int = 0):
+    """
+    JSON-safe, size-capped copy of node inputs/outputs (states, messages, results).
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= TRACE_MAX_FIELD else value[:TRACE_MAX_FIELD] + "..."
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if depth >= 3:
+        return _summarize(repr(value), depth)
+    if isinstance(value, dict):
+        return {str(k): _summarize(v, depth + 1) for k, v in list(value.items())[:50]}
+    if isinstance(value, (list, tuple)):
+        return [_summarize(v, depth + 1) for v in value[:20]]
+    content = getattr(value, "content", None)
+    if content is not None:
+        return {"type": type(value).__name__, "content": _summarize(content, depth + 1)}
+    return _summarize(repr(value), depth)
+
+
+class _SpanSink:
+    """
+    Buffers finished spans and writes them from a background thread so tracing
+    never adds file I/O to the request path.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._drain, name="w2g-trace-sink", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def emit(self, span: dict):
+        self.queue.put(span)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def _drain(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        sqlite = self.path.endswith((".db", ".sqlite"))
+        if sqlite:
+            conn = sqlite3.connect(self.path)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spans (
+                    span_id TEXT PRIMARY KEY,
+                    run_id TEXT,
+                    parent_id TEXT,
+                    name TEXT,
+                    kind TEXT,
+                    start REAL,
+                    end REAL,
+                    duration_ms REAL,
+                    error TEXT,
+                    inputs TEXT,
+                    outputs TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_run ON spans (run_id)")
+        else:
+            out = open(self.path, "a", encoding="utf-8")
+
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            # Drain whatever else is pending to write in one go
+            while not self.queue.empty() and len(batch) < 500:
+                batch.append(self.queue.get())
+            if None in batch:
+                done = True
+                batch = [s for s in batch if s is not None]
+            if sqlite:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(s["span_id"], s["run_id"], s["parent_id"], s["name"], s["kind"], s["start"], s["end"],
+                          s["duration_ms"], s["error"], json.dumps(s["inputs"]), json.dumps(s["outputs"]))
+                         for s in batch]
+                    )
+            else:
+                out.writelines(json.dumps(s, separators=(",", ":")) + "\n" for s in batch)
+                out.flush()
+        if sqlite:
+            conn.close()
+        else:
+            out.close()
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def _get_sink() -> _SpanSink:
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = _SpanSink(TRACE_SINK)
+    return _sink
+
+
+class Span:
+    __slots__ = ("record",)
+
+    def __init__(self, record: dict):
+        self.record = record
+
+    def set_output(self, value):
+        self.record["outputs"] = _summarize(value)
+
+
+@contextmanager
+def trace_run(run_id: str = None, sample_rate: float = None):
+    """
+    Scope for one give/validation. The sampling decision is taken once here and
+    inherited by every span (and thread/task) started inside it.
+    """
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    run = _Run(run_id or uuid.uuid4().hex, rate > 0 and random.random() < rate)
+    token = _current_run.set(run)
+    try:
+        yield run.run_id
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "node", inputs=None):
+    """
+    Records a span for the enclosed block. Yields None (and records nothing) when
+    the current run is not sampled; a span outside any run starts its own run.
+    """
+    run = _current_run.get()
+    if run is None:
+        if TRACE_SAMPLE_RATE <= 0:
+            yield None
+            return
+        with trace_run():
+            with span(name, kind, inputs) as inner:
+                yield inner
+        return
+    if not run.sampled:
+        yield None
+        return
+
+    parent = _current_span.get()
+    record = {
+        "run_id": run.run_id,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent.record["span_id"] if parent else None,
+        "name": name,
+        "kind": kind,
+        "start": time.time(),
+        "end": None,
+        "duration_ms": None,
+        "error": None,
+        "inputs": _summarize(inputs),
+        "outputs": None,
+    }
+    current = Span(record)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        record["end"] = record["start"] + record["duration_ms"] / 1000
+        _current_span.reset(token)
+        _get_sink().emit(record)
+
+
+def traced(name: str, kind: str = "node"):
+    """
+    Decorator recording a span per call of a graph node or tool (sync or async).
+    The last positional argument (the state) is recorded as the input.
+    """
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                run = _current_run.get()
+                if (run is None and TRACE_SAMPLE_RATE <= 0) or (run is not None and not run.sampled):
+                    return await fn(*args, **kwargs)
+                with span(name, kind, args[-1] if args else kwargs) as current:
+                    result = await fn(*args, **kwargs)
+                    if current:
+                        current.set_output(result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = _current_run.get()
+            if (run is None and TRACE_SAMPLE_RATE <= 0) or (run is not None and not run.sampled):
+                return fn(*args, **kwargs)
+            with span(name, kind, args[-1] if args else kwargs) as current:
+                result = fn(*args, **kwargs)
+                if current:
+                    current.set_output(result)
+                return result
+        return wrapper
+
+    return decorator
@@ -6,11 +6,15 @@ import requests
 
 from datetime import datetime
 import json
+import sqlite3
 
 from pathlib import Path
 
 from streamlit_autorefresh import st_autorefresh
 
+from log_parser import COLUMNS, DEFAULT_EXCLUDE, LogFilter, parse_text
+from log_tailer import LogTailer
+
 # Auto-refresh every 5 seconds
 st_autorefresh(interval=5000, key="log_refresh")
 
@@ -37,14 +41,13 @@ selected_log = st.sidebar.selectbox(
     format_func=lambda x: x.name
 )
 
-# 🔄 ADDED: Read selected log file
-if selected_log.exists():
-    with open(selected_log, 'r', encoding="utf-8") as f:
-        log_lines = f.readlines()
-else:
-    st.error("Log file not found.")
-    log_lines = []
+# Parsed entries kept per log file across refreshes; the table shows the newest LOG_ROWS
+LOG_BUFFER_ENTRIES = 1000
+LOG_ROWS = 100
+LEVEL_LABELS = {"INFO": "INFO", "WARNING": "⚠️ WARNING", "ERROR": "❌ ERROR"}
 
+if not selected_log.exists():
+    st.error("Log file not found.")
 
 
 def time_ago(timestamp_str: str) -> str:
@@ -67,55 +70,43 @@ def time_ago(timestamp_str: str) -> str:
             return f"{timestamp.strftime('%Y-%m-%d')}"
 
 
-def parse_log_line(line):
-    if not line.strip() or line.startswith("[Master Flow]"):
-        return None
+def parse_log_entries(text: str) -> list[dict]:
+    return parse_text(text).to_dict("records")
+
+
+def tail_log(path) -> list[dict]:
+    """
+    Entries of the selected log, reading only what was appended since the last refresh.
+    """
+    tailers = st.session_state.setdefault("log_tailers", {})
+    key = str(path)
+    if key not in tailers:
+        tailers[key] = LogTailer(path, parse_log_entries, max_entries=LOG_BUFFER_ENTRIES)
+    return tailers[key].poll()
 
-    timestamp_str = line[:23]
-    try:
-        timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f").strftime("%H:%M:%S %Y-%m-%d")
-        # timestamp = time_ago(timestamp)
-    except ValueError:
-        return None
-
-    log_type = "INFO"
-    if "[WARNING]" in line:
-        log_type = "⚠️ WARNING"
-    elif "[ERROR]" in line:
-        log_type = "❌ ERROR"
-
-    agent = None
-    if "RouterAgent" in line:
-        agent = "RouterAgent"
-    elif "PhotoValidatorAgent" in line:
-        agent = "PhotoValidatorAgent"
-    elif "VaultDecider" in line:
-        agent = "VaultDecider"
-    elif "RewardAgent" in line:
-        agent = "RewardAgent"
-
-    details = line[line.rfind("]") + 1:].strip().replace("-", "")
-    if "HTTP Request:" in details or details == "" or "NEW RUN STARTED" in details or "====" in details or "Received data" in details:
-        return None
-
-    return {
-        "timestamp": timestamp,
-        "type": log_type,
-        "agent": agent,
-        "details": details
-    }
-
-
-        
-structured_logs = []
-for line in log_lines:
-    parsed = parse_log_line(line)
-    if parsed:
-        structured_logs.append(parsed)
 
+structured_logs = pd.DataFrame(tail_log(selected_log), columns=COLUMNS)
+
+# Filtering happens on display, so changing it applies to everything already buffered
+log_filter = LogFilter(
+    levels=tuple(st.sidebar.multiselect("Levels", ["INFO", "WARNING", "ERROR", "DEBUG"])),
+    # Every agent the log actually names, including tags outside KNOWN_AGENTS
+    agents=tuple(st.sidebar.multiselect("Agents", sorted(structured_logs["agent"].dropna().astype(str).unique()))),
+    exclude=tuple(
+        s.strip() for s in st.sidebar.text_input("Hide messages containing", ", ".join(DEFAULT_EXCLUDE)).split(",")
+        if s.strip()
+    ),
+)
+
+shown_logs = log_filter.apply(structured_logs).tail(LOG_ROWS)[::-1]
 
 # To convert to DataFrame:
-df_agents = pd.DataFrame(structured_logs)[::-1][:100]
+df_agents = pd.DataFrame({
+    "timestamp": shown_logs["timestamp"],
+    "type": shown_logs["level"].astype(str).replace(LEVEL_LABELS),
+    "agent": shown_logs["agent"],
+    "details": shown_logs["message"],
+})
 
 
 #==========================Token flow data==================================
@@ -134,12 +125,34 @@ heatmap_data = heatmap_data.T
 # Mock Vault APY Data (Randomized for demo)
 
 
-with open('../data/result.json', 'r') as file:
-    result = json.load(file)  # Automatically parses JSON
+RESULT_DB = BASE_DIR / "data" / "results.db"
+
+
+def load_results():
+    """
+    Reads only the results appended since the last refresh from the shared
+    results store, keeping the ones already seen in the session.
+    Falls back to the legacy result.json when the store does not exist yet.
+    """
+    if not RESULT_DB.exists():
+        with open(BASE_DIR / "data" / "result.json", 'r') as file:
+            legacy = json.load(file)
+        return [legacy] if isinstance(legacy, dict) else legacy
+
+    cached = st.session_state.setdefault("results", [])
+    last_id = st.session_state.get("results_last_id", 0)
+    conn = sqlite3.connect(f"file:{RESULT_DB}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT id, payload FROM results WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+    finally:
+        conn.close()
+    if rows:
+        cached.extend(json.loads(payload) for _, payload in rows)
+        st.session_state["results_last_id"] = rows[-1][0]
+    return cached
 
 
-if isinstance(result, dict):
-    result = [result] 
+result = load_results()
 
 vault = {
     "Vendor ID": [entry["vendor_id"] for entry in result],
@@ -0,0 +1,136 @@
+# Benchmark of the dashboard's log parser on a large synthetic agent log.
+#
+#   cd monitor-dashboard
+#   python -m benchmarks.log_parser_bench --size-mb 300
+#   python -m benchmarks.log_parser_bench --log ../ai-agents/logs/photo_validator/photo.log
+
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from log_parser import LogFilter, parse_file
+
+MESSAGES = [
+    "INFO", "[RouterAgent] - Deciding next action based on tokens: {n}",
+    "INFO", "[RouterAgent] Initiating token transfer: {n} tokens -> vendor vendor-{id}",
+    "INFO", "[2/4] Running PhotoValidatorAgent...",
+    "INFO", "[PhotoValidatorAgent] - Score: 0.{n}",
+    "INFO", "HTTP Request: POST https://api.groq.com/openai/v1/chat/completions \"HTTP/1.1 200 OK\"",
+    "WARNING", "[PhotoValidatorAgent] - Rejected locally: image too blurry (sharpness={n}.5)",
+    "INFO", "[VaultDecider] Staking {n} tokens with vendor vendor-{id}.",
+    "INFO", "[RewardAgent] - Dispatching 'v-bucks' to viewer 'user-{id}'",
+    "ERROR", "[PhotoValidatorAgent] - Model unavailable: Circuit 'llm' is open, retry in {n}s",
+]
+LEVELS, TEMPLATES = MESSAGES[0::2], MESSAGES[1::2]
+
+
+def legacy_parse_line(line):
+    """
+    The per-line parser the dashboard used before log_parser (kept for comparison).
+    """
+    if not line.strip() or line.startswith("[Master Flow]"):
+        return None
+    try:
+        timestamp = datetime.strptime(line[:23], "%Y-%m-%d %H:%M:%S,%f").strftime("%H:%M:%S %Y-%m-%d")
+    except ValueError:
+        return None
+    log_type = "INFO"
+    if "[WARNING]" in line:
+        log_type = "⚠️ WARNING"
+    elif "[ERROR]" in line:
+        log_type = "❌ ERROR"
+    agent = None
+    for name in ("RouterAgent", "PhotoValidatorAgent", "VaultDecider", "RewardAgent"):
+        if name in line:
+            agent = name
+            break
+    details = line[line.rfind("]") + 1:].strip().replace("-", "")
+    if ("HTTP Request:" in details or details == "" or "NEW RUN STARTED" in details or "====" in details
+            or "Received data" in details):
+        return None
+    return {"timestamp": timestamp, "type": log_type, "agent": agent, "details": details}
+
+
+def generate_log(path: str, size_mb: int, seed: int):
+    """
+    Writes about `size_mb` MB of text-format agent log lines, one week long.
+    """
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    start = datetime(2025, 1, 1)
+    written, i = 0, 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            lines = []
+            for _ in range(10_000):
+                k = rng.randrange(len(TEMPLATES))
+                ts = start + timedelta(milliseconds=i * 50)
+                message = TEMPLATES[k].format(n=rng.randrange(1000), id=rng.randrange(100_000))
+                lines.append(f"{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} [{LEVELS[k]}] {message}\n")
+                i += 1
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent log parser.")
+    parser.add_argument("--log", help="Existing log file to parse (default: generate one)")
+    parser.add_argument("--size-mb", type=int, default=300, help="Size of the generated log")
+    parser.add_argument("--baseline-lines", type=int, default=200_000,
+                        help="Lines timed with the legacy per-line parser (extrapolated to the whole file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    path = args.log
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"w2g_bench_{args.size_mb}mb.log")
+        if not os.path.exists(path):
+            started = time.perf_counter()
+            generate_log(path, args.size_mb, args.seed)
+            print(f"Generated {path} in {time.perf_counter() - started:.1f}s")
+    size_mb = os.path.getsize(path) / 1024 / 1024
+
+    started = time.perf_counter()
+    df = parse_file(path)
+    parse_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    shown = LogFilter().apply(df)
+    filter_seconds = time.perf_counter() - started
+
+    baseline_lines = 0
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            legacy_parse_line(line)
+            baseline_lines += 1
+            if baseline_lines >= args.baseline_lines:
+                break
+    legacy_per_line = (time.perf_counter() - started) / max(baseline_lines, 1)
+
+    results = {
+        "log": path,
+        "size_mb": round(size_mb, 1),
+        "entries": len(df),
+        "shown_after_filter": len(shown),
+        "parse_seconds": round(parse_seconds, 2),
+        "filter_seconds": round(filter_seconds, 2),
+        "mb_per_second": round(size_mb / parse_seconds, 1),
+        "legacy_estimated_seconds": round(legacy_per_line * len(df), 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(results, indent=2))
+    print(df.dtypes.to_string())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Agents named in messages that carry no "[Agent]" tag, e.g. "[2/4] Running PhotoValidatorAgent..."
+KNOWN_AGENTS = ("RouterAgent", "PhotoValidatorAgent", "VaultDecider", "RewardAgent")
+
+# "<time> [LEVEL] [Tag] - message" as written by utils/logger.py's text format. The tag is
+# optional and only taken as the agent when it starts with a letter (not e.g. "[2/4]")
+LOG_LINE = re.compile(
+    r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) \[([A-Z]+)\] "
+    r"(?:\[(?:([A-Za-z][^\]\n]*)|[^\]\n]*)\] ?(?:- ?)?)?([^\r\n]*)",
+    re.MULTILINE
+)
+# Lines of the JSON log format (W2G_LOG_FORMAT=json)
+JSON_LINE = re.compile(r"^\{.*\}\r?$", re.MULTILINE)
+
+COLUMNS = ["timestamp", "level", "agent", "message"]
+# Noise the dashboard has always hidden
+DEFAULT_EXCLUDE = ("HTTP Request:", "NEW RUN STARTED", "====", "Received data")
+
+
+@dataclass
+class LogFilter:
+    """
+    Which parsed entries to show. Empty `levels`/`agents` mean all of them;
+    entries whose message contains any of `exclude` are dropped.
+    """
+    levels: tuple = ()
+    agents: tuple = ()
+    exclude: tuple = DEFAULT_EXCLUDE
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        mask = df["message"].str.len() > 0
+        if self.levels:
+            mask &= df["level"].isin(self.levels)
+        if self.agents:
+            mask &= df["agent"].isin(self.agents)
+        if self.exclude:
+            pattern = "|".join(re.escape(s) for s in self.exclude)
+            mask &= ~df["message"].str.contains(pattern, regex=True)
+        return df[mask]
+
+
+def parse_text(text: str, agents: tuple = KNOWN_AGENTS) -> pd.DataFrame:
+    """
+    Parses a chunk of log text (text or JSON format lines) into typed columns.
+    The text lines are matched by one precompiled regex scanning the whole
+    chunk; lines that are not log records (tracebacks, banners) are skipped.
+    """
+    return _categorize(_parse_chunk(text, agents))
+
+
+def _parse_chunk(text: str, agents: tuple) -> pd.DataFrame:
+    json_matches = list(JSON_LINE.finditer(text)) if "{" in text else []
+    if json_matches:
+        text_matches = list(LOG_LINE.finditer(text))
+        rows = [m.groups() for m in text_matches]
+    else:
+        rows = LOG_LINE.findall(text)
+    seconds, millis, levels, tags, messages = zip(*rows) if rows else ((),) * 5
+    # numpy parses the ISO-like "YYYY-MM-DD HH:MM:SS" part in C, much faster than strptime
+    timestamps = np.array(seconds, dtype="datetime64[s]") + np.array(millis, dtype=np.int64).astype("timedelta64[ms]")
+    df = pd.DataFrame({
+        "timestamp": timestamps,
+        "level": levels,
+        "agent": pd.Series(tags, dtype=object).replace("", None),
+        "message": messages,
+    })
+
+    untagged = df["agent"].isna()
+    if agents and untagged.any():
+        pattern = "(" + "|".join(re.escape(a) for a in agents) + ")"
+        df.loc[untagged, "agent"] = df.loc[untagged, "message"].str.extract(pattern, expand=False)
+
+    if json_matches:
+        json_df = parse_json_lines([m.group() for m in json_matches])
+        df = pd.concat([df, json_df], ignore_index=True)
+        # A chunk mixing both formats (e.g. around a W2G_LOG_FORMAT switch) stays in line order
+        starts = np.array([m.start() for m in text_matches] + [json_matches[i].start() for i in json_df.index])
+        df = df.iloc[np.argsort(starts, kind="stable")].reset_index(drop=True)
+    return df[COLUMNS]
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    # Few distinct levels and agents: categories keep millions of rows small and fast to filter
+    df["level"] = df["level"].astype("category")
+    df["agent"] = df["agent"].astype("category")
+    return df
+
+
+def parse_json_lines(lines: list[str]) -> pd.DataFrame:
+    """
+    Parses JSON-format log lines. Lines that look like JSON but are not a JSON
+    object (a dict repr, a line cut short by a crash) are skipped, like text
+    lines that are not log records. The index is each kept line's position in `lines`.
+    """
+    records, kept = [], []
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+            kept.append(i)
+    raw = pd.DataFrame(records, index=pd.Index(kept, dtype=np.int64), columns=["ts", "level", "agent", "msg"])
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(raw["ts"], format="ISO8601", errors="coerce"),
+        "level": raw["level"],
+        "agent": raw["agent"],
+        # Same message text as the text format, without the "[Agent] - " prefix
+        "message": raw["msg"].fillna("").astype(str).str.replace(r"^\[[^\]]*\] ?(?:- ?)?", "", regex=True),
+    })
+
+
+def parse_file(path, chunk_bytes: int = 32 * 1024 * 1024, agents: tuple = KNOWN_AGENTS) -> pd.DataFrame:
+    """
+    Parses a whole log file in chunks of about `chunk_bytes`, cut at line ends.
+    """
+    frames = []
+    remainder = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            data = remainder + chunk
+            cut = data.rfind(b"\n") + 1
+            remainder = data[cut:]
+            if cut:
+                frames.append(_parse_chunk(data[:cut].decode("utf-8", errors="replace"), agents))
+    if remainder:
+        frames.append(_parse_chunk(remainder.decode("utf-8", errors="replace"), agents))
+    if not frames:
+        return parse_text("", agents)
+    return _categorize(pd.concat(frames, ignore_index=True))
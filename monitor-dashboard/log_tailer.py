@@ -0,0 +1,99 @@
+import os
+from collections import deque
+from typing import Callable
+
+
+class LogTailer:
+    """
+    Follows one log file across dashboard refreshes. It remembers the file's
+    inode and the byte offset read so far, so each poll only reads what was
+    appended since. When RotatingFileHandler rolls the file over (the old
+    inode is renamed to `<name>.1`), the rest of the rotated file is read
+    before starting on the new one. Parsed entries are kept in a bounded ring
+    buffer, so a refresh costs the same however large the log has grown.
+
+    `parse` turns a block of complete lines into entries, so the new lines
+    of a refresh are parsed in one call.
+    """
+
+    def __init__(self, path, parse: Callable[[str], list[dict]], max_entries: int = 1000,
+                 initial_bytes: int = 1_000_000):
+        self.path = str(path)
+        self.parse = parse
+        self.entries = deque(maxlen=max_entries)
+        # On first open only the tail of an existing log is read
+        self.initial_bytes = initial_bytes
+        self.inode = None
+        self.offset = 0
+        self.partial = b""
+        # Set while the read position is inside a line whose start was not read
+        self.skip_partial = False
+
+    def poll(self) -> list[dict]:
+        """
+        Reads newly appended lines and returns the buffered entries, oldest first.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return list(self.entries)
+
+        if self.inode is None:
+            self.inode = stat.st_ino
+            self.offset = max(stat.st_size - self.initial_bytes, 0)
+            self.skip_partial = self.offset > 0
+            self._read(self.path)
+        else:
+            if stat.st_ino != self.inode:
+                # Rolled over: drain what was appended to the old file before the rename
+                rotated = self._find_rotated()
+                if rotated:
+                    self._read(rotated)
+                self._flush_partial()
+                self.inode, self.offset, self.skip_partial = stat.st_ino, 0, False
+            elif stat.st_size < self.offset:
+                # Truncated in place
+                self.partial, self.offset, self.skip_partial = b"", 0, False
+            if stat.st_size > self.offset:
+                self._read(self.path)
+        return list(self.entries)
+
+    def _find_rotated(self) -> str | None:
+        directory, name = os.path.split(self.path)
+        for candidate in sorted(os.listdir(directory or ".")):
+            if candidate.startswith(name + "."):
+                full = os.path.join(directory, candidate)
+                try:
+                    if os.stat(full).st_ino == self.inode:
+                        return full
+                except FileNotFoundError:
+                    continue
+        return None
+
+    def _read(self, path: str):
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        data = self.partial + data
+        if self.skip_partial:
+            # Started mid-file: everything up to the first newline is the tail of a line
+            newline = data.find(b"\n")
+            if newline < 0:
+                # No newline yet: the whole chunk is still that line, skip it and keep skipping
+                return
+            data = data[newline + 1:]
+            self.skip_partial = False
+        # What follows the last newline is an incomplete line until its newline is written
+        cut = data.rfind(b"\n") + 1
+        self.partial = data[cut:]
+        self._add(data[:cut])
+
+    def _flush_partial(self):
+        if self.partial:
+            self._add(self.partial)
+            self.partial = b""
+
+    def _add(self, raw: bytes):
+        if raw:
+            self.entries.extend(self.parse(raw.decode("utf-8", errors="replace")))
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The dashboard modules are run from monitor-dashboard/ and imported top-level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,105 @@
+import json
+
+import pandas as pd
+
+from log_parser import LogFilter, parse_file, parse_text
+
+TEXT_LOG = (
+    "2025-01-02 03:04:05,678 [INFO] [RouterAgent] - Deciding next action based on tokens: 12\n"
+    "2025-01-02 03:04:06,001 [INFO] [2/4] Running PhotoValidatorAgent...\n"
+    "Traceback (most recent call last):\n"
+    "2025-01-02 03:04:07,250 [WARNING] [SettlementService] - Retrying vendor_1\n"
+    "2025-01-02 03:04:08,000 [ERROR] Something broke without a tag\n"
+)
+
+
+def json_line(ts: str, level: str, agent: str, msg: str) -> str:
+    return json.dumps({"ts": ts, "level": level, "agent": agent, "msg": msg})
+
+
+def test_parses_text_lines_into_typed_columns():
+    df = parse_text(TEXT_LOG)
+    assert list(df["message"]) == [
+        "Deciding next action based on tokens: 12",
+        "Running PhotoValidatorAgent...",
+        "Retrying vendor_1",
+        "Something broke without a tag",
+    ]
+    assert df["timestamp"][0] == pd.Timestamp("2025-01-02 03:04:05.678")
+    assert list(df["level"]) == ["INFO", "INFO", "WARNING", "ERROR"]
+    # Tags are agents; untagged messages fall back to the agents they name
+    assert list(df["agent"].astype(object).fillna("-")) == [
+        "RouterAgent", "PhotoValidatorAgent", "SettlementService", "-"
+    ]
+    assert df["level"].dtype == "category" and df["agent"].dtype == "category"
+
+
+def test_empty_text_has_the_columns():
+    df = parse_text("")
+    assert len(df) == 0
+    assert list(df.columns) == ["timestamp", "level", "agent", "message"]
+
+
+def test_json_lines_strip_the_agent_prefix():
+    df = parse_text(json_line("2025-01-02T03:04:05.678", "INFO", "VaultDecider", "[VaultDecider] - Vendor APY: 12%") + "\n")
+    assert df["message"][0] == "Vendor APY: 12%"
+    assert df["agent"][0] == "VaultDecider"
+
+
+def test_mixed_formats_keep_line_order():
+    text = (
+        "2025-01-02 03:04:05,000 [INFO] [RouterAgent] - first\n"
+        + json_line("2025-01-02T03:04:06", "INFO", "RouterAgent", "second") + "\n"
+        + "2025-01-02 03:04:07,000 [INFO] [RouterAgent] - third\n"
+        + json_line("2025-01-02T03:04:08", "WARNING", "RewardAgent", "fourth") + "\n"
+    )
+    df = parse_text(text)
+    assert list(df["message"]) == ["first", "second", "third", "fourth"]
+    assert list(df["level"]) == ["INFO", "INFO", "INFO", "WARNING"]
+
+
+def test_parse_file_matches_parse_text_across_chunks(tmp_path):
+    log = tmp_path / "agent.log"
+    log.write_text(TEXT_LOG * 20, encoding="utf-8")
+    # Chunks much smaller than the file, cut inside lines
+    df = parse_file(log, chunk_bytes=100)
+    pd.testing.assert_frame_equal(df, parse_text(TEXT_LOG * 20), check_dtype=False)
+
+
+def test_filter_by_level_agent_and_excluded_text():
+    df = parse_text(TEXT_LOG)
+    assert list(LogFilter(levels=("WARNING", "ERROR")).apply(df)["level"]) == ["WARNING", "ERROR"]
+    assert list(LogFilter(agents=("RouterAgent",)).apply(df)["message"]) == ["Deciding next action based on tokens: 12"]
+    assert len(LogFilter(exclude=("Running", "Retrying")).apply(df)) == 2
+
+
+def test_malformed_json_lines_are_skipped():
+    text = (
+        json_line("2025-01-02T03:04:05", "INFO", "RouterAgent", "first") + "\n"
+        + "{'vendor_id': 'vendor_1', 'tokens': 12}\n"
+        + "2025-01-02 03:04:06,000 [INFO] [RouterAgent] - second\n"
+        + '{"ts": "2025-01-02T03:04:07", "level": "ERR\n'
+        + "[1, 2]\n"
+        + json_line("2025-01-02T03:04:08", "WARNING", "RewardAgent", "third") + "\n"
+    )
+    df = parse_text(text)
+    assert list(df["message"]) == ["first", "second", "third"]
+    assert list(df["level"]) == ["INFO", "INFO", "WARNING"]
+
+
+def test_only_malformed_json_lines():
+    df = parse_text('{"ts": "2025-01-02T03:04:07", "lev\n{not json}\n')
+    assert len(df) == 0
+    assert list(df.columns) == ["timestamp", "level", "agent", "message"]
+
+
+def test_tailer_survives_a_malformed_json_line(tmp_path):
+    from log_tailer import LogTailer
+
+    log = tmp_path / "agent.log"
+    log.write_text(json_line("2025-01-02T03:04:05", "INFO", "RouterAgent", "before") + "\n{'a': 1}\n")
+    tailer = LogTailer(log, lambda text: parse_text(text).to_dict("records"))
+    assert [e["message"] for e in tailer.poll()] == ["before"]
+    with open(log, "a") as f:
+        f.write(json_line("2025-01-02T03:04:06", "INFO", "RouterAgent", "after") + "\n")
+    assert [e["message"] for e in tailer.poll()] == ["before", "after"]
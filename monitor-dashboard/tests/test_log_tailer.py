@@ -0,0 +1,89 @@
+import os
+
+from log_tailer import LogTailer
+
+
+def parse_lines(text: str) -> list[dict]:
+    return [{"line": line} for line in text.splitlines()]
+
+
+def lines(tailer: LogTailer) -> list[str]:
+    return [entry["line"] for entry in tailer.poll()]
+
+
+def append(path, text: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_reads_only_appended_lines_and_holds_partial_ones(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "one\ntwo\nthr")
+    tailer = LogTailer(log, parse_lines)
+    assert lines(tailer) == ["one", "two"]
+
+    append(log, "ee\nfour")
+    assert lines(tailer) == ["one", "two", "three"]
+    append(log, "\n")
+    assert lines(tailer) == ["one", "two", "three", "four"]
+
+
+def test_missing_file_is_empty_until_created(tmp_path):
+    log = tmp_path / "agent.log"
+    tailer = LogTailer(log, parse_lines)
+    assert lines(tailer) == []
+    append(log, "one\n")
+    assert lines(tailer) == ["one"]
+
+
+def test_rotation_drains_the_rotated_file_first(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "one\n")
+    tailer = LogTailer(log, parse_lines)
+    assert lines(tailer) == ["one"]
+
+    # Written after the last poll, then rolled over like RotatingFileHandler does
+    append(log, "two\nthree")
+    os.rename(log, tmp_path / "agent.log.1")
+    append(log, "four\n")
+    assert lines(tailer) == ["one", "two", "three", "four"]
+
+    append(log, "five\n")
+    assert lines(tailer) == ["one", "two", "three", "four", "five"]
+
+
+def test_truncation_starts_over(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "one\ntwo\n")
+    tailer = LogTailer(log, parse_lines)
+    assert lines(tailer) == ["one", "two"]
+
+    with open(log, "w", encoding="utf-8") as f:
+        f.write("new\n")
+    assert lines(tailer) == ["one", "two", "new"]
+
+
+def test_first_read_skips_the_cut_line(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "first line\nsecond\n")
+    tailer = LogTailer(log, parse_lines, initial_bytes=10)
+    # The tail starts inside "first line"
+    assert lines(tailer) == ["second"]
+
+
+def test_first_read_inside_a_line_without_newline(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "old\n" + "x" * 50)
+    tailer = LogTailer(log, parse_lines, initial_bytes=20)
+    # The whole tail is the end of a line whose start was not read
+    assert lines(tailer) == []
+
+    append(log, "yyy\nnext\n")
+    assert lines(tailer) == ["next"]
+
+
+def test_entries_are_bounded(tmp_path):
+    log = tmp_path / "agent.log"
+    append(log, "".join(f"{i}\n" for i in range(10)))
+    tailer = LogTailer(log, parse_lines, max_entries=3)
+    assert lines(tailer) == ["7", "8", "9"]